@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the bigram-pruned fuzzy matcher against the original SequenceMatcher scan and
+check that both make the same accept/reject decision (and pick the same key).
+
+    python -m kg_cleaner.bench_fuzzy --lexicon /mnt/data/lexicons/umls_concepts.csv
+    python -m kg_cleaner.bench_fuzzy --synthetic 50000
+"""
+import argparse, random, string, time
+from .fuzzy import NgramIndex, linear_best_match
+
+def synthetic_keys(n, seed=0):
+    rnd = random.Random(seed)
+    alphabet = string.ascii_lowercase + "  -" + "烧伤创面感染清创敷料"
+    keys = set()
+    while len(keys) < n:
+        keys.add("".join(rnd.choice(alphabet) for _ in range(rnd.randint(3, 40))).strip() or "x")
+    return sorted(keys)
+
+def perturbed_queries(keys, n, seed=1):
+    """Mix of near-misses (one edit), random strings and unrelated keys."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        k = rnd.choice(keys)
+        op = rnd.random()
+        pos = rnd.randrange(len(k) + 1)
+        if op < 0.4:
+            q = k[:pos] + rnd.choice(string.ascii_lowercase) + k[pos:]
+        elif op < 0.7 and len(k) > 1:
+            q = k[:pos] + k[pos + 1:]
+        elif op < 0.85:
+            q = k + "s"
+        else:
+            q = "".join(rnd.choice(string.ascii_lowercase) for _ in range(len(k)))
+        if q and q not in out:
+            out.append(q)
+    return out
+
+def load_keys(path, key_col):
+    from .lexicon_store import open_lexicon
+    return list(open_lexicon(path, key_col))
+
+def main():
+    ap = argparse.ArgumentParser(description="Fuzzy lexicon matcher benchmark")
+    ap.add_argument("--lexicon", help="lexicon CSV/Parquet (defaults to a synthetic lexicon)")
+    ap.add_argument("--key-col", default="name")
+    ap.add_argument("--synthetic", type=int, default=20000, help="number of synthetic keys")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--threshold", type=float, default=0.95)
+    args = ap.parse_args()
+
+    keys = load_keys(args.lexicon, args.key_col) if args.lexicon else synthetic_keys(args.synthetic)
+    key_set = set(keys)
+    queries = [q for q in perturbed_queries(keys, args.queries) if q not in key_set]
+
+    t0 = time.perf_counter()
+    index = NgramIndex.build(keys)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = [index.best_match(q, args.threshold) for q in queries]
+    t_fast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    slow = [linear_best_match(q, keys, args.threshold) for q in queries]
+    t_slow = time.perf_counter() - t0
+
+    mismatches = [(q, a, b) for q, a, b in zip(queries, fast, slow) if a[1] != b[1]]
+    accepted = sum(1 for _, k in slow if k is not None)
+    print(f"keys: {len(keys)}  queries: {len(queries)}  accepted: {accepted}  threshold: {args.threshold}")
+    print(f"index build: {t_build:.2f}s")
+    print(f"linear scan: {t_slow:.2f}s ({1000 * t_slow / max(1, len(queries)):.2f} ms/query)")
+    print(f"ngram index: {t_fast:.2f}s ({1000 * t_fast / max(1, len(queries)):.2f} ms/query)")
+    print(f"speedup: {t_slow / max(t_fast, 1e-9):.1f}x  decision mismatches: {len(mismatches)}")
+    for q, a, b in mismatches[:10]:
+        print(f"  {q!r}: index={a} linear={b}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
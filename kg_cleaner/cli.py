@@ -1,14 +1,57 @@
 # -*- coding: utf-8 -*-
-import argparse
+import argparse, json
 from .pipeline import run_pipeline
+from .incremental import run_pipeline_incremental
+
+# keys accepted in --config (JSON); explicit command-line flags take precedence
+CONFIG_KEYS = ("input_jsons", "out_dir", "workers", "chunk_size", "stream", "batch_size", "incremental")
+
+def load_config(path):
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    unknown = set(cfg) - set(CONFIG_KEYS)
+    if unknown:
+        raise SystemExit(f"unknown config keys: {', '.join(sorted(unknown))}")
+    return cfg
+
+# options honoured only by the full pipeline (run_pipeline_incremental runs serially in memory)
+FULL_PIPELINE_DEFAULTS = {"workers": 1, "chunk_size": 2000, "stream": False, "batch_size": 10000}
 
 def main():
     parser = argparse.ArgumentParser(description="KG Cleaner compact pipeline")
-    # you can add --config later if needed
+    parser.add_argument("--config", help="JSON file with input_jsons, out_dir and any of the options below")
+    parser.add_argument("--workers", type=int, default=FULL_PIPELINE_DEFAULTS["workers"],
+                        help="processes for per-entity steps (1 = serial, 0 = all CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=FULL_PIPELINE_DEFAULTS["chunk_size"],
+                        help="entities per worker task")
+    parser.add_argument("--stream", action="store_true",
+                        help="parse inputs incrementally and write Parquet row groups (bounded memory)")
+    parser.add_argument("--batch-size", type=int, default=FULL_PIPELINE_DEFAULTS["batch_size"],
+                        help="entities per batch / row group in --stream mode")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=False,
+                        help="cache per-input results under OUT_DIR/.cache and redo only what changed")
+    pre, _ = parser.parse_known_args()
+    cfg = load_config(pre.config) if pre.config else {}
+    parser.set_defaults(**{k: v for k, v in cfg.items() if k not in ("input_jsons", "out_dir")})
     args = parser.parse_args()
-    paths = run_pipeline()
+
+    if args.incremental:
+        conflicting = [k for k, v in FULL_PIPELINE_DEFAULTS.items() if getattr(args, k) != v]
+        if conflicting:
+            parser.error("--incremental cannot be combined with "
+                         + ", ".join("--" + k.replace("_", "-") for k in conflicting))
+        paths, report = run_pipeline_incremental(input_jsons=cfg.get("input_jsons"), out_dir=cfg.get("out_dir"))
+        for stage, res in report.items():
+            status = "skipped" if not res["computed"] else f"recomputed {len(res['computed'])}"
+            print(f"[{stage}] {status} ({len(res['skipped'])} reused)")
+            for p in res["computed"]:
+                print(f"    {p}")
+    else:
+        paths = run_pipeline(workers=args.workers, chunk_size=args.chunk_size,
+                             stream=args.stream, batch_size=args.batch_size,
+                             input_jsons=cfg.get("input_jsons"), out_dir=cfg.get("out_dir"))
     for k,v in paths.items():
         print(f"{k}: {v}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -101,8 +101,9 @@ CANON_PARENT_TO_UMLS = {
     "Medical Device": "Medical Device",
 }
 
-# Optional lexicon paths
+# Optional lexicon paths (CSV or the *_{lang}.parquet files written by `python -m kg_cleaner.utils`)
 LEX_DIR = "/mnt/data/lexicons"
 UMLS_ST_PATH = f"{LEX_DIR}/umls_semantic_types.csv"
 UMLS_CUI_PATH = f"{LEX_DIR}/umls_concepts.csv"
-SNOMED_PATH  = f"{LEX_DIR}/snomed_concepts.csv"
\ No newline at end of file
+SNOMED_PATH  = f"{LEX_DIR}/snomed_concepts.csv"
+LEX_INDEX_DIR = f"{LEX_DIR}/index"  # memory-mapped lexicon indexes (see lexicon_store)
\ No newline at end of file
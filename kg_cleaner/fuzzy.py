@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Sub-linear replacement for the `SequenceMatcher(None, query, key).ratio()` scan over every
+lexicon key that `best_lexicon_match` falls back to when the exact lookup misses.
+
+Keys are indexed by character bigrams (inverted index: bigram code -> sorted key ids).
+Candidates are pruned with bounds that are exact for SequenceMatcher, so the returned key is
+the same one the linear scan would pick (highest ratio, earliest key on ties):
+
+* length:  ratio <= real_quick_ratio = 2*min(la, lb) / (la + lb)
+* bigrams: the M matched characters form B blocks with B - 1 <= (la + lb) - 2M, each block of
+           length n contributes n - 1 shared bigrams, so shared >= 3M - (la + lb) - 1.
+           If a key must share >= b bigrams, it shares at least one of any la - b query
+           bigrams (prefix filtering); we probe the rarest ones.
+
+Survivors are checked with quick_ratio() and then scored with ratio().
+"""
+import os, math
+from difflib import SequenceMatcher
+import numpy as np
+
+INDEX_VERSION = 1
+_EPS = 1e-9
+_CHUNK_KEYS = 1_000_000
+
+def _codepoints(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+def _bigram_codes(cp):
+    return (cp[:-1].astype(np.int64) << 21) | cp[1:].astype(np.int64)
+
+def _pairs_for_chunk(keys, first_id):
+    """(bigram code, key id) pairs for a chunk of keys, one pair per distinct bigram of a key."""
+    cp = _codepoints("\x00".join(keys) + "\x00")
+    codes = _bigram_codes(cp)
+    valid = (cp[:-1] != 0) & (cp[1:] != 0)
+    ids = np.cumsum(cp == 0)[:-1] + first_id
+    codes, ids = codes[valid], ids[valid].astype(np.int32)
+    order = np.lexsort((ids, codes))
+    codes, ids = codes[order], ids[order]
+    keep = np.r_[True, (codes[1:] != codes[:-1]) | (ids[1:] != ids[:-1])] if len(codes) else np.zeros(0, bool)
+    return codes[keep], ids[keep]
+
+class NgramIndex:
+    """Bigram inverted index over an ordered list of keys (key id == position)."""
+
+    FILES = ("grams.npy", "postings_idx.npy", "postings.npy", "key_lens.npy")
+
+    def __init__(self, grams, post_offsets, postings, key_lens, key_at):
+        self.grams = grams
+        self.post_offsets = post_offsets
+        self.postings = postings
+        self.key_lens = key_lens
+        self.key_at = key_at
+
+    def __len__(self):
+        return len(self.key_lens)
+
+    @classmethod
+    def build(cls, keys, key_at=None):
+        keys = list(keys)
+        all_codes, all_ids = [], []
+        for start in range(0, len(keys), _CHUNK_KEYS):
+            codes, ids = _pairs_for_chunk(keys[start:start + _CHUNK_KEYS], start)
+            all_codes.append(codes)
+            all_ids.append(ids)
+        codes = np.concatenate(all_codes) if all_codes else np.zeros(0, np.int64)
+        ids = np.concatenate(all_ids) if all_ids else np.zeros(0, np.int32)
+        # chunks are id-disjoint, so a stable sort by code keeps ids ascending per bigram
+        order = np.argsort(codes, kind="stable")
+        codes, ids = codes[order], ids[order]
+        if len(codes):
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        else:
+            starts = np.zeros(0, np.int64)
+        grams = codes[starts]
+        post_offsets = np.r_[starts, len(codes)].astype(np.int64)
+        key_lens = np.fromiter((len(k) for k in keys), dtype=np.int32, count=len(keys))
+        return cls(grams, post_offsets, ids, key_lens, key_at or keys.__getitem__)
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        for name, arr in zip(self.FILES, (self.grams, self.post_offsets, self.postings, self.key_lens)):
+            np.save(os.path.join(index_dir, name), arr)
+
+    @classmethod
+    def load(cls, index_dir, key_at):
+        arrs = [np.load(os.path.join(index_dir, name), mmap_mode="r") for name in cls.FILES]
+        return cls(*arrs, key_at)
+
+    @classmethod
+    def exists(cls, index_dir):
+        return all(os.path.exists(os.path.join(index_dir, name)) for name in cls.FILES)
+
+    def _postings_of(self, code):
+        i = int(np.searchsorted(self.grams, code))
+        if i < len(self.grams) and self.grams[i] == code:
+            return self.postings[int(self.post_offsets[i]):int(self.post_offsets[i + 1])]
+        return None
+
+    def candidates(self, query, threshold):
+        """Sorted ids of keys that may reach `threshold`; a superset of the true matches."""
+        la = len(query)
+        t = threshold
+        # real_quick_ratio bound on the key length (widened by one for float safety)
+        lmin = max(1, math.floor(la * t / (2.0 - t)) - 1)
+        lmax = math.ceil(la * (2.0 - t) / t) + 1
+        # minimal number of shared bigrams over the admissible key lengths
+        need = None
+        for lb in range(lmin, lmax + 1):
+            total = la + lb
+            m_min = math.ceil(t * total / 2.0 - _EPS)
+            bound = 3 * m_min - total - 1
+            need = bound if need is None else min(need, bound)
+        n_q = la - 1
+        if need is None or need <= 0 or n_q <= 0:
+            ids = np.flatnonzero((self.key_lens >= lmin) & (self.key_lens <= lmax))
+            return ids
+        codes = _bigram_codes(_codepoints(query))
+        freqs = []
+        for code in codes.tolist():
+            post = self._postings_of(code)
+            freqs.append((0 if post is None else len(post), code, post))
+        freqs.sort(key=lambda x: x[0])
+        probe = freqs[:max(1, n_q - min(need, n_q) + 1)]
+        lists = {code: post for _, code, post in probe if post is not None}
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.unique(np.concatenate(list(lists.values())))
+        lens = self.key_lens[ids]
+        return ids[(lens >= lmin) & (lens <= lmax)]
+
+    def best_match(self, query, threshold):
+        """
+        Return (score, key) of the best key with ratio >= threshold, else (0.0, None).
+        Same decision as scanning every key with SequenceMatcher.
+        """
+        if not query or threshold <= 0:
+            return linear_best_match(query, (self.key_at(i) for i in range(len(self))), threshold)
+        sm = SequenceMatcher(None, query, "")
+        best_score, best_key = 0.0, None
+        for i in self.candidates(query, threshold).tolist():
+            k = self.key_at(i)
+            sm.set_seq2(k)
+            floor = max(threshold, best_score)
+            if sm.real_quick_ratio() < floor or sm.quick_ratio() < floor:
+                continue
+            s = sm.ratio()
+            if s > best_score and s >= threshold:
+                best_score, best_key = s, k
+        return (best_score, best_key) if best_key is not None else (0.0, None)
+
+def linear_best_match(query, keys, threshold):
+    """Reference implementation: the original full SequenceMatcher scan."""
+    best_score, best_key = 0.0, None
+    for k in keys:
+        s = SequenceMatcher(None, query, k).ratio()
+        if s > best_score:
+            best_score = s
+            best_key = k
+    if best_score >= threshold:
+        return (best_score, best_key)
+    return (0.0, None)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Input-hash incremental rebuilds.
+
+Per input JSON (cached under OUT_DIR/.cache/<input>/):
+    normalized.json   normalized entities + relations      keyed by the input's sha256
+    mapping.json      name -> lexicon mapping patch        keyed by sha256 + lexicon fingerprints
+Global aggregates (long-tail demotion, verbalization, outputs) depend on every input and are
+recomputed whenever any fingerprint changed; with nothing changed the outputs are left as is.
+Bump CACHE_VERSION when normalization or mapping rules change.
+"""
+import os, json, shutil, hashlib
+from .config import INPUT_JSONS, OUT_DIR, UMLS_ST_PATH, UMLS_CUI_PATH, SNOMED_PATH
+from .lexicon_store import source_fingerprint
+from .normalization import normalize_entities, long_tail_types, demote_long_tail
+from .mapping import assign_umls_semantic_type, load_lexicons, lexicon_mapping_for, apply_mapping_patch
+from .pipeline import load_input, relation_index, verbalize_entity, write_outputs, output_paths
+
+CACHE_VERSION = 1
+
+def file_digest(path, previous=None):
+    """{"size", "mtime_ns", "sha256"} of a file; the hash is reused when size and mtime match."""
+    if not os.path.exists(path):
+        return {"size": None, "mtime_ns": None, "sha256": None}
+    st = os.stat(path)
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return previous
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+
+def lexicon_fingerprints():
+    return {
+        os.path.basename(p): (source_fingerprint(p, "name") if os.path.exists(p) else None)
+        for p in (UMLS_ST_PATH, UMLS_CUI_PATH, SNOMED_PATH)
+    }
+
+def _slot_dir(cache_dir, path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{stem}-{tag}")
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def run_pipeline_incremental(input_jsons=None, out_dir=None):
+    """
+    Rebuild only what changed since the last run.
+    Returns (output paths, report) where report maps stage -> {"computed": [...], "skipped": [...]}.
+    """
+    input_jsons = input_jsons or INPUT_JSONS
+    out_dir = out_dir or OUT_DIR
+    cache_dir = os.path.join(out_dir, ".cache")
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    manifest = _read_json(manifest_path) or {}
+    if manifest.get("version") != CACHE_VERSION:
+        manifest = {}
+    prev_inputs = manifest.get("inputs", {})
+    lex_fp = lexicon_fingerprints()
+    report = {"normalize": {"computed": [], "skipped": []},
+              "mapping": {"computed": [], "skipped": []},
+              "aggregates": {"computed": [], "skipped": []}}
+
+    lexicons = None
+    entities_all, relations_all, patches, inputs = [], [], {}, {}
+    for p in input_jsons:
+        prev = prev_inputs.get(p, {})
+        digest = file_digest(p, prev.get("digest"))
+        same_input = prev.get("digest", {}).get("sha256") == digest["sha256"]
+        slot = _slot_dir(cache_dir, p)
+
+        # stage 1: load + normalize (per input)
+        norm_path = os.path.join(slot, "normalized.json")
+        cached = _read_json(norm_path) if same_input else None
+        if cached is not None:
+            ents, rels = cached["entities"], cached["relations"]
+            report["normalize"]["skipped"].append(p)
+        else:
+            ents, rels = load_input(p)
+            normalize_entities(ents)
+            _write_json(norm_path, {"entities": ents, "relations": rels})
+            report["normalize"]["computed"].append(p)
+
+        # stage 2: lexicon mapping patches (per input, per distinct name)
+        map_path = os.path.join(slot, "mapping.json")
+        cached = _read_json(map_path) if same_input and prev.get("lexicons") == lex_fp else None
+        if cached is not None:
+            report["mapping"]["skipped"].append(p)
+        else:
+            if lexicons is None:
+                lexicons = load_lexicons()
+            cached = {}
+            for e in ents:
+                name = e.get("name","")
+                if name and name not in cached:
+                    cached[name] = lexicon_mapping_for(name, lexicons)
+            _write_json(map_path, cached)
+            report["mapping"]["computed"].append(p)
+
+        entities_all.extend(ents)
+        relations_all.extend(rels)
+        patches.update(cached)
+        inputs[p] = {"digest": digest, "lexicons": lex_fp, "slot": os.path.basename(slot)}
+
+    # stage 3: global aggregates, only when some fingerprint changed
+    paths = output_paths(out_dir)
+    global_key = hashlib.sha256(json.dumps(
+        [CACHE_VERSION, [(p, inputs[p]["digest"]["sha256"]) for p in input_jsons], lex_fp],
+        sort_keys=True).encode("utf-8")).hexdigest()
+    if manifest.get("global") == global_key and all(os.path.exists(v) for v in paths.values()):
+        report["aggregates"]["skipped"].append(out_dir)
+    else:
+        rels_by_head, rels_by_tail = relation_index(relations_all)
+        long_tail, long_tail_cut = long_tail_types(entities_all)
+        for e in entities_all:
+            demote_long_tail(e, long_tail)
+            e["verbalization"] = verbalize_entity(e, rels_by_head, rels_by_tail)
+            assign_umls_semantic_type(e)
+            patch = patches.get(e.get("name",""))
+            if patch:
+                apply_mapping_patch(e, patch)
+        write_outputs(entities_all, relations_all, long_tail_cut, out_dir)
+        report["aggregates"]["computed"].append(out_dir)
+
+    # drop caches of inputs that are no longer configured
+    slots = {v["slot"] for v in inputs.values()}
+    if os.path.isdir(cache_dir):
+        for d in os.listdir(cache_dir):
+            if os.path.isdir(os.path.join(cache_dir, d)) and d not in slots:
+                shutil.rmtree(os.path.join(cache_dir, d), ignore_errors=True)
+    _write_json(manifest_path, {"version": CACHE_VERSION, "inputs": inputs, "global": global_key})
+    return paths, report
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-import os, json, pandas as pd
+import os, csv, json, pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 def safe_load_json(path):
     if not os.path.exists(path):
@@ -17,3 +19,199 @@ def save_parquet(df: pd.DataFrame, path: str):
 def save_csv(df: pd.DataFrame, path: str):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     df.to_csv(path, index=False, encoding="utf-8-sig")
+
+# ---------------------------
+# Streaming input
+# ---------------------------
+_WS = " \t\r\n"
+
+class _JsonReader:
+    """Pull parser over a text file: decodes one JSON value at a time from a refilled buffer."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf, self.pos, self.eof = "", 0, False
+        self.decoder = json.JSONDecoder()
+
+    def _more(self, n):
+        if self.eof:
+            return False
+        data = self.f.read(n)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more(self.chunk_size):
+                return ""
+
+    def take(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} near char {self.pos} of the buffer")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a value inside an object/array is always followed by , ] } or :
+                # (guards against numbers cut at the buffer end, e.g. "1." + "5")
+                j = end
+                while j < len(self.buf) and self.buf[j] in _WS:
+                    j += 1
+                if self.eof or (j < len(self.buf) and self.buf[j] in ",]}:"):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more(max(self.chunk_size, len(self.buf) - self.pos))
+
+def iter_json_arrays(path, keys=("entities", "relations"), chunk_size=1 << 20):
+    """
+    Yield (key, item) for the items of the top-level arrays `keys` of a JSON object file,
+    holding one item in memory at a time. Other members are parsed and dropped item by item.
+    Like safe_load_json, a missing file yields nothing; a malformed one stops the stream.
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            r = _JsonReader(f, chunk_size)
+            r.take("{")
+            if r.peek() == "}":
+                return
+            while True:
+                key = r.value()
+                r.take(":")
+                if r.peek() == "[":
+                    r.take("[")
+                    if r.peek() != "]":
+                        while True:
+                            item = r.value()
+                            if key in keys:
+                                yield key, item
+                            if r.peek() != ",":
+                                break
+                            r.take(",")
+                    r.take("]")
+                else:
+                    r.value()
+                if r.peek() != ",":
+                    break
+                r.take(",")
+            r.take("}")
+    except ValueError as e:
+        print(f"[kg_cleaner] stopped reading {path}: {e}")
+
+# ---------------------------
+# Streaming output
+# ---------------------------
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+_STR_MAP = pa.map_(pa.string(), pa.string())
+
+# explicit schemas: type-like columns are dictionary encoded, free-form dicts are string maps;
+# entity keys without a column land in `extra` (JSON-encoded values)
+ENTITY_SCHEMA = pa.schema([
+    ("name", pa.string()),
+    ("type", _CATEGORY),
+    ("type_original", _CATEGORY),
+    ("subTypeLabel", _CATEGORY),
+    ("demoted_reason", _CATEGORY),
+    ("description", pa.string()),
+    ("verbalization", pa.string()),
+    ("attributes", _STR_MAP),
+    ("umls_semantic_type", _CATEGORY),
+    ("umls_semantic_type_source", _CATEGORY),
+    ("umls_cui", pa.string()),
+    ("umls_pref_label", pa.string()),
+    ("umls_cui_source", _CATEGORY),
+    ("snomed_id", pa.string()),
+    ("snomed_fsn", pa.string()),
+    ("snomed_source", _CATEGORY),
+    ("extra", _STR_MAP),
+])
+
+RELATION_SCHEMA = pa.schema([
+    ("type", _CATEGORY),
+    ("from", pa.string()),
+    ("to", pa.string()),
+])
+
+def _as_str(v):
+    if v is None or isinstance(v, str):
+        return v
+    return json.dumps(v, ensure_ascii=False)
+
+def _as_map(d):
+    return [(str(k), _as_str(v)) for k, v in d.items()]
+
+def records_to_table(records, schema):
+    """Convert dicts to an Arrow table of `schema`, coercing scalars to strings."""
+    cols = [f.name for f in schema if f.name != "extra"]
+    known = set(cols)
+    arrays = []
+    for field in schema:
+        name = field.name
+        if name == "extra":
+            vals = []
+            for r in records:
+                extra = {k: v for k, v in r.items() if k not in known}
+                if "attributes" in known and r.get("attributes") is not None and not isinstance(r["attributes"], dict):
+                    extra["attributes"] = r["attributes"]
+                vals.append(_as_map(extra) if extra else None)
+            arrays.append(pa.array(vals, type=_STR_MAP))
+        elif field.type == _STR_MAP:
+            vals = [_as_map(r[name]) if isinstance(r.get(name), dict) else None for r in records]
+            arrays.append(pa.array(vals, type=_STR_MAP))
+        elif field.type == _CATEGORY:
+            vals = pa.array([_as_str(r.get(name)) for r in records], type=pa.string())
+            arrays.append(vals.dictionary_encode().cast(_CATEGORY))
+        else:
+            arrays.append(pa.array([_as_str(r.get(name)) for r in records], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+class ParquetBatchWriter:
+    """Append batches of dicts to a Parquet file, one row group per batch."""
+
+    def __init__(self, path, schema):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._writer = pq.ParquetWriter(path, schema)
+
+    def write(self, records):
+        if records:
+            self._writer.write_table(records_to_table(records, self.schema))
+            self.rows += len(records)
+
+    def close(self):
+        self._writer.close()
+
+class CsvBatchWriter:
+    """Append rows to a CSV with a fixed header (same encoding as save_csv)."""
+
+    def __init__(self, path, columns):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.DictWriter(self._f, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._f.close()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Compact on-disk lexicon index.
+
+A lexicon CSV (or Parquet) is grouped by its normalized key column once and written as
+    keys.bin / keys.idx.npy         sorted UTF-8 keys + offsets
+    records.bin / records.idx.npy   JSON array of records per key + offsets
+    meta.json                       source fingerprint (written last)
+All files are memory-mapped on load, so opening a store takes milliseconds and the pages
+are shared between processes. The index is rebuilt only when the source file changes.
+"""
+import os, json, mmap, shutil, hashlib
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from .config import LEX_INDEX_DIR
+from .fuzzy import NgramIndex
+
+STORE_VERSION = 1
+
+_OPEN_STORES = {}
+
+def _map_file(path):
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _write_blob(path, chunks):
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    if chunks:
+        np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    with open(path + ".bin", "wb") as f:
+        f.write(b"".join(chunks))
+    np.save(path + ".idx.npy", offsets)
+
+def source_fingerprint(path, key_col):
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "key_col": key_col,
+        "version": STORE_VERSION,
+    }
+
+def store_dir_for(path, key_col, index_dir=LEX_INDEX_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(index_dir, f"{stem}-{tag}.{key_col}")
+
+def read_lexicon_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def build_store_from_frame(df, key_col, store_dir, fingerprint=None):
+    """Group `df` by the normalized `key_col` and write the memory-mappable index."""
+    if key_col in df.columns:
+        # map(str) matches str(r[key_col]) of the old row loop, including NaN -> "nan"
+        keys = df[key_col].map(str).str.strip().str.lower()
+    else:
+        keys = pd.Series("", index=df.index, dtype=object)
+    mask = (keys != "").to_numpy()
+    recs = df.loc[mask, [c for c in df.columns if c != key_col]]
+    keys = keys.to_numpy(dtype=object)[mask]
+
+    # one JSON object per row, NaN -> null
+    if len(recs):
+        rows = recs.to_json(orient="records", lines=True, force_ascii=False, double_precision=15).splitlines()
+    else:
+        rows = []
+    # stable sort keeps the CSV order of records sharing a key (lex[key][0] is the first row)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    rows = np.asarray(rows, dtype=object)[order] if rows else np.asarray([], dtype=object)
+
+    if len(keys):
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    else:
+        starts = np.asarray([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)].astype(np.int64)
+
+    key_chunks = [keys[s].encode("utf-8") for s in starts]
+    rec_chunks = [("[" + ",".join(rows[s:e]) + "]").encode("utf-8") for s, e in zip(starts, ends)]
+
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    _write_blob(os.path.join(tmp_dir, "keys"), key_chunks)
+    _write_blob(os.path.join(tmp_dir, "records"), rec_chunks)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": fingerprint or {}, "num_keys": len(key_chunks), "num_records": int(len(rows))}, f)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return store_dir
+
+def build_lexicon_store(path, key_col, index_dir=LEX_INDEX_DIR):
+    store_dir = store_dir_for(path, key_col, index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    build_store_from_frame(read_lexicon_frame(path), key_col, store_dir,
+                           fingerprint=source_fingerprint(path, key_col))
+    return store_dir
+
+def _read_meta(store_dir):
+    try:
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class LexiconStore(Mapping):
+    """Read-only mapping `normalized name -> [record, ...]` backed by memory-mapped files."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.meta = _read_meta(store_dir) or {}
+        self._key_offsets = np.load(os.path.join(store_dir, "keys.idx.npy"), mmap_mode="r")
+        self._rec_offsets = np.load(os.path.join(store_dir, "records.idx.npy"), mmap_mode="r")
+        self._keys = _map_file(os.path.join(store_dir, "keys.bin"))
+        self._recs = _map_file(os.path.join(store_dir, "records.bin"))
+        self._fuzzy = None
+
+    def __len__(self):
+        return len(self._key_offsets) - 1
+
+    def key_at(self, i):
+        return self._keys[int(self._key_offsets[i]):int(self._key_offsets[i + 1])].decode("utf-8")
+
+    def records_at(self, i):
+        return json.loads(self._recs[int(self._rec_offsets[i]):int(self._rec_offsets[i + 1])])
+
+    def find(self, key):
+        """Binary search on the sorted UTF-8 keys (byte order == code point order); -1 if absent."""
+        target = key.encode("utf-8")
+        offs, blob = self._key_offsets, self._keys
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = blob[int(offs[mid]):int(offs[mid + 1])]
+            if k < target:
+                lo = mid + 1
+            elif k > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.find(key) >= 0
+
+    def __getitem__(self, key):
+        i = self.find(key) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self.records_at(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.key_at(i)
+
+    def fuzzy_index(self):
+        """Bigram index for fuzzy lookups, built on first use and persisted inside the store."""
+        if self._fuzzy is None:
+            ngram_dir = os.path.join(self.store_dir, "ngram")
+            if not NgramIndex.exists(ngram_dir):
+                tmp_dir = f"{ngram_dir}.tmp-{os.getpid()}"
+                NgramIndex.build(iter(self)).save(tmp_dir)
+                try:
+                    os.replace(tmp_dir, ngram_dir)
+                except OSError:
+                    # another process finished first
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._fuzzy = NgramIndex.load(ngram_dir, self.key_at)
+        return self._fuzzy
+
+def open_lexicon(path, key_col, index_dir=LEX_INDEX_DIR):
+    """
+    Return a LexiconStore for `path` keyed by `key_col`, building the index if it is
+    missing or the source file changed. Missing sources give an empty dict.
+    """
+    if not os.path.exists(path):
+        return {}
+    fingerprint = source_fingerprint(path, key_col)
+    store_dir = store_dir_for(path, key_col, index_dir)
+    cached = _OPEN_STORES.get(store_dir)
+    if cached is not None and cached.meta.get("source") == fingerprint:
+        return cached
+    meta = _read_meta(store_dir)
+    if not meta or meta.get("source") != fingerprint:
+        build_lexicon_store(path, key_col, index_dir)
+    store = LexiconStore(store_dir)
+    _OPEN_STORES[store_dir] = store
+    return store
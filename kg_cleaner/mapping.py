@@ -1,33 +1,24 @@
 # -*- coding: utf-8 -*-
-import os, re
-import pandas as pd
-from difflib import SequenceMatcher
 from .config import CANON_PARENT_TO_UMLS, UMLS_ST_PATH, UMLS_CUI_PATH, SNOMED_PATH
+from .lexicon_store import open_lexicon, LexiconStore
+from .fuzzy import linear_best_match
 
 def load_lexicon(path, key_col):
-    if not os.path.exists(path):
-        return {}
-    df = pd.read_csv(path)
-    d = {}
-    for _, r in df.iterrows():
-        k = str(r.get(key_col, "")).strip().lower()
-        if k:
-            d.setdefault(k, []).append({c: r[c] for c in df.columns if c != key_col})
-    return d
+    # memory-mapped index, (re)built from the CSV only when the CSV changes
+    return open_lexicon(path, key_col)
 
 def best_lexicon_match(name, lex, threshold=0.95):
     if not name: return (0.0, None)
     key = name.strip().lower()
     if key in lex:
         return (1.0, lex[key][0])
-    best_score, best_rec = 0.0, None
-    for k, recs in lex.items():
-        s = SequenceMatcher(None, key, k).ratio()
-        if s > best_score:
-            best_score = s
-            best_rec = recs[0]
-    if best_score >= threshold:
-        return (best_score, best_rec)
+    # same decision as a SequenceMatcher scan over all keys, but only scores pruned candidates
+    if isinstance(lex, LexiconStore):
+        best_score, best_key = lex.fuzzy_index().best_match(key, threshold)
+    else:
+        best_score, best_key = linear_best_match(key, lex, threshold)
+    if best_key is not None:
+        return (best_score, lex[best_key][0])
     return (0.0, None)
 
 def assign_umls_semantic_type(entity):
@@ -35,26 +26,49 @@ def assign_umls_semantic_type(entity):
     if parent in CANON_PARENT_TO_UMLS:
         entity["umls_semantic_type"] = CANON_PARENT_TO_UMLS[parent]
 
-def apply_lexicon_mapping(entities):
-    umls_st_lex = load_lexicon(UMLS_ST_PATH, "name")
-    umls_cui_lex = load_lexicon(UMLS_CUI_PATH, "name")
-    snomed_lex   = load_lexicon(SNOMED_PATH,  "name")
+def load_lexicons():
+    """(umls semantic types, umls concepts, snomed) lexicons keyed by normalized name."""
+    return (
+        load_lexicon(UMLS_ST_PATH, "name"),
+        load_lexicon(UMLS_CUI_PATH, "name"),
+        load_lexicon(SNOMED_PATH,  "name"),
+    )
+
+def lexicon_mapping_for(name, lexicons):
+    """Fields the lexicons assign to an entity called `name` (depends on the name only, so it can be cached)."""
+    umls_st_lex, umls_cui_lex, snomed_lex = lexicons
+    patch = {}
+    # semantic type override
+    sc, rec = best_lexicon_match(name, umls_st_lex, threshold=0.95)
+    if rec:
+        if "semantic_type" in rec or "tui" in rec:
+            patch["umls_semantic_type"] = rec.get("semantic_type", rec.get("tui"))
+        patch["umls_semantic_type_source"] = "lexicon-umls-st"
+    # umls cui
+    sc2, rec2 = best_lexicon_match(name, umls_cui_lex, threshold=0.95)
+    if rec2:
+        patch["umls_cui"] = rec2.get("cui")
+        patch["umls_pref_label"] = rec2.get("pref_label")
+        patch["umls_cui_source"] = "lexicon-umls-cui"
+    # snomed
+    sc3, rec3 = best_lexicon_match(name, snomed_lex, threshold=0.95)
+    if rec3:
+        patch["snomed_id"] = rec3.get("snomed_id")
+        patch["snomed_fsn"] = rec3.get("fsn")
+        patch["snomed_source"] = "lexicon-snomed"
+    return patch
+
+def apply_mapping_patch(e, patch):
+    if "umls_semantic_type_source" in patch and "umls_semantic_type" not in patch:
+        # record without semantic_type/tui keeps the rule-based type
+        e["umls_semantic_type"] = e.get("umls_semantic_type")
+    e.update(patch)
+
+def map_entity_to_lexicons(e, lexicons):
+    apply_mapping_patch(e, lexicon_mapping_for(e.get("name",""), lexicons))
+
+def apply_lexicon_mapping(entities, lexicons=None):
+    if lexicons is None:
+        lexicons = load_lexicons()
     for e in entities:
-        name = e.get("name","")
-        # semantic type override
-        sc, rec = best_lexicon_match(name, umls_st_lex, threshold=0.95)
-        if rec:
-            e["umls_semantic_type"] = rec.get("semantic_type", rec.get("tui", e.get("umls_semantic_type")))
-            e["umls_semantic_type_source"] = "lexicon-umls-st"
-        # umls cui
-        sc2, rec2 = best_lexicon_match(name, umls_cui_lex, threshold=0.95)
-        if rec2:
-            e["umls_cui"] = rec2.get("cui")
-            e["umls_pref_label"] = rec2.get("pref_label")
-            e["umls_cui_source"] = "lexicon-umls-cui"
-        # snomed
-        sc3, rec3 = best_lexicon_match(name, snomed_lex, threshold=0.95)
-        if rec3:
-            e["snomed_id"] = rec3.get("snomed_id")
-            e["snomed_fsn"] = rec3.get("fsn")
-            e["snomed_source"] = "lexicon-snomed"
\ No newline at end of file
+        map_entity_to_lexicons(e, lexicons)
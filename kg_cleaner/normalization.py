@@ -7,11 +7,25 @@ from .config import (
     ANATOMY_CN, ANATOMY_EN, TEMPORAL_CN, TEMPORAL_EN, PUNCTUATION_HINTS,
     NON_ENTITY_TYPE_PREFIXES, PARENT_RULES
 )
+from .rules import TypeRuleEngine, ROMAN_PATTERN, DEGREE_PATTERN, LOCATION_PATTERN, WITH_PATTERN
 
-ROMAN_PATTERN = re.compile(r"\b[ivx]{1,4}\b", re.I)
-DEGREE_PATTERN = re.compile(r"(一度|二度|三度|四度|I{1,3}|IV|V|ⅰ|ⅱ|ⅲ|ⅳ|ⅴ)", re.I)
-LOCATION_PATTERN = re.compile(r"\b(at|in|on|of)\b", re.I)
-WITH_PATTERN = re.compile(r"\bwith\b", re.I)
+TYPE_RULES = TypeRuleEngine(
+    token_groups={
+        "color": CN_COLOR + EN_COLOR,
+        "laterality": LATERALITY_CN + LATERALITY_EN,
+        "severity": SEVERITY_CN + SEVERITY_EN,
+        "anatomy": ANATOMY_CN + ANATOMY_EN,
+        "temporal": TEMPORAL_CN + TEMPORAL_EN,
+        "punct": PUNCTUATION_HINTS,
+    },
+    parent_rules=PARENT_RULES,
+    # priority: exact CT word boundary to avoid 'structure' false matches
+    priority_rules=[(re.compile(r"\bCT\b", re.I), "Medical Imaging Technique")],
+    fallback_rules=[
+        (re.compile(r"(wound|injur|burn)", re.I), "Injury or Poisoning"),
+        (re.compile(r"(procedure|术|操作)", re.I), "Medical Procedure"),
+    ],
+)
 
 def smart_title(s: str) -> str:
     parts = s.split(" ")
@@ -34,32 +48,10 @@ def has_any_token(s, tokens):
     return any(tok.lower() in s_lower for tok in tokens)
 
 def is_fine_grained(type_label: str) -> bool:
-    l = type_label.strip()
-    tokens = re.split(r"\s+", l)
-    long_phrase = len(tokens) >= 4
-    has_color = has_any_token(l, CN_COLOR + EN_COLOR)
-    has_laterality = has_any_token(l, LATERALITY_CN + LATERALITY_EN)
-    has_severity = has_any_token(l, SEVERITY_CN + SEVERITY_EN) or bool(ROMAN_PATTERN.search(l)) or bool(DEGREE_PATTERN.search(l))
-    has_anatomy = has_any_token(l, ANATOMY_CN + ANATOMY_EN)
-    has_temporal = has_any_token(l, TEMPORAL_CN + TEMPORAL_EN)
-    has_punct = any(p in l for p in PUNCTUATION_HINTS)
-    has_with = bool(WITH_PATTERN.search(l)) or bool(LOCATION_PATTERN.search(l))
-    score = sum([long_phrase, has_color, has_laterality, has_severity, has_anatomy, has_temporal, has_punct, has_with])
-    return score >= 2
+    return TYPE_RULES.is_fine_grained(type_label)
 
 def suggest_parent(type_label: str) -> str:
-    # priority: exact CT word boundary to avoid 'structure' false matches
-    if re.search(r"\bCT\b", type_label, re.I):
-        return "Medical Imaging Technique"
-    tl = type_label.lower()
-    for key, parent in PARENT_RULES:
-        if key.lower() in tl:
-            return parent
-    if re.search(r"(wound|injur|burn)", type_label, re.I):
-        return "Injury or Poisoning"
-    if re.search(r"(procedure|术|操作)", type_label, re.I):
-        return "Medical Procedure"
-    return "Thing"
+    return TYPE_RULES.suggest_parent(type_label)
 
 def demote_non_entity_types(entity):
     t = entity.get("type","") or ""
@@ -71,9 +63,11 @@ def demote_non_entity_types(entity):
             entity["type"] = "Thing"
             return
 
-def apply_long_tail_demote(entities):
-    # compute counts after normalization
-    type_counts = Counter([e.get("type","") for e in entities if e.get("type")])
+def long_tail_types(entities):
+    """Global pass: return (types that are long-tail, long_tail_cut) from counts after normalization."""
+    return long_tail_from_counts(Counter([e.get("type","") for e in entities if e.get("type")]))
+
+def long_tail_from_counts(type_counts):
     counts_sorted = sorted(type_counts.values())
     if counts_sorted:
         quantile_idx = max(0, min(len(counts_sorted)-1, int(len(counts_sorted)*LONG_TAIL_BOTTOM_QUANTILE)))
@@ -81,17 +75,21 @@ def apply_long_tail_demote(entities):
         long_tail_cut = max(LONG_TAIL_MAX_COUNT, quantile_cut)
     else:
         long_tail_cut = LONG_TAIL_MAX_COUNT
+    return {t for t, c in type_counts.items() if c <= long_tail_cut}, long_tail_cut
+
+def demote_long_tail(e, long_tail):
+    t = e.get("type","") or ""
+    if not t or t == "Thing":
+        return
+    if t in long_tail and is_fine_grained(t):
+        e["demoted_reason"] = "long_tail_fine_grained"
+        e["subTypeLabel"] = t
+        e["type"] = suggest_parent(t)
 
+def apply_long_tail_demote(entities):
+    long_tail, long_tail_cut = long_tail_types(entities)
     for e in entities:
-        t = e.get("type","") or ""
-        if not t or t == "Thing": 
-            continue
-        is_lt = type_counts[t] <= long_tail_cut
-        is_fg = is_fine_grained(t)
-        if is_lt and is_fg:
-            e["demoted_reason"] = "long_tail_fine_grained"
-            e["subTypeLabel"] = t
-            e["type"] = suggest_parent(t)
+        demote_long_tail(e, long_tail)
     return long_tail_cut
 
 def normalize_entities(entities):
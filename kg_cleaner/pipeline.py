@@ -1,14 +1,41 @@
 # -*- coding: utf-8 -*-
 import os
 import pandas as pd
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from .config import INPUT_JSONS, OUT_DIR
-from .io_utils import safe_load_json, save_parquet, save_csv
-from .normalization import normalize_entities, apply_long_tail_demote
-from .mapping import assign_umls_semantic_type, apply_lexicon_mapping
-from .stats import summarize_types
+from .io_utils import (
+    safe_load_json, save_parquet, save_csv, iter_json_arrays,
+    ParquetBatchWriter, CsvBatchWriter, ENTITY_SCHEMA, RELATION_SCHEMA
+)
+from .normalization import normalize_entities, long_tail_types, long_tail_from_counts, demote_long_tail
+from .mapping import assign_umls_semantic_type, apply_lexicon_mapping, load_lexicons, map_entity_to_lexicons
+from .lexicon_store import LexiconStore
+from .stats import summarize_types, type_counts_frame
 
-def verbalize_entity(e, rels_by_head, rels_by_tail, max_rels=3):
+MAX_VERBALIZED_RELS = 3
+UNMAPPED_COLUMNS = ["name", "type", "umls_semantic_type", "desc", "verbalization"]
+
+def normalize_relation(r):
+    return {
+        "type": r.get("type") or r.get("relation") or r.get("predicate"),
+        "from": r.get("from") or r.get("head") or r.get("subject"),
+        "to":   r.get("to")   or r.get("tail") or r.get("object"),
+    }
+
+def is_unmapped(e):
+    return not e.get("umls_semantic_type") or (not e.get("umls_cui") and not e.get("snomed_id"))
+
+def unmapped_row(e):
+    return {
+        "name": e.get("name",""),
+        "type": e.get("type",""),
+        "umls_semantic_type": e.get("umls_semantic_type",""),
+        "desc": e.get("description","") or "",
+        "verbalization": e.get("verbalization","") or ""
+    }
+
+def verbalize_entity(e, rels_by_head, rels_by_tail, max_rels=MAX_VERBALIZED_RELS):
     pieces = []
     nm = e.get("name","").strip()
     tp = e.get("type","").strip()
@@ -36,52 +63,78 @@ def verbalize_entity(e, rels_by_head, rels_by_tail, max_rels=3):
             pieces.append("属性: " + "; ".join(kv))
     return "；".join(pieces)
 
-def run_pipeline():
-    entities_all, relations_all = [], []
+# per-process state for the parallel mode, set once by _init_worker
+_WORKER = {}
 
-    # load all
-    for p in INPUT_JSONS:
-        obj = safe_load_json(p)
-        ents = obj.get("entities", [])
-        rels = obj.get("relations", [])
-        if isinstance(ents, list):
-            for e in ents:
-                if isinstance(e, dict):
-                    entities_all.append(e)
-        if isinstance(rels, list):
-            for r in rels:
-                if isinstance(r, dict):
-                    relations_all.append({
-                        "type": r.get("type") or r.get("relation") or r.get("predicate"),
-                        "from": r.get("from") or r.get("head") or r.get("subject"),
-                        "to":   r.get("to")   or r.get("tail") or r.get("object"),
-                    })
+def _init_worker(rels_by_head, rels_by_tail, long_tail):
+    _WORKER["rels_by_head"] = rels_by_head
+    _WORKER["rels_by_tail"] = rels_by_tail
+    _WORKER["long_tail"] = long_tail
+    # memory-mapped stores: every worker maps the same index files read-only
+    _WORKER["lexicons"] = load_lexicons()
 
-    # idx for verbalization
-    from collections import defaultdict
-    rels_by_head, rels_by_tail = defaultdict(list), defaultdict(list)
-    for r in relations_all:
-        if r.get("from"): rels_by_head[r["from"]].append(r)
-        if r.get("to"):   rels_by_tail[r["to"]].append(r)
+def _process_chunk(chunk):
+    w = _WORKER
+    for e in chunk:
+        demote_long_tail(e, w["long_tail"])
+        e["verbalization"] = verbalize_entity(e, w["rels_by_head"], w["rels_by_tail"])
+        assign_umls_semantic_type(e)
+        map_entity_to_lexicons(e, w["lexicons"])
+    return chunk
 
-    # step 1: normalization & demotion
-    normalize_entities(entities_all)
-    long_tail_cut = apply_long_tail_demote(entities_all)
+def _process_parallel(entities, rels_by_head, rels_by_tail, long_tail, workers, chunk_size):
+    # only the first MAX_VERBALIZED_RELS relations per name are ever read
+    heads = {k: v[:MAX_VERBALIZED_RELS] for k, v in rels_by_head.items()}
+    tails = {k: v[:MAX_VERBALIZED_RELS] for k, v in rels_by_tail.items()}
+    # build missing lexicon/fuzzy indexes once here instead of racing in every worker
+    for lex in load_lexicons():
+        if isinstance(lex, LexiconStore):
+            lex.fuzzy_index()
+    chunks = [entities[i:i + chunk_size] for i in range(0, len(entities), chunk_size)]
+    out = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(heads, tails, long_tail)) as ex:
+        # map() yields in submission order, so the output order matches the serial run
+        for chunk in ex.map(_process_chunk, chunks):
+            out.extend(chunk)
+    return out
 
-    # step 2: verbalization & semantic type (coarse)
-    for e in entities_all:
-        e["verbalization"] = verbalize_entity(e, rels_by_head, rels_by_tail)
-        assign_umls_semantic_type(e)
+def output_paths(out_dir=None):
+    out_dir = out_dir or OUT_DIR
+    return {
+        "entities_path": f"{out_dir}/out_entities.parquet",
+        "relations_path": f"{out_dir}/out_relations.parquet",
+        "summary_path": f"{out_dir}/summary.csv",
+        "type_counts_path": f"{out_dir}/type_counts.csv",
+        "unmapped_path": f"{out_dir}/unmapped_entities.csv",
+    }
 
-    # step 3: concept mapping via lexicons (optional)
-    apply_lexicon_mapping(entities_all)
+def load_input(path):
+    """Entities (as-is) and normalized relations of one input JSON."""
+    obj = safe_load_json(path)
+    ents = obj.get("entities", [])
+    rels = obj.get("relations", [])
+    entities, relations = [], []
+    if isinstance(ents, list):
+        entities = [e for e in ents if isinstance(e, dict)]
+    if isinstance(rels, list):
+        relations = [normalize_relation(r) for r in rels if isinstance(r, dict)]
+    return entities, relations
+
+def relation_index(relations):
+    rels_by_head, rels_by_tail = defaultdict(list), defaultdict(list)
+    for r in relations:
+        if r.get("from"): rels_by_head[r["from"]].append(r)
+        if r.get("to"):   rels_by_tail[r["to"]].append(r)
+    return rels_by_head, rels_by_tail
 
-    # outputs
-    os.makedirs(OUT_DIR, exist_ok=True)
+def write_outputs(entities_all, relations_all, long_tail_cut, out_dir=None):
+    paths = output_paths(out_dir)
+    os.makedirs(os.path.dirname(paths["entities_path"]), exist_ok=True)
     ents_df = pd.DataFrame(entities_all)
     rels_df = pd.DataFrame(relations_all)
-    save_parquet(ents_df, f"{OUT_DIR}/out_entities.parquet")
-    save_parquet(rels_df, f"{OUT_DIR}/out_relations.parquet")
+    save_parquet(ents_df, paths["entities_path"])
+    save_parquet(rels_df, paths["relations_path"])
 
     # summary
     type_df = summarize_types(entities_all)
@@ -89,26 +142,173 @@ def run_pipeline():
         "metric": ["entities","relations","unique_types_after","long_tail_cut"],
         "value": [len(ents_df), len(rels_df), type_df.shape[0], long_tail_cut]
     })
-    save_csv(summary, f"{OUT_DIR}/summary.csv")
-    save_csv(type_df, f"{OUT_DIR}/type_counts.csv")
+    save_csv(summary, paths["summary_path"])
+    save_csv(type_df, paths["type_counts_path"])
 
     # unmapped list
-    unmapped = []
-    for e in entities_all:
-        if not e.get("umls_semantic_type") or (not e.get("umls_cui") and not e.get("snomed_id")):
-            unmapped.append({
-                "name": e.get("name",""),
-                "type": e.get("type",""),
-                "umls_semantic_type": e.get("umls_semantic_type",""),
-                "desc": e.get("description","") or "",
-                "verbalization": e.get("verbalization","") or ""
-            })
-    save_csv(pd.DataFrame(unmapped), f"{OUT_DIR}/unmapped_entities.csv")
+    unmapped = [unmapped_row(e) for e in entities_all if is_unmapped(e)]
+    save_csv(pd.DataFrame(unmapped), paths["unmapped_path"])
+    return paths
 
-    return {
-        "entities_path": f"{OUT_DIR}/out_entities.parquet",
-        "relations_path": f"{OUT_DIR}/out_relations.parquet",
-        "summary_path": f"{OUT_DIR}/summary.csv",
-        "type_counts_path": f"{OUT_DIR}/type_counts.csv",
-        "unmapped_path": f"{OUT_DIR}/unmapped_entities.csv",
-    }
\ No newline at end of file
+def run_pipeline(workers=1, chunk_size=2000, stream=False, batch_size=10000,
+                 input_jsons=None, out_dir=None):
+    """
+    workers > 1 fans the per-entity steps (long-tail demotion, verbalization, semantic type,
+    lexicon mapping) out over a process pool in chunks of `chunk_size`; workers <= 0 uses
+    all CPUs. Global statistics are computed once in the parent. Output is identical to the
+    serial run.
+
+    stream=True never holds the corpus in memory; see run_pipeline_streaming.
+    input_jsons / out_dir default to config.INPUT_JSONS / config.OUT_DIR.
+    """
+    input_jsons = input_jsons or INPUT_JSONS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if stream:
+        return run_pipeline_streaming(workers=workers, batch_size=batch_size,
+                                      input_jsons=input_jsons, out_dir=out_dir)
+    entities_all, relations_all = [], []
+
+    # load all
+    for p in input_jsons:
+        ents, rels = load_input(p)
+        entities_all.extend(ents)
+        relations_all.extend(rels)
+
+    # idx for verbalization
+    rels_by_head, rels_by_tail = relation_index(relations_all)
+
+    # step 1: normalization & global long-tail statistics
+    normalize_entities(entities_all)
+    long_tail, long_tail_cut = long_tail_types(entities_all)
+
+    if workers > 1 and len(entities_all) > chunk_size:
+        # steps 1-3 per entity, in worker processes
+        entities_all = _process_parallel(entities_all, rels_by_head, rels_by_tail,
+                                         long_tail, workers, chunk_size)
+    else:
+        for e in entities_all:
+            demote_long_tail(e, long_tail)
+
+        # step 2: verbalization & semantic type (coarse)
+        for e in entities_all:
+            e["verbalization"] = verbalize_entity(e, rels_by_head, rels_by_tail)
+            assign_umls_semantic_type(e)
+
+        # step 3: concept mapping via lexicons (optional)
+        apply_lexicon_mapping(entities_all)
+
+    return write_outputs(entities_all, relations_all, long_tail_cut, out_dir)
+
+def _iter_inputs(input_jsons, key):
+    for p in input_jsons:
+        for k, item in iter_json_arrays(p, keys=(key,)):
+            if isinstance(item, dict):
+                yield item
+
+def _batches(items, size):
+    batch = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bounded_map(ex, fn, batches, max_pending):
+    """Executor.map that keeps at most `max_pending` batches in flight (results in order)."""
+    pending = deque()
+    for b in batches:
+        pending.append(ex.submit(fn, b))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def run_pipeline_streaming(workers=1, batch_size=10000, input_jsons=None, out_dir=None):
+    """
+    Same outputs as run_pipeline, with peak memory bounded by the batch size:
+
+    pass 1  streams every input once: type counts after normalization (-> long-tail set),
+            relation index capped at MAX_VERBALIZED_RELS per name, relations -> Parquet
+    pass 2  streams the entities again in batches of `batch_size`, runs the per-entity steps
+            (in `workers` processes, at most 2 * workers batches in flight) and appends each
+            batch as a Parquet row group (ENTITY_SCHEMA) and to unmapped_entities.csv
+
+    Only the distinct types and the capped relation index grow with the corpus.
+    """
+    input_jsons = input_jsons or INPUT_JSONS
+    paths = output_paths(out_dir)
+    os.makedirs(os.path.dirname(paths["entities_path"]), exist_ok=True)
+
+    # pass 1: global statistics
+    type_counts = Counter()
+    rels_by_head, rels_by_tail = defaultdict(list), defaultdict(list)
+    rel_writer = ParquetBatchWriter(paths["relations_path"], RELATION_SCHEMA)
+    try:
+        for p in input_jsons:
+            rel_batch = []
+            for key, item in iter_json_arrays(p):
+                if not isinstance(item, dict):
+                    continue
+                if key == "entities":
+                    normalize_entities([item])
+                    if item.get("type"):
+                        type_counts[item["type"]] += 1
+                    continue
+                r = normalize_relation(item)
+                rel_batch.append(r)
+                if r.get("from") and len(rels_by_head[r["from"]]) < MAX_VERBALIZED_RELS:
+                    rels_by_head[r["from"]].append(r)
+                if r.get("to") and len(rels_by_tail[r["to"]]) < MAX_VERBALIZED_RELS:
+                    rels_by_tail[r["to"]].append(r)
+                if len(rel_batch) >= batch_size:
+                    rel_writer.write(rel_batch)
+                    rel_batch = []
+            rel_writer.write(rel_batch)
+    finally:
+        rel_writer.close()
+    long_tail, long_tail_cut = long_tail_from_counts(type_counts)
+
+    # pass 2: per-entity work in bounded batches
+    final_counts = Counter()
+    ent_writer = ParquetBatchWriter(paths["entities_path"], ENTITY_SCHEMA)
+    unmapped_writer = CsvBatchWriter(paths["unmapped_path"], UNMAPPED_COLUMNS)
+
+    def consume(batch):
+        ent_writer.write(batch)
+        unmapped_writer.write([unmapped_row(e) for e in batch if is_unmapped(e)])
+        final_counts.update(e["type"] for e in batch if e.get("type"))
+
+    def normalized(batches):
+        for b in batches:
+            normalize_entities(b)
+            yield b
+
+    try:
+        batches = normalized(_batches(_iter_inputs(input_jsons, "entities"), batch_size))
+        if workers > 1:
+            for lex in load_lexicons():
+                if isinstance(lex, LexiconStore):
+                    lex.fuzzy_index()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(rels_by_head, rels_by_tail, long_tail)) as ex:
+                for batch in _bounded_map(ex, _process_chunk, batches, 2 * workers):
+                    consume(batch)
+        else:
+            _init_worker(rels_by_head, rels_by_tail, long_tail)
+            for batch in batches:
+                consume(_process_chunk(batch))
+    finally:
+        ent_writer.close()
+        unmapped_writer.close()
+
+    type_df = type_counts_frame(final_counts)
+    summary = pd.DataFrame({
+        "metric": ["entities","relations","unique_types_after","long_tail_cut"],
+        "value": [ent_writer.rows, rel_writer.rows, type_df.shape[0], long_tail_cut]
+    })
+    save_csv(summary, paths["summary_path"])
+    save_csv(type_df, paths["type_counts_path"])
+    return paths
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled type-label rules shared by kg_cleaner and the utils cleaning scripts.
+
+All substring token lists (fine-grained hints) and substring parent rules are compiled into
+Aho-Corasick automata, so one pass over the lower-cased label finds every token, overlapping
+ones included. Decisions are memoized per type label: there are far fewer distinct labels
+than entities.
+"""
+import re
+
+ROMAN_PATTERN = re.compile(r"\b[ivx]{1,4}\b", re.I)
+DEGREE_PATTERN = re.compile(r"(一度|二度|三度|四度|I{1,3}|IV|V|ⅰ|ⅱ|ⅲ|ⅳ|ⅴ)", re.I)
+LOCATION_PATTERN = re.compile(r"\b(at|in|on|of)\b", re.I)
+WITH_PATTERN = re.compile(r"\bwith\b", re.I)
+
+# regex signals OR-ed into a token group (or standing alone when the group has no tokens)
+DEFAULT_PATTERN_SIGNALS = {
+    "severity": (ROMAN_PATTERN, DEGREE_PATTERN),
+    "with": (WITH_PATTERN, LOCATION_PATTERN),
+}
+
+class AhoCorasick:
+    """Multi-pattern substring matcher returning the labels of every pattern found."""
+
+    def __init__(self, patterns):
+        # patterns: iterable of (pattern, label)
+        self._goto = [{}]
+        self._out = [set()]
+        for pattern, label in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(set())
+                node = nxt
+            self._out[node].add(label)
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        while queue:
+            nxt_queue = []
+            for node in queue:
+                for ch, child in self._goto[node].items():
+                    f = self._fail[node]
+                    while f and ch not in self._goto[f]:
+                        f = self._fail[f]
+                    fc = self._goto[f].get(ch, 0)
+                    self._fail[child] = fc if fc != child else 0
+                    self._out[child] |= self._out[self._fail[child]]
+                    nxt_queue.append(child)
+            queue = nxt_queue
+
+    def labels_in(self, text):
+        found = set()
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+class TypeRuleEngine:
+    """
+    Fine-grained detection and parent suggestion for type labels.
+
+    token_groups     {signal: [token, ...]}   case-insensitive substring hints, one point per signal
+    parent_rules     [(substring, parent)]    first rule (in list order) contained in the label wins
+    priority_rules   [(regex, parent)]        checked before parent_rules
+    fallback_rules   [(regex, parent)]        checked after parent_rules
+    """
+
+    def __init__(self, token_groups, parent_rules=(), priority_rules=(), fallback_rules=(),
+                 pattern_signals=DEFAULT_PATTERN_SIGNALS, default_parent="Thing", min_score=2):
+        self.signals = list(dict.fromkeys(list(token_groups) + list(pattern_signals)))
+        self.pattern_signals = dict(pattern_signals)
+        self.parent_rules = list(parent_rules)
+        self.priority_rules = list(priority_rules)
+        self.fallback_rules = list(fallback_rules)
+        self.default_parent = default_parent
+        self.min_score = min_score
+        self._tokens = AhoCorasick(
+            (tok.lower(), group) for group, toks in token_groups.items() for tok in toks
+        )
+        self._parents = AhoCorasick((key.lower(), i) for i, (key, _) in enumerate(self.parent_rules))
+        self._fine_memo = {}
+        self._parent_memo = {}
+
+    def fine_grained_score(self, type_label):
+        l = type_label.strip()
+        groups = self._tokens.labels_in(l.lower())
+        score = int(len(re.split(r"\s+", l)) >= 4)
+        for signal in self.signals:
+            if signal in groups or any(p.search(l) for p in self.pattern_signals.get(signal, ())):
+                score += 1
+        return score
+
+    def is_fine_grained(self, type_label):
+        hit = self._fine_memo.get(type_label)
+        if hit is None:
+            hit = self._fine_memo[type_label] = self.fine_grained_score(type_label) >= self.min_score
+        return hit
+
+    def _suggest_parent(self, type_label):
+        for patt, parent in self.priority_rules:
+            if patt.search(type_label):
+                return parent
+        hits = self._parents.labels_in(type_label.lower())
+        if hits:
+            return self.parent_rules[min(hits)][1]
+        for patt, parent in self.fallback_rules:
+            if patt.search(type_label):
+                return parent
+        return self.default_parent
+
+    def suggest_parent(self, type_label):
+        parent = self._parent_memo.get(type_label)
+        if parent is None:
+            parent = self._parent_memo[type_label] = self._suggest_parent(type_label)
+        return parent
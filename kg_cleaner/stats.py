@@ -2,7 +2,9 @@
 from collections import Counter
 import pandas as pd
 
+def type_counts_frame(counts):
+    return pd.DataFrame(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])), columns=["type","count"])
+
 def summarize_types(entities):
     counts = Counter([e.get("type","") for e in entities if e.get("type")])
-    df = pd.DataFrame(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])), columns=["type","count"])
-    return df
\ No newline at end of file
+    return type_counts_frame(counts)
@@ -1,5 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+UMLS RRF -> 词表 (Parquet) + kg_cleaner.mapping 直接使用的精确/模糊索引
+
+    python -m kg_cleaner.utils --langs ENG CHI --workers 4
+
+MRCONSO 只读一遍：按字节块切分（可并行解析），每块同时分发给所有 LANGS。
+"""
+import os, io, csv, argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from collections import defaultdict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .config import LEX_INDEX_DIR
+from .lexicon_store import build_lexicon_store, LexiconStore
 
 # 必填：RRF 文件路径
 MRCONSO = "umls_data/MRCONSO.RRF"
@@ -7,62 +21,205 @@ MRSTY   = "umls_data/MRSTY.RRF"
 
 OUT_DIR = "data/lexicons"  # 输出目录
 LANGS = ["ENG", "CHI"]          # 需要的语言子集，按需改
+BLOCK_MB = 64                   # 每个解析块的大小（按行边界对齐）
+
+CONCEPT_COLS = ["name","cui","pref_label","semantic_type","tui","sab","tty","code"]
+SNOMED_COLS = ["name","snomed_id","fsn","semantic_tag","cui","tui","semantic_type"]
+# 低基数列使用 Parquet 字典编码
+DICT_COLS = ["semantic_type","tui","sab","tty","fsn","semantic_tag"]
+
+# RRF 无引号转义；na_filter=False 保留空串与 "NA" 之类的原文
+_RRF = dict(sep="|", header=None, dtype=str, quoting=csv.QUOTE_NONE, na_filter=False)
+
+_STY = None  # CUI -> tui / semantic_type（每个进程一份）
+
+def load_sty_map(path):
+    """MRSTY -> DataFrame(index=CUI, columns=[tui, semantic_type])，多值按字典序 ';' 拼接"""
+    sty = pd.read_csv(path, usecols=[0,1,3], names=["CUI","TUI","STY"], **_RRF)
+    cols = {}
+    for src, dst in (("TUI", "tui"), ("STY", "semantic_type")):
+        s = sty[["CUI", src]].drop_duplicates().sort_values(["CUI", src])
+        cols[dst] = s.groupby("CUI", sort=False)[src].agg(";".join)
+    return pd.DataFrame(cols)
+
+def _init_sty(sty_map):
+    global _STY
+    _STY = sty_map
+
+def byte_ranges(path, block_bytes):
+    """按行边界对齐的 [start, end) 字节区间"""
+    size = os.path.getsize(path)
+    ranges, start = [], 0
+    with open(path, "rb") as f:
+        while start < size:
+            end = min(size, start + block_bytes)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def process_range(args):
+    """解析 MRCONSO 的一个字节块，返回 {lang: (concepts, snomed)}"""
+    path, start, end, langs = args
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = pd.read_csv(io.BytesIO(data), usecols=[0,1,11,12,13,14,15,16],
+                        names=["CUI","LAT","SAB","TTY","CODE","STR","SRL","SUPPRESS"], **_RRF)
+    chunk = chunk[chunk["LAT"].isin(langs)]
+    # 合并语义类型：按 CUI 向量化 join
+    sty = chunk[["CUI"]].join(_STY, on="CUI")
+    df = pd.DataFrame({
+        "name": chunk["STR"].str.strip().str.lower(),
+        "cui": chunk["CUI"],
+        "pref_label": "",   # 简化起见，这里留空；如需 ENG/PT，可额外跑一遍 ENG/PT 提取
+        "semantic_type": sty["semantic_type"].fillna(""),
+        "tui": sty["tui"].fillna(""),
+        "sab": chunk["SAB"],
+        "tty": chunk["TTY"],
+        "code": chunk["CODE"],
+    })
+    out = {}
+    for lang, part in df.groupby(chunk["LAT"], sort=False):
+        # 生成 SNOMED 子集（可选）
+        sn = part[part["sab"].str.startswith("SNOMEDCT")]
+        snomed = pd.DataFrame({
+            "name": sn["name"], "snomed_id": sn["code"],
+            "fsn": "",            # 若要 FSN，可在 MRCONSO 中筛 TTY=FN 再 merge
+            "semantic_tag": "",   # 若从 FSN 拆 tag，可在后处理里补
+            "cui": sn["cui"], "tui": sn["tui"], "semantic_type": sn["semantic_type"],
+        }, columns=SNOMED_COLS)
+        out[lang] = (part.reset_index(drop=True), snomed.reset_index(drop=True))
+    return out
+
+def _bounded_map(ex, fn, items, max_pending):
+    pending = deque()
+    for it in items:
+        pending.append(ex.submit(fn, it))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _schema(cols):
+    return pa.schema([(c, pa.string()) for c in cols])
 
-# 读取 MRSTY（CUI -> {TUI, STY} 多值）
-sty = pd.read_csv(MRSTY, sep="|", header=None, dtype=str, usecols=[0,1,3],
-                  names=["CUI","TUI","STY"])
-sty_grp = sty.groupby("CUI").agg({"TUI": lambda x: list(set(x)), "STY": lambda x: list(set(x))})
-
-def process_lang(lang):
-    print(f"Processing language: {lang}")
-    iter_csv = pd.read_csv(
-        MRCONSO, sep="|", header=None, dtype=str, chunksize=500000,
-        usecols=[0,1,11,12,13,14,15,16],
-        names=["CUI","LAT","SAB","TTY","CODE","STR","SRL","SUPPRESS"]
-    )
-    rows = []
-    for chunk in iter_csv:
-        df = chunk[chunk["LAT"] == lang].copy()
-        df["name"] = df["STR"].astype(str).str.strip().str.lower()
-        df["cui"] = df["CUI"]
-        df["sab"] = df["SAB"]
-        df["tty"] = df["TTY"]
-        df["code"] = df["CODE"]
-
-        # 合并语义类型
-        df = df.merge(sty_grp, how="left", left_on="cui", right_on="CUI")
-        df.drop(columns=["CUI"], inplace=True)
-        # 取一个“pref_label”：优先该 CUI 的 ENG/PT；如果当前 lang 是 CHI，没有 ENG/PT 就用当前 name
-        # 先为所有 CUI 找 ENG/PT（一次性建立索引，避免重复扫描）
-        rows.append(df[["name","cui","sab","tty","code","TUI","STY"]])
-
-    df_all = pd.concat(rows, ignore_index=True)
-    # 生成 concepts 词表（name -> 多 CUI）
-    df_all["tui"] = df_all["TUI"].apply(lambda x: ";".join(x) if isinstance(x, list) else "")
-    df_all["semantic_type"] = df_all["STY"].apply(lambda x: ";".join(x) if isinstance(x, list) else "")
-    df_all["pref_label"] = ""  # 简化起见，这里留空；如需 ENG/PT，可额外跑一遍 ENG/PT 提取
-    out_path = f"{OUT_DIR}/umls_concepts_{lang.lower()}.csv"
-    df_all[["name","cui","pref_label","semantic_type","tui","sab","tty","code"]].to_csv(out_path, index=False, encoding="utf-8-sig")
-    print("saved:", out_path)
+class _Writer:
+    def __init__(self, path, cols):
+        self.path, self.cols = path, cols
+        self.schema = _schema(cols)
+        self.w = pq.ParquetWriter(path, self.schema, use_dictionary=[c for c in cols if c in DICT_COLS])
+
+    def write(self, df):
+        if len(df):
+            self.w.write_table(pa.Table.from_pandas(df[self.cols], schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.w.close()
+
+def aggregate_semantic_types(parts):
+    """name -> 该 name 所有 CUI 的 semantic_type / tui 去重排序后 ';' 拼接"""
+    df = pd.concat(parts, ignore_index=True).drop_duplicates() if parts else \
+        pd.DataFrame(columns=["name","semantic_type","tui"], dtype=str)
+    names = pd.Index(sorted(df["name"].unique()), name="name")
+    out = pd.DataFrame(index=names)
+    for col in ("semantic_type", "tui"):
+        s = df[["name", col]].assign(**{col: df[col].str.split(";")}).explode(col)
+        s = s[s[col].notna() & (s[col] != "")].drop_duplicates().sort_values(["name", col])
+        out[col] = s.groupby("name")[col].agg(";".join)
+    return out.fillna("").reset_index()
+
+def merge_semantic_types(agg, part):
+    """
+    把一个块的 (name, semantic_type, tui) 并入按 name 聚合的运行结果（index=name），
+    只重算两边都有的 name；内存随不同 name 数增长，而不是随 MRCONSO 行数
+    """
+    part = aggregate_semantic_types([part]).set_index("name")
+    if agg is None:
+        return part
+    both = part.index.intersection(agg.index)
+    if len(both):
+        merged = aggregate_semantic_types([agg.loc[both].reset_index(), part.loc[both].reset_index()])
+        agg.loc[both] = merged.set_index("name")
+    return pd.concat([agg, part.loc[part.index.difference(agg.index)]])
+
+def build_umls_lexicons(mrconso=MRCONSO, mrsty=MRSTY, out_dir=OUT_DIR, langs=LANGS,
+                        workers=1, block_mb=BLOCK_MB, index_dir=LEX_INDEX_DIR, build_index=True):
+    os.makedirs(out_dir, exist_ok=True)
+    print("Loading MRSTY ...")
+    sty_map = load_sty_map(mrsty)
+    _init_sty(sty_map)
+
+    paths = {}
+    writers = {}
+    st_agg = {lang: None for lang in langs}
+    for lang in langs:
+        l = lang.lower()
+        paths[lang] = {
+            "concepts": f"{out_dir}/umls_concepts_{l}.parquet",
+            "semantic_types": f"{out_dir}/umls_semantic_types_{l}.parquet",
+            "snomed": f"{out_dir}/snomed_concepts_{l}.parquet",
+        }
+        writers[lang] = (_Writer(paths[lang]["concepts"], CONCEPT_COLS), _Writer(paths[lang]["snomed"], SNOMED_COLS))
+
+    tasks = [(mrconso, s, e, list(langs)) for s, e in byte_ranges(mrconso, block_mb << 20)]
+    print(f"Processing {len(tasks)} blocks of MRCONSO for {', '.join(langs)} (workers={workers})")
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sty, initargs=(sty_map,)) as ex:
+                results = _bounded_map(ex, process_range, tasks, 2 * workers)
+                for out in results:
+                    _consume(out, writers, st_agg)
+        else:
+            for t in tasks:
+                _consume(process_range(t), writers, st_agg)
+    finally:
+        for cw, sw in writers.values():
+            cw.close()
+            sw.close()
 
     # 生成 semantic_types（name -> STY/TUI），按 name 聚合
-    agg = df_all.groupby("name").agg({
-        "semantic_type": lambda x: ";".join(sorted(set(";".join(x).split(";")) - {""})),
-        "tui": lambda x: ";".join(sorted(set(";".join(x).split(";")) - {""}))
-    }).reset_index()
-    out2 = f"{OUT_DIR}/umls_semantic_types_{lang.lower()}.csv"
-    agg.rename(columns={"semantic_type":"semantic_type","tui":"tui"}, inplace=True)
-    agg.to_csv(out2, index=False, encoding="utf-8-sig")
-    print("saved:", out2)
-
-    # 生成 SNOMED 子集（可选）
-    snomed = df_all[df_all["sab"].str.startswith("SNOMEDCT", na=False)].copy()
-    snomed["snomed_id"] = snomed["code"]
-    snomed["fsn"] = ""             # 若要 FSN，可在 MRCONSO 中筛 TTY=FN 再 merge
-    snomed["semantic_tag"] = ""    # 若从 FSN 拆 tag，可在后处理里补
-    out3 = f"{OUT_DIR}/snomed_concepts_{lang.lower()}.csv"
-    snomed[["name","snomed_id","fsn","semantic_tag","cui","tui","semantic_type"]].to_csv(out3, index=False, encoding="utf-8-sig")
-    print("saved:", out3)
-
-for L in LANGS:
-    process_lang(L)
+    for lang in langs:
+        agg = st_agg.pop(lang)
+        agg = aggregate_semantic_types([]) if agg is None else agg.sort_index().rename_axis("name").reset_index()
+        w = _Writer(paths[lang]["semantic_types"], ["name","semantic_type","tui"])
+        w.write(agg)
+        w.close()
+        for kind, p in paths[lang].items():
+            print("saved:", p)
+
+    if build_index:
+        # kg_cleaner.mapping 使用的精确索引 + bigram 模糊索引（open_lexicon 直接复用）
+        for lang in langs:
+            for p in paths[lang].values():
+                store = LexiconStore(build_lexicon_store(p, "name", index_dir))
+                store.fuzzy_index()
+                print("indexed:", p, "->", store.store_dir)
+    return paths
+
+def _consume(out, writers, st_agg):
+    for lang, (concepts, snomed) in out.items():
+        cw, sw = writers[lang]
+        cw.write(concepts)
+        sw.write(snomed)
+        st_agg[lang] = merge_semantic_types(st_agg[lang], concepts[["name","semantic_type","tui"]])
+
+def main():
+    ap = argparse.ArgumentParser(description="Build UMLS/SNOMED lexicons from RRF files")
+    ap.add_argument("--mrconso", default=MRCONSO)
+    ap.add_argument("--mrsty", default=MRSTY)
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--langs", nargs="+", default=LANGS)
+    ap.add_argument("--workers", type=int, default=1, help="parse MRCONSO blocks in N processes")
+    ap.add_argument("--block-mb", type=int, default=BLOCK_MB)
+    ap.add_argument("--index-dir", default=LEX_INDEX_DIR)
+    ap.add_argument("--no-index", action="store_true", help="skip building the lexicon indexes")
+    args = ap.parse_args()
+    build_umls_lexicons(args.mrconso, args.mrsty, args.out_dir, args.langs, args.workers,
+                        args.block_mb, args.index_dir, not args.no_index)
+
+if __name__ == "__main__":
+    main()
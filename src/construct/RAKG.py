@@ -1,5 +1,6 @@
 from src.textPrcess import TextProcessor
 from src.kgAgent import NER_Agent
+from src.construct.incremental import ReuseCache, load_state, save_state, reuse_report
 import json
 import os
 
@@ -23,7 +24,12 @@ def convert_to_valid_json(data):
                      ensure_ascii=False,
                      separators=(',', ': '))
 
-def process_all_topics(json_path, output_dir):
+def process_all_topics(json_path, output_dir, incremental=False):
+    """
+    incremental=True keeps a per-topic state under output_dir/state so that a re-run on an
+    edited text only re-extracts changed sentences and entities whose context changed.
+    Sentence vectors are kept under output_dir/state/vectors and only new sentences are embedded.
+    """
     # Load JSON file
     with open(json_path, 'r', encoding='utf-8') as file:
         topics = json.load(file)
@@ -48,16 +54,25 @@ def process_all_topics(json_path, output_dir):
             topic = topic_data['topic']
 
             # Split text
-            processor = TextProcessor(text, topic)
+            vector_dir = os.path.join(output_dir, "state", "vectors") if incremental else None
+            processor = TextProcessor(text, topic, cache_dir=vector_dir)
             text_split = processor.process()
 
+            # Load cached results of the previous run
+            ner_cache = kg_cache = None
+            state_path = os.path.join(output_dir, "state", f"topic_{idx}.json")
+            if incremental:
+                state = load_state(state_path)
+                ner_cache = ReuseCache(state["ner"])
+                kg_cache = ReuseCache(state["kg"])
+
             # Extract NER and knowledge graph
             # Initial NER
-            ner_result = ner_agent.extract_from_text_multiply(text_split['sentences'], text_split['sentence_to_id'],output_file=f"data/processed/llmasjudge/ner_data/output_text_ner_{idx}.jsonl")
+            ner_result = ner_agent.extract_from_text_multiply(text_split['sentences'], text_split['sentence_to_id'],output_file=f"data/processed/llmasjudge/ner_data/output_text_ner_{idx}.jsonl", ner_cache=ner_cache)
             sim = ner_agent.similartiy_result(ner_result)
             # NER with entity disambiguation
             entity_list_process = ner_agent.entity_Disambiguation(ner_result, sim)
-            kg_result = ner_agent.get_target_kg_all(entity_list_process, text_split['id_to_sentence'],text_split['sentences'],text_split['sentence_to_id'],text_split['vectors'],output_file=f"data/processed/llmasjudge/rel_data/output_kg_{idx}.jsonl")
+            kg_result = ner_agent.get_target_kg_all(entity_list_process, text_split['id_to_sentence'],text_split['sentences'],text_split['sentence_to_id'],text_split['vectors'],output_file=f"data/processed/llmasjudge/rel_data/output_kg_{idx}.jsonl", kg_cache=kg_cache)
             print("kg_result")
             print(kg_result)
             converted_kg = ner_agent.convert_knowledge_graph(kg_result)
@@ -70,6 +85,12 @@ def process_all_topics(json_path, output_dir):
                 json.dump(kg_json, outfile, ensure_ascii=False, indent=4)
 
             print(f"Saved KG for topic {topic_data['topic']} to {output_path}")
+
+            if incremental:
+                report = reuse_report(ner_cache, kg_cache)
+                save_state(state_path, ner_cache, kg_cache, report)
+                print(f"Reused NER for {report['sentences_reused']}/{report['sentences_total']} sentences, "
+                      f"KG for {report['entities_reused']}/{report['entities_total']} entities")
         except Exception as e:
             print(f"Error generating knowledge graph for entry {idx}: {str(e)}")
         
@@ -1,8 +1,10 @@
 from src.textPrcess import TextProcessor
 from src.kgAgent import NER_Agent
+from src.construct.incremental import ReuseCache, load_state, save_state, reuse_report
 import json
 import os
 import logging
+import argparse
 
 # Configure logger
 # logger_file = 'rakg_chapter_7.log'
@@ -37,7 +39,14 @@ def convert_to_valid_json(data):
                     ensure_ascii=False,
                     separators=(',', ': '))
 
-def process_all_topics(json_path, output_dir):
+def process_all_topics(json_path, output_dir, incremental=False, dedup=False):
+    """
+    incremental=True keeps a per-topic state under output_dir/state so that a re-run on an
+    edited text only re-extracts changed sentences and entities whose context changed.
+    Sentence vectors are kept under output_dir/state/vectors and only new sentences are embedded.
+    dedup=True drops near-duplicate sentences before embedding and NER (headers / footers are
+    stripped by the PDF extractors, the topic text has no page boundaries).
+    """
     # Load JSON file
     with open(json_path, 'r', encoding='utf-8') as file:
         topics = json.load(file)
@@ -62,9 +71,18 @@ def process_all_topics(json_path, output_dir):
             topic = topic_data['topic']
 
             # Split text
-            processor = TextProcessor(text, topic)
+            vector_dir = os.path.join(output_dir, "state", "vectors") if incremental else None
+            processor = TextProcessor(text, topic, cache_dir=vector_dir, dedup=dedup)
             text_split = processor.process()
 
+            # Load cached results of the previous run
+            ner_cache = kg_cache = None
+            state_path = os.path.join(output_dir, "state", f"topic_{idx}.json")
+            if incremental:
+                state = load_state(state_path)
+                ner_cache = ReuseCache(state["ner"])
+                kg_cache = ReuseCache(state["kg"])
+
             # Extract NER and knowledge graph
             # Initial NER
             logger.info("Starting NER extraction...")
@@ -73,7 +91,8 @@ def process_all_topics(json_path, output_dir):
             ner_result = ner_agent.extract_from_text_multiply(
                 text_split['sentences'], 
                 text_split['sentence_to_id'],
-                output_file=os.path.join(output_dir, "ner_data", f"output_text_ner_result_{idx}.jsonl")
+                output_file=os.path.join(output_dir, "ner_data", f"output_text_ner_result_{idx}.jsonl"),
+                ner_cache=ner_cache
             ) # origin
             logger.info("Finish NER extraction.\n")
             
@@ -96,7 +115,8 @@ def process_all_topics(json_path, output_dir):
                 text_split['sentences'],
                 text_split['sentence_to_id'],
                 text_split['vectors'],
-                output_file=os.path.join(output_dir, "rel_data", f"output_kg_{idx}.jsonl")
+                output_file=os.path.join(output_dir, "rel_data", f"output_kg_{idx}.jsonl"),
+                kg_cache=kg_cache
             ) # origin
             logger.info("Finish generating kg_result.\n")
             # print(kg_result)
@@ -114,6 +134,14 @@ def process_all_topics(json_path, output_dir):
                 outfile.write(kg_json)
                 logger.info(f"Saved KG for topic {topic_data['topic']} to {output_path}")
 
+            if incremental:
+                report = reuse_report(ner_cache, kg_cache)
+                save_state(state_path, ner_cache, kg_cache, report)
+                logger.info(
+                    f"Reused NER for {report['sentences_reused']}/{report['sentences_total']} sentences, "
+                    f"KG for {report['entities_reused']}/{report['entities_total']} entities."
+                )
+
         except Exception as e:
             logger.error(f"Error generating knowledge graph for entry {idx}: {str(e)}")
             logger.error(e.with_traceback())
@@ -121,6 +149,13 @@ def process_all_topics(json_path, output_dir):
 
 # Example call
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the wound-care knowledge graph")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse NER / KG results and sentence vectors of the previous run (output_dir/state)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="drop near-duplicate sentences before embedding and NER")
+    args = parser.parse_args()
+
     # json_path = "data/raw/MINE.json"  # Replace with your JSON file path
 
     # json_path = "data/raw/HP.json"  # Replace with your JSON file path
@@ -143,4 +178,4 @@ if __name__ == "__main__":
     # input_json_file = "data/MINE_1.json"
     # output_file = "result/RAKG_graph_mine_test"
     
-    process_all_topics(input_json_file, output_file)
\ No newline at end of file
+    process_all_topics(input_json_file, output_file, incremental=args.incremental, dedup=args.dedup)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import copy
+import hashlib
+import json
+import os
+
+STATE_VERSION = 2  # 2: cache keys include the model name and prompt hash
+
+
+def content_hash(*parts):
+    """Stable content hash used to key cached NER / KG results"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class ReuseCache:
+    """
+    Content-addressed cache for LLM results of a single topic.
+
+    `entries` holds the results of the previous run; every entry that is read or
+    written during the current run is remembered in `touched`, so only the parts
+    that still belong to the document are persisted again.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self.touched = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.hits += 1
+            self.touched[key] = self.entries[key]
+            return copy.deepcopy(self.entries[key])
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = copy.deepcopy(value)
+        self.touched[key] = self.entries[key]
+
+
+def load_state(path):
+    """Load the incremental state of a topic, returning an empty state if missing or outdated"""
+    empty = {"version": STATE_VERSION, "ner": {}, "kg": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return empty
+    if state.get("version") != STATE_VERSION:
+        return empty
+    return state
+
+
+def save_state(path, ner_cache, kg_cache, report=None):
+    """Persist the entries used by the current run (written atomically)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = {
+        "version": STATE_VERSION,
+        "ner": ner_cache.touched,
+        "kg": kg_cache.touched,
+        "report": report or {},
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def reuse_report(ner_cache, kg_cache):
+    """Summarize how much NER / KG extraction work was reused"""
+    sentences_total = ner_cache.hits + ner_cache.misses
+    entities_total = kg_cache.hits + kg_cache.misses
+    return {
+        "sentences_total": sentences_total,
+        "sentences_reused": ner_cache.hits,
+        "entities_total": entities_total,
+        "entities_reused": kg_cache.hits,
+        "llm_calls_saved": ner_cache.hits + kg_cache.hits,
+    }
@@ -0,0 +1,254 @@
+"""
+Boilerplate and near-duplicate suppression for a whole document, run before embedding and NER.
+
+OCR'd textbook pages repeat running headers, footers and page numbers. Two passes:
+    1. strip_boilerplate: among the first / last BOILERPLATE_EDGE_LINES lines of every page, short
+       non-sentence lines whose (digit-masked) MinHash cluster sits at a page edge on at least
+       BOILERPLATE_MIN_REPEATS pages, and bare page numbers, are removed.
+    2. collapse_near_duplicates: sentences whose estimated Jaccard similarity (character shingles)
+       with an earlier sentence is >= NEAR_DUP_THRESHOLD, and that carry the same numbers and negation
+       words, are dropped; `duplicate_of` maps each
+       dropped sentence to the kept one, so ids / provenance can point at the canonical sentence.
+"""
+import json
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: candidate pairs from Jaccard ~0.5, verified against the threshold
+SHINGLE_SIZE = 5
+NEAR_DUP_THRESHOLD = 0.9
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 60
+BOILERPLATE_THRESHOLD = 0.8
+BOILERPLATE_EDGE_LINES = 2  # lines at the top and at the bottom of a page that may be a header / footer
+
+_PRIME = (1 << 31) - 1
+_SPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+_TOKEN = re.compile(r"[一-鿿]|\w+")
+_SENTENCE_END = ".!?。！？"
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATION = re.compile(r"\b(?:not|no|without|never)\b|n't|[不无未禁]")
+_PAGE_NUMBER = re.compile(r"^\W*(page|p\.|第)?\s*\d+\s*(页|/\s*\d+)?\W*$", re.IGNORECASE)
+
+
+def normalize(text, mask_digits=False):
+    text = _SPACE.sub(" ", text.lower()).strip()
+    return _DIGITS.sub("0", text) if mask_digits else text
+
+
+def facts(norm):
+    """Numbers and negation words of a normalized sentence; near-duplicates must agree on both"""
+    return tuple(_NUMBER.findall(norm)), tuple(sorted(_NEGATION.findall(norm)))
+
+
+def count_tokens(text):
+    """Rough token count: one per CJK character, one per word otherwise"""
+    return len(_TOKEN.findall(text))
+
+
+class MinHashLSH:
+    """MinHash signatures over character shingles with banded LSH buckets"""
+
+    def __init__(self, threshold, num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def signature(self, text):
+        k = self.shingle_size
+        grams = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        x = np.fromiter((zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams), dtype=np.uint64, count=len(grams))
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, sig, accept=None):
+        """
+        Key of the most similar inserted item with estimated Jaccard >= threshold, or None.
+        accept(key) -> bool restricts the candidates.
+        """
+        candidates = set()
+        for bucket, band in zip(self.buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(band, ()))
+        if accept is not None:
+            candidates = {k for k in candidates if accept(k)}
+        if not candidates:
+            return None
+        keys = sorted(candidates)
+        sims = (np.stack([self.signatures[k] for k in keys]) == sig).mean(axis=1)
+        best = int(np.argmax(sims))  # ties -> earliest key
+        return keys[best] if sims[best] >= self.threshold else None
+
+    def insert(self, key, sig):
+        self.signatures[key] = sig
+        for bucket, band in zip(self.buckets, self._band_keys(sig)):
+            bucket.setdefault(band, []).append(key)
+
+
+def strip_boilerplate(pages, min_repeats=BOILERPLATE_MIN_REPEATS, max_chars=BOILERPLATE_MAX_CHARS,
+                      threshold=BOILERPLATE_THRESHOLD, edge_lines=BOILERPLATE_EDGE_LINES):
+    """
+    Remove running headers / footers from a list of page texts. Only the first and last `edge_lines`
+    non-empty lines of a page are candidates: a short line that does not end a sentence is removed when
+    its (page-number-masked) cluster sits at a page edge on at least `min_repeats` pages, and a bare
+    page number is removed at a page edge of a multi-page document. Lines inside a page (section
+    headings, table cells, dosages) are never touched.
+    Returns (pages, removed) with removed = [{"line", "count"}] in first-seen order.
+    """
+    page_lines = [page.split("\n") for page in pages]
+    edges = []  # (page, line) positions at the top / bottom of each page
+    for p, lines in enumerate(page_lines):
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        edges.extend((p, i) for i in sorted(set(filled[:edge_lines] + filled[-edge_lines:])))
+
+    lsh = MinHashLSH(threshold)
+    cluster_of = {}
+    exact = {}
+    page_number = set()
+    for p, i in edges:
+        line = page_lines[p][i]
+        if len(pages) > 1 and _PAGE_NUMBER.match(line):
+            page_number.add((p, i))
+            continue
+        norm = normalize(line, mask_digits=True)
+        # running headers are short and never end a sentence; body lines that do are left alone
+        if len(norm) > max_chars or norm[-1] in _SENTENCE_END:
+            continue
+        match = exact.get(norm)
+        if match is None:
+            sig = lsh.signature(norm)
+            match = lsh.query(sig)
+            if match is None:
+                lsh.insert((p, i), sig)
+                match = (p, i)
+            exact[norm] = match
+        cluster_of[(p, i)] = match
+    pages_of = {}
+    for (p, _), cluster in cluster_of.items():
+        pages_of.setdefault(cluster, set()).add(p)
+
+    cleaned, removed = [], Counter()
+    for p, lines in enumerate(page_lines):
+        kept = []
+        for i, line in enumerate(lines):
+            cluster = cluster_of.get((p, i))
+            if (p, i) in page_number:
+                removed["<page number>"] += 1
+            elif cluster is not None and len(pages_of[cluster]) >= min_repeats:
+                removed[page_lines[cluster[0]][cluster[1]].strip()] += 1
+            else:
+                kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned, [{"line": line, "count": n} for line, n in removed.items()]
+
+
+def collapse_near_duplicates(sentences, threshold=NEAR_DUP_THRESHOLD):
+    """
+    Keep the first occurrence of every near-duplicate group. Returns (kept sentences,
+    duplicate_of) where duplicate_of maps each dropped sentence to the kept sentence it repeats.
+    A near match only counts when both sentences carry the same numbers and negation words
+    ("4 mL/kg" vs "2 mL/kg", "should" vs "should not" stay apart); otherwise only whitespace /
+    case-normalized repeats are collapsed.
+    """
+    lsh = MinHashLSH(threshold)
+    kept, duplicate_of = [], {}
+    exact = {}  # normalized sentence -> kept index, skips hashing of exact repeats
+    kept_facts = []
+    for sent in sentences:
+        norm = normalize(sent)
+        match = exact.get(norm)
+        if match is None:
+            sig = lsh.signature(norm)
+            sent_facts = facts(norm)
+            match = lsh.query(sig, accept=lambda k: kept_facts[k] == sent_facts)
+            if match is None:
+                exact[norm] = len(kept)
+                lsh.insert(len(kept), sig)
+                kept.append(sent)
+                kept_facts.append(sent_facts)
+                continue
+        if sent != kept[match]:
+            duplicate_of.setdefault(sent, kept[match])
+    return kept, duplicate_of
+
+
+def deduplicate(pages, split_sentences, separator="\n\n", boilerplate=True, near_duplicates=True):
+    """
+    Run both passes over a document given as its page texts, joined with `separator` the way the
+    extractor joins them (a text without page structure is passed as [text]: only page edges are
+    boilerplate candidates, so such a text keeps all of its lines). `split_sentences` is the caller's
+    sentence splitter, so the savings are reported in the same sentences that would otherwise be
+    embedded and sent to NER.
+    """
+    original = split_sentences(separator.join(pages))
+    removed_lines = []
+    if boilerplate:
+        pages, removed_lines = strip_boilerplate(pages)
+    text = separator.join(pages)
+    sentences = split_sentences(text)
+    n_split = len(sentences)
+    duplicate_of = {}
+    if near_duplicates:
+        sentences, duplicate_of = collapse_near_duplicates(sentences)
+
+    tokens_before = sum(count_tokens(s) for s in original)
+    tokens_after = sum(count_tokens(s) for s in sentences)
+    report = {
+        "sentences_before": len(original),
+        "sentences_after": len(sentences),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "boilerplate_lines_removed": sum(r["count"] for r in removed_lines),
+        "near_duplicate_sentences": n_split - len(sentences),
+    }
+    print(f"Dedup: {report['sentences_before']} -> {report['sentences_after']} sentences, "
+          f"{tokens_before} -> {tokens_after} tokens "
+          f"({report['boilerplate_lines_removed']} boilerplate lines, "
+          f"{report['near_duplicate_sentences']} near-duplicate sentences)")
+    return {
+        "text": text,
+        "sentences": sentences,
+        "duplicate_of": duplicate_of,
+        "removed_lines": removed_lines,
+        "report": report,
+    }
+
+
+def save_dedup_report(path, result):
+    """Persist the savings report and the provenance (removed lines, duplicate -> kept sentence) of `deduplicate`"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: result[k] for k in ("report", "removed_lines", "duplicate_of")}, f, ensure_ascii=False, indent=2)
+
+
+# Regression check: python -m src.dedup
+if __name__ == "__main__":
+    base = ("Burn patients with more than 20% TBSA should receive Ringer lactate at 4 mL/kg per percent TBSA "
+            "in the first 24 hours, half of it during the first 8 hours after injury.")
+    variants = [
+        base.replace("4 mL/kg", "2 mL/kg"),
+        base.replace("more than 20%", "more than 10%"),
+        base.replace("should receive", "should not receive"),
+        "烧伤面积超过20%的患者应在伤后24小时内给予乳酸林格液，每1%面积4 mL/kg。",
+        "烧伤面积超过20%的患者不应在伤后24小时内给予乳酸林格液，每1%面积4 mL/kg。",
+    ]
+    repeats = ["  " + base.upper(), base.replace("half of it", "half  of it")]
+    kept, duplicate_of = collapse_near_duplicates([base] + variants + repeats)
+    assert kept == [base] + variants, kept
+    assert set(duplicate_of) == set(repeats) and set(duplicate_of.values()) == {base}, duplicate_of
+    print(f"ok: {len(variants)} dosage / negation variants kept, {len(repeats)} repeats collapsed")
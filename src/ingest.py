@@ -0,0 +1,234 @@
+"""
+Bulk ingestion of PDF / TXT / Markdown corpora into the topics JSON read by the construct drivers
+([{"topic": ..., "content": "```...```"}], same shape as data/raw/MINE.json).
+
+    python -m src.ingest data/raw/MINE_txt --out data/raw/MINE_txt.json
+    python -m src.ingest "pdf/*.pdf" data/raw/MINE_md --out data/raw/corpus.json --workers 8
+    python -m src.ingest pdf --pdf-mode hybrid --out data/raw/wound.json
+
+Every extracted file is appended to a `<out>.ingest.jsonl` journal keyed by path and content hash,
+so an interrupted or repeated run only extracts new or changed files (--no-resume starts over).
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+SUFFIXES = (".pdf", ".txt", ".md")
+PDF_MODES = ("double_column", "hybrid")
+# hybrid mode: surya / pdfplumber intermediate output per document
+HYBRID_OUTPUT_DIR = "result/ingest"
+
+# hybrid mode: OCR models shared by all pdfExtractor instances of this process
+_hybrid_models = None
+
+_MD_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*", re.MULTILINE)
+_MD_EMPHASIS = re.compile(r"(\*\*|__)(.+?)\1")
+_MD_FENCE = re.compile(r"^\s*(```|~~~).*$", re.MULTILINE)
+
+
+def natural_key(path):
+    """Sort 2.txt before 10.txt"""
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", path)]
+
+
+def collect_files(inputs, suffixes=SUFFIXES):
+    """Expand directories (recursively), glob patterns and plain files into a sorted, de-duplicated list"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names)
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            files.extend(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    files = {os.path.normpath(p) for p in files if p.lower().endswith(suffixes)}
+    return sorted(files, key=natural_key)
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        return f.read().replace("\r\n", "\n")
+
+
+def markdown_to_text(text):
+    """Drop Markdown markup that would otherwise end up in sentences (fences would also break the ``` wrapper)"""
+    text = _MD_FENCE.sub("", text)
+    text = _MD_IMAGE.sub(r"\1", text)
+    text = _MD_LINK.sub(r"\1", text)
+    text = _MD_HEADING.sub("", text)
+    text = _MD_EMPHASIS.sub(r"\2", text)
+    return text
+
+
+def first_line_topic(text, fallback):
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()
+    return fallback
+
+
+def extract_file(path, pdf_mode="double_column", sha256=None, resume=True):
+    """
+    Dispatch one file to its extractor; returns (topic, text). Runs in a pool worker except for hybrid PDFs.
+    Hybrid output goes to a folder keyed by the file hash; resume=False re-extracts it from scratch.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".txt":
+        text = read_text(path)
+        return first_line_topic(text, stem), text.strip()
+    if suffix == ".md":
+        text = markdown_to_text(read_text(path))
+        return first_line_topic(text, stem), text.strip()
+    if suffix == ".pdf":
+        if pdf_mode == "hybrid":
+            global _hybrid_models
+            from utils.pdfExtract import pdfExtractor
+            sha256 = sha256 or file_key(path)
+            output_folder = os.path.join(HYBRID_OUTPUT_DIR, f"{stem}-{sha256[:12]}")
+            extractor = pdfExtractor(path)
+            extractor._ocr_models = _hybrid_models
+            extractor.extract_hybrid(output_folder, resume=resume)
+            _hybrid_models = extractor._ocr_models
+            text = read_text(os.path.join(output_folder, "pdf_result", "ocr_result.txt"))
+        else:
+            from src.pdfProcess import extract_double_column
+            # workers=1: files are already spread over the ingestion pool
+            text = extract_double_column(path, workers=1, progress=False)
+        return stem, text.strip()
+    raise ValueError(f"unsupported file type: {path}")
+
+
+def _extract_task(args):
+    path, pdf_mode, sha256, resume = args
+    start = time.perf_counter()
+    topic, text = extract_file(path, pdf_mode, sha256, resume)
+    # stray fences would break the ```content``` wrapper
+    topic, text = topic.replace("```", "").strip(), text.replace("```", "").strip()
+    return topic, text, time.perf_counter() - start
+
+
+def file_key(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_journal(path):
+    """{file path: record}; a torn last line from an interrupted run is ignored"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[rec["path"]] = rec
+    return records
+
+
+def write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def ingest(inputs, output_path, workers=None, pdf_mode="double_column", resume=True):
+    """
+    Extract every PDF / TXT / MD file under `inputs` and write the topics JSON to `output_path`.
+    Returns (topics, failed paths).
+    """
+    files = collect_files(inputs)
+    if not files:
+        raise FileNotFoundError(f"no {'/'.join(SUFFIXES)} files found in {inputs}")
+    journal_path = f"{output_path}.ingest.jsonl"
+    done = read_journal(journal_path) if resume else {}
+    if not resume and os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    keys = {p: file_key(p) for p in files}
+    mode_of = {p: pdf_mode if p.lower().endswith(".pdf") else "" for p in files}
+    pending = [p for p in files
+               if not (p in done and done[p]["sha256"] == keys[p] and done[p]["pdf_mode"] == mode_of[p])]
+    print(f"{len(files)} files, {len(files) - len(pending)} already ingested, {len(pending)} to extract")
+
+    failed = []
+    total_start = time.perf_counter()
+    with open(journal_path, "a", encoding="utf-8") as journal, tqdm(total=len(pending)) as bar:
+
+        def record(path, topic, text, seconds):
+            rec = {"path": path, "sha256": keys[path], "pdf_mode": mode_of[path],
+                   "topic": topic, "content": text, "chars": len(text), "seconds": round(seconds, 3)}
+            journal.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            journal.flush()
+            done[path] = rec
+            bar.write(f"{path}: {len(text)} chars in {seconds:.2f}s")
+            bar.update(1)
+
+        def fail(path, e):
+            failed.append(path)
+            bar.write(f"{path}: FAILED {type(e).__name__}: {e}")
+            bar.update(1)
+
+        def task(path):
+            # --no-resume, or a file whose content changed since its journal record, must not resume from old pages
+            fresh = resume and (path not in done or done[path]["sha256"] == keys[path])
+            return path, mode_of[path], keys[path], fresh
+
+        # hybrid PDFs hold the OCR models, so they are extracted in this process one by one
+        serial = [p for p in pending if mode_of[p] == "hybrid"]
+        pooled = [p for p in pending if mode_of[p] != "hybrid"]
+        if pooled:
+            n_workers = max(1, min(workers or os.cpu_count() or 1, len(pooled)))
+            with ProcessPoolExecutor(max_workers=n_workers) as ex:
+                futures = {ex.submit(_extract_task, task(p)): p for p in pooled}
+                for fut in as_completed(futures):
+                    try:
+                        record(futures[fut], *fut.result())
+                    except Exception as e:
+                        fail(futures[fut], e)
+        for p in serial:
+            try:
+                record(p, *_extract_task(task(p)))
+            except Exception as e:
+                fail(p, e)
+
+    topics = [{"topic": done[p]["topic"], "content": f"```{done[p]['content']}```"}
+              for p in files if p in done and p not in failed and done[p]["content"]]
+    write_json_atomic(output_path, topics)
+    seconds = time.perf_counter() - total_start
+    print(f"Wrote {len(topics)} topics to {output_path} in {seconds:.2f}s"
+          + (f", {len(failed)} failed (re-run to retry)" if failed else ""))
+    return topics, failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest PDF / TXT / Markdown files into a topics JSON for the construct drivers")
+    ap.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    ap.add_argument("--out", required=True, help="output topics JSON")
+    ap.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    ap.add_argument("--pdf-mode", choices=PDF_MODES, default="double_column",
+                    help="double_column: pdfplumber two-column text; hybrid: text layer with surya OCR fallback")
+    ap.add_argument("--no-resume", action="store_true", help="ignore the ingestion journal and extract everything again")
+    args = ap.parse_args()
+    ingest(args.inputs, args.out, workers=args.workers, pdf_mode=args.pdf_mode, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,10 @@ import ast
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from src.llm_provider import LLMProvider
+from src.config import USE_OPENAI, OPENAI_MODEL, DEFAULT_MODEL
 import logging
 import time
+from src.construct.incremental import content_hash
 from utils import normalize_attributes, normalize_attributes_dict, normalize_attributes_dict_origin, normalize_relationships
 from tenacity import retry, stop_after_attempt, wait_fixed, RetryCallState
 
@@ -23,6 +25,10 @@ class NER_Agent():
         self.similarity_model = self.llm_provider.get_similarity_model()
         self.embeddings = self.llm_provider.get_embedding_model()
         self.logger = logger if logger else logging.getLogger(__name__)
+        # Cached NER / KG results are only valid for the model and prompt that produced them
+        model_name = OPENAI_MODEL if USE_OPENAI else DEFAULT_MODEL
+        self.ner_cache_salt = content_hash(model_name, text2entity_en)
+        self.kg_cache_salt = content_hash(model_name, extract_entiry_centric_kg_en_v2)
 
     ## Add chunkid attribute
     def add_chunkid(self, ner_result, chunkid):
@@ -48,15 +54,16 @@ class NER_Agent():
         #     result_json = json.loads(result)
         
         # Store text_single and result_json in a jsonl file
+        self.write_ner_record(output_file, text_single, result_json)
+        return result_json
 
+    def write_ner_record(self, output_file, text_single, result_json):
         with open(output_file, 'a') as f:
             combined_data = {
                 "text": text_single,
                 "entities": result_json
             }
             f.write(json.dumps(combined_data, ensure_ascii=False) + '\n')
-        
-        return result_json
     
     def rewrite(self, ner_result, entity_num):
         new_entities = {}
@@ -67,11 +74,26 @@ class NER_Agent():
         return new_entities
     
     ## Implement named entity recognition for the entire text and add chunkid field to each entity
-    def extract_from_text_multiply(self, text_list, sent_to_id, output_file):
+    def extract_from_text_multiply(self, text_list, sent_to_id, output_file, ner_cache=None):
+        """
+        When ner_cache (see src.construct.incremental.ReuseCache) is given, sentences whose
+        content hash (with model and prompt) is already cached are not sent to the LLM again;
+        cached results are still written to output_file so the NER dump stays complete.
+        """
         ner_result_for_all = {}
         entity_num = 1
         for text in text_list:
-            ner_result = self.extract_from_text_single(text, output_file)
+            ner_result = None
+            if ner_cache is not None:
+                cache_key = content_hash(self.ner_cache_salt, text)
+                ner_result = ner_cache.get(cache_key)
+                if ner_result is not None:
+                    self.write_ner_record(output_file, text, ner_result)
+            if ner_result is None:
+                ner_result = self.extract_from_text_single(text, output_file)
+                # Empty results are usually LLM failures, keep them retryable
+                if ner_cache is not None and ner_result:
+                    ner_cache.put(cache_key, ner_result)
             ## Add a check here - if ner_result has a state field, it means there's an issue with this chunk, so skip to the next iteration
             if 'State' in ner_result:
                 continue
@@ -294,28 +316,39 @@ class NER_Agent():
         res = chain.invoke(inputs)
         return json.loads(res.content if hasattr(res, "content") else res)
 
-    def get_target_kg_sigle(self, entity_dic, entity_id, id_to_sentence, sentences, sentence_to_id, vectors, output_file):
+    def get_target_kg_sigle(self, entity_dic, entity_id, id_to_sentence, sentences, sentence_to_id, vectors, output_file, kg_cache=None):
         chunk_text_list = self.get_sentences_for_entity(entity_dic, entity_id, id_to_sentence)
         query = entity_dic[entity_id].get('name', '')
         context = self.get_retriever_context(query, sentences, sentence_to_id, vectors, top_k=5)
         sentences = [item[0] for item in context]
         unique_sentences = list(set(chunk_text_list + sentences))
         chunk_text = ", ".join(unique_sentences)
-        prompt = ChatPromptTemplate.from_template(extract_entiry_centric_kg_en_v2)
-        chain = prompt | self.model
 
-        try:
-            result_json = self.call_llm_with_timeout(
-                chain,
-                {
-                    "text": chunk_text,
-                    "target_entity": entity_dic[entity_id]["name"],
-                    "related_kg": "none",
-                }
-            )
-        except Exception as e:
-            self.logger.warning(f"[{entity_id}] LLM inoke failure after all retries: {e}")
-            result_json = {}
+        # The LLM input only depends on the entity name and its provenance + retrieved sentences
+        result_json = None
+        if kg_cache is not None:
+            cache_key = content_hash(self.kg_cache_salt, entity_dic[entity_id]["name"], *sorted(unique_sentences))
+            result_json = kg_cache.get(cache_key)
+
+        if result_json is None:
+            prompt = ChatPromptTemplate.from_template(extract_entiry_centric_kg_en_v2)
+            chain = prompt | self.model
+
+            try:
+                result_json = self.call_llm_with_timeout(
+                    chain,
+                    {
+                        "text": chunk_text,
+                        "target_entity": entity_dic[entity_id]["name"],
+                        "related_kg": "none",
+                    }
+                )
+            except Exception as e:
+                self.logger.warning(f"[{entity_id}] LLM inoke failure after all retries: {e}")
+                result_json = {}
+
+            if kg_cache is not None and result_json:
+                kg_cache.put(cache_key, result_json)
 
         # result = chain.invoke({"text": chunk_text, "target_entity": entity_dic[entity_id].get('name'), "related_kg": 'none'})
         # # Handle AIMessage response from OpenAI
@@ -334,7 +367,7 @@ class NER_Agent():
 
         return result_json
     
-    def get_target_kg_all(self, entity_dic, id_to_sentence,sentences,sentence_to_id,vectors,output_file):
+    def get_target_kg_all(self, entity_dic, id_to_sentence,sentences,sentence_to_id,vectors,output_file, kg_cache=None):
         """
         Process all entities.
         """
@@ -342,7 +375,7 @@ class NER_Agent():
         for entity_id in entity_dic:
             self.logger.info(f"Processing entity: {entity_id}: {entity_dic[entity_id]['name']}, len: {len(entity_dic[entity_id]['description'])}")
             if entity_id in entity_dic:
-                result = self.get_target_kg_sigle(entity_dic, entity_id, id_to_sentence, sentences, sentence_to_id, vectors,output_file)
+                result = self.get_target_kg_sigle(entity_dic, entity_id, id_to_sentence, sentences, sentence_to_id, vectors,output_file, kg_cache=kg_cache)
                 results[entity_id] = result
             else:
                 self.logger.warning(f"Entity {entity_id} not found in entity_dic.")
@@ -2,11 +2,108 @@ import re
 import os
 import pdfplumber
 import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 from tqdm import tqdm
 from .llm_provider import LLMProvider
+from .vector_store import embed_sentences, VECTORS_FILE, SIDECAR_FILE
+from .dedup import deduplicate, save_dedup_report
 from collections import Counter
 
+# 双栏抽取参数：页眉/页脚高度（pt）、分栏位置（页宽比例）、字符合并容差
+HEADER_MARGIN = 50
+FOOTER_MARGIN = 50
+COLUMN_SPLIT = 0.5
+X_TOLERANCE = 1
+# 逐页抽取结果缓存：(pdf 内容哈希, 裁剪参数) -> {页码: 文本}
+PAGE_CACHE_DIR = "result/.page_cache"
+PAGE_CACHE_VERSION = 2  # 抽取逻辑变化时递增，旧缓存自动失效
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extract_double_column_pages(args):
+    """进程池任务：自行打开 pdfplumber，抽取一段页（0 基页码）的双栏文本，返回 [(页码, 文本)]"""
+    pdf_path, page_numbers, header, footer, split, x_tolerance = args
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in page_numbers:
+            p = pdf.pages[i]
+            W, H = p.bbox[2], p.bbox[3]
+            # 去掉页眉 (0-header pt) 和页脚 (H-footer, H)
+            want_bbox = (0, header, W, H - footer)
+            content = p.crop(want_bbox)
+
+            # 左栏 / 右栏：crop 使用页面绝对坐标，取裁剪后内容区的 bbox（不能用 content.height 作为下边界）
+            x0, top, x1, bottom = content.bbox
+            mid = W * split
+            left  = content.crop((x0,  top, mid, bottom))
+            right = content.crop((mid, top, x1, bottom))
+
+            page_text = []
+            # `x_tolerance=1` 能减少“字串跨栏合并”的机会
+            for col in (left, right):
+                txt = col.extract_text(x_tolerance=x_tolerance) or ""
+                if txt.strip():
+                    page_text.append(txt.strip())
+            results.append((i, "\n".join(page_text)))
+            p.close()
+    return results
+
+
+def extract_double_column(pdf_path, workers=None, cache_dir=PAGE_CACHE_DIR,
+                          header=HEADER_MARGIN, footer=FOOTER_MARGIN, split=COLUMN_SPLIT,
+                          x_tolerance=X_TOLERANCE, progress=True):
+    """
+    双栏抽取：页范围切块后由进程池并行处理（每个进程独立打开 pdfplumber），按页序拼接。
+    逐页结果按 (pdf 哈希, 裁剪参数) 缓存到 cache_dir，调整页眉页脚参数只重算受影响的组合。
+    """
+    params = {"version": PAGE_CACHE_VERSION, "header": header, "footer": footer, "split": split,
+              "x_tolerance": x_tolerance}
+    cache_file = None
+    cached = {}
+    if cache_dir:
+        params_key = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        cache_file = os.path.join(cache_dir, file_sha256(pdf_path), f"double_column_{params_key}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = {int(k): v for k, v in json.load(f)["pages"].items()}
+
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+    missing = [i for i in range(n_pages) if i not in cached]
+    if missing:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(missing)))
+        # 每个进程若干个连续页块，块数多于进程数以平衡负载
+        n_chunks = min(len(missing), workers * 4)
+        step = -(-len(missing) // n_chunks)
+        tasks = [(pdf_path, missing[k:k + step], header, footer, split, x_tolerance)
+                 for k in range(0, len(missing), step)]
+        if workers == 1:
+            chunks = map(extract_double_column_pages, tasks)
+            for chunk in tqdm(chunks, total=len(tasks), disable=not progress):
+                cached.update(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                for chunk in tqdm(ex.map(extract_double_column_pages, tasks), total=len(tasks), disable=not progress):
+                    cached.update(chunk)
+        if cache_file:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp = f"{cache_file}.tmp-{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"params": params, "pages": cached}, f, ensure_ascii=False)
+            os.replace(tmp, cache_file)
+
+    all_pages = [cached[i] for i in range(n_pages)]
+    return "\n\n".join(all_pages)
+
 
 class pdfProcessor:
     def __init__(self, pdf_path):
@@ -29,28 +126,11 @@ class pdfProcessor:
 
         return "\n".join(full_text)
     
-    def extract_double_column(self, pdf_path):
-        all_pages = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for p in tqdm(pdf.pages):
-                W, H = p.bbox[2], p.bbox[3]
-                # 去掉页眉 (0-50 pt) 和页脚 (H-50, H)
-                want_bbox = (0, 50, W, H - 50)
-                content = p.crop(want_bbox)
-
-                # 左栏 / 右栏
-                mid = W * 0.5       
-                left  = content.crop((0,    50, mid, content.height))
-                right = content.crop((mid,  50, W, content.height))
-
-                page_text = []
-                # `x_tolerance=1` 能减少“字串跨栏合并”的机会
-                for col in (left, right):
-                    txt = col.extract_text(x_tolerance=1) or ""
-                if txt.strip():
-                    page_text.append(txt.strip())
-                all_pages.append("\n".join(page_text))
-        return "\n\n".join(all_pages)
+    def extract_double_column(self, pdf_path, workers=None, cache_dir=PAGE_CACHE_DIR,
+                              header=HEADER_MARGIN, footer=FOOTER_MARGIN, split=COLUMN_SPLIT,
+                              x_tolerance=X_TOLERANCE):
+        return extract_double_column(pdf_path, workers=workers, cache_dir=cache_dir, header=header,
+                                     footer=footer, split=split, x_tolerance=x_tolerance)
 
     
     ## Split text into segments and return a list
@@ -64,34 +144,41 @@ class pdfProcessor:
         """Generate ID according to requirements"""
         return f"{self.base_name}{index+1}"
     
-    def process(self, output_path="result"):
+    def process(self, output_path="result", dedup=False):
         text = self.extract_double_column(self.pdf_path)
 
-        sentences = self.split_sentences(text)
+        # dedup=True：固定裁剪带之外残留的页眉页脚、页码（仅看每页首尾几行）及重复句子，去重后再嵌入
+        # extract_double_column 以空行连接各页
+        dedup_result = deduplicate(text.split("\n\n"), self.split_sentences) if dedup else None
+        sentences = dedup_result["sentences"] if dedup else self.split_sentences(text)
         for idx, sent in enumerate(sentences):
             sent_id = self.generate_id(idx)
             self.sentence_to_id[sent] = sent_id
             self.id_to_sentence[sent_id] = sent
+        if dedup:
+            for dup, kept in dedup_result["duplicate_of"].items():
+                self.sentence_to_id.setdefault(dup, self.sentence_to_id[kept])
         
-        vectors = self.embeddings.embed_documents(sentences)
-
-        pdf_process_result = {
-            "sentences": sentences,
-            "vectors": vectors,
-            "sentence_to_id": self.sentence_to_id,
-            "id_to_sentence": self.id_to_sentence
-        }
-
         if not os.path.exists(os.path.join(output_path, f"{self.base_name}")):
             os.makedirs(os.path.join(output_path, f"{self.base_name}"))
+        if dedup:
+            save_dedup_report(os.path.join(output_path, f"{self.base_name}", "dedup_report.json"), dedup_result)
 
         with open(os.path.join(output_path, f"{self.base_name}", "raw_text.txt"), "w", encoding="utf-8") as f:
             f.write(text)
         print(f"Extracted text from {self.pdf_path} and saved to {os.path.join(output_path, f'{self.base_name}', 'raw_text.txt')}")
 
-        with open(os.path.join(output_path, f"{self.base_name}", "processed_result.json"), "w", encoding="utf-8") as f:
-            json.dump(pdf_process_result, f, ensure_ascii=False, indent=4)
-        print(f"Processed sentences and vectors saved to {os.path.join(output_path, f'{self.base_name}', 'processed_result.json')}")
+        # 向量存为 float32 vectors.npy（可 mmap）+ sentences.json；同一文档再次处理时只嵌入新句子
+        folder = os.path.join(output_path, f"{self.base_name}")
+        vectors = embed_sentences(self.embeddings, sentences, [self.generate_id(i) for i in range(len(sentences))], folder)
+
+        pdf_process_result = {
+            "sentences": sentences,
+            "vectors": vectors,
+            "sentence_to_id": self.sentence_to_id,
+            "id_to_sentence": self.id_to_sentence
+        }
+        print(f"Processed sentences and vectors saved to {os.path.join(folder, SIDECAR_FILE)} and {os.path.join(folder, VECTORS_FILE)}")
 
         return pdf_process_result         
 
@@ -3,11 +3,20 @@ import os
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from src.llm_provider import LLMProvider
+from src.vector_store import embed_sentences
+from src.dedup import deduplicate
 
 class TextProcessor:
-    def __init__(self, text, name):
+    def __init__(self, text, name, cache_dir=None, dedup=False):
+        """
+        cache_dir: if set, sentence vectors are stored under cache_dir/<name> and reused on the next run
+        dedup: drop near-duplicate sentences before embedding (see src.dedup); the text has no page
+            boundaries, so running headers / footers are left to the PDF extractors
+        """
         self.text = text
         self.base_name = name
+        self.cache_dir = cache_dir
+        self.dedup = dedup
         self.sentence_to_id = {}
         self.id_to_sentence = {}
         self.llm_provider = LLMProvider()
@@ -29,20 +38,33 @@ class TextProcessor:
         text = self.text
         
         # Step 2: Sentence segmentation and ID mapping
-        sentences = self.split_sentences(text)
+        dedup = deduplicate([text], self.split_sentences) if self.dedup else None
+        sentences = dedup["sentences"] if dedup else self.split_sentences(text)
         for idx, sent in enumerate(sentences):
             sent_id = self.generate_id(idx)
             self.sentence_to_id[sent] = sent_id
             self.id_to_sentence[sent_id] = sent
+        if dedup:
+            # dropped near-duplicates resolve to the id of the sentence they repeat
+            for dup, kept in dedup["duplicate_of"].items():
+                self.sentence_to_id.setdefault(dup, self.sentence_to_id[kept])
         
         # Step 3: Vector storage
-        vector = self.embeddings.embed_query(sentences[0])
-        print(vector[:3])
-        vectors = self.embeddings.embed_documents(sentences)
-        return {
+        if self.cache_dir:
+            folder = os.path.join(self.cache_dir, re.sub(r'[\\/:*?"<>|\s]+', '_', self.base_name))
+            vectors = embed_sentences(self.embeddings, sentences, [self.generate_id(i) for i in range(len(sentences))], folder)
+        else:
+            vector = self.embeddings.embed_query(sentences[0])
+            print(vector[:3])
+            vectors = self.embeddings.embed_documents(sentences)
+        result = {
             "sentences": sentences,
             "vectors": vectors,
             "sentence_to_id": self.sentence_to_id,
             "id_to_sentence": self.id_to_sentence
         }
+        if dedup:
+            result["duplicate_of"] = dedup["duplicate_of"]
+            result["dedup_report"] = dedup["report"]
+        return result
     
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+SIDECAR_FILE = "sentences.json"
+SIDECAR_VERSION = 1
+
+
+def embedding_model_name(embeddings):
+    """Best-effort name of a langchain embedding model, stored with the vectors so a model switch invalidates them"""
+    for attr in ("model", "model_name"):
+        name = getattr(embeddings, attr, None)
+        if isinstance(name, str) and name:
+            return f"{type(embeddings).__name__}:{name}"
+    return type(embeddings).__name__
+
+
+def sentence_hash(sentence):
+    return hashlib.sha1(sentence.encode("utf-8")).hexdigest()
+
+
+def save_vectors(folder, sentences, ids, vectors, model=""):
+    """
+    Write `vectors` as a float32 `vectors.npy` (memory-mappable) and the sentences / ids as a
+    compact `sentences.json` sidecar. Both files are replaced atomically, sidecar last.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) != len(sentences) or len(ids) != len(sentences):
+        raise ValueError(f"expected {len(sentences)} sentences, ids and vectors, got "
+                         f"{len(ids)} ids and vectors of shape {vectors.shape}")
+    os.makedirs(folder, exist_ok=True)
+    tmp = os.path.join(folder, f"{VECTORS_FILE}.tmp-{os.getpid()}.npy")
+    np.save(tmp, vectors)
+    os.replace(tmp, os.path.join(folder, VECTORS_FILE))
+
+    sidecar = {
+        "version": SIDECAR_VERSION,
+        "model": model,
+        "dim": int(vectors.shape[1]),
+        "sentences": list(sentences),
+        "ids": list(ids),
+    }
+    tmp = os.path.join(folder, f"{SIDECAR_FILE}.tmp-{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, os.path.join(folder, SIDECAR_FILE))
+
+
+def load_vectors(folder, model=None, mmap=True):
+    """
+    Load a store written by `save_vectors`, returning (sentences, ids, vectors) or None when it is
+    missing, unreadable or was built with a different embedding model. `vectors` is a read-only
+    memmap unless mmap=False.
+    """
+    sidecar_path = os.path.join(folder, SIDECAR_FILE)
+    vectors_path = os.path.join(folder, VECTORS_FILE)
+    if not (os.path.exists(sidecar_path) and os.path.exists(vectors_path)):
+        return None
+    try:
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        vectors = np.load(vectors_path, mmap_mode="r" if mmap else None)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get("version") != SIDECAR_VERSION or (model is not None and sidecar.get("model") != model):
+        return None
+    if vectors.shape != (len(sidecar["sentences"]), sidecar["dim"]):
+        return None
+    return sidecar["sentences"], sidecar["ids"], vectors
+
+
+def embed_sentences(embeddings, sentences, ids, folder):
+    """
+    Embed `sentences` reusing the vectors stored in `folder`: only sentences that are not in the
+    store are sent to the embedding model. The store is rewritten to match the current sentences.
+    """
+    if not sentences:
+        return np.zeros((0, 0), dtype=np.float32)
+    model = embedding_model_name(embeddings)
+    stored = load_vectors(folder, model=model)
+    row_of = {}
+    if stored is not None:
+        row_of = {sentence_hash(s): i for i, s in enumerate(stored[0])}
+    missing = [i for i, s in enumerate(sentences) if sentence_hash(s) not in row_of]
+
+    if not missing and stored is not None and list(stored[0]) == list(sentences) and list(stored[1]) == list(ids):
+        print(f"Reused {len(sentences)} stored vectors from {folder}")
+        return stored[2]
+
+    new_vectors = embeddings.embed_documents([sentences[i] for i in missing]) if missing else []
+    dim = len(new_vectors[0]) if len(new_vectors) else stored[2].shape[1]
+    vectors = np.empty((len(sentences), dim), dtype=np.float32)
+    for i, v in zip(missing, new_vectors):
+        vectors[i] = v
+    if stored is not None:
+        missing_set = set(missing)
+        for i, s in enumerate(sentences):
+            if i not in missing_set:
+                vectors[i] = stored[2][row_of[sentence_hash(s)]]
+        del stored
+    save_vectors(folder, sentences, ids, vectors, model=model)
+    print(f"Embedded {len(missing)}/{len(sentences)} sentences, reused the rest from {folder}")
+    return vectors
+
+
+def load_processed_result(folder, mmap=True):
+    """Rebuild the `process()` result dict (sentences / vectors / id maps) from a store, or None"""
+    stored = load_vectors(folder, mmap=mmap)
+    if stored is None:
+        return None
+    sentences, ids, vectors = stored
+    return {
+        "sentences": sentences,
+        "vectors": vectors,
+        "sentence_to_id": dict(zip(sentences, ids)),
+        "id_to_sentence": dict(zip(ids, sentences)),
+    }
@@ -6,7 +6,9 @@
 import json, re, os, math
 from collections import Counter, defaultdict
 import pandas as pd
-from difflib import SequenceMatcher
+from kg_cleaner.lexicon_store import open_lexicon
+from kg_cleaner.mapping import best_lexicon_match as kg_best_lexicon_match
+from kg_cleaner.rules import TypeRuleEngine
 # from caas_jupyter_tools import display_dataframe_to_user
 
 # ---------------------------
@@ -184,23 +186,23 @@ def has_any_token(s, tokens):
             return True
     return False
 
+# substring hints compiled once, decisions memoized per type label
+TYPE_RULES = TypeRuleEngine(
+    token_groups={
+        "color": CN_COLOR + EN_COLOR,
+        "laterality": LATERALITY_CN + LATERALITY_EN,
+        "severity": SEVERITY_CN + SEVERITY_EN,
+        "anatomy": ANATOMY_CN + ANATOMY_EN,
+        "temporal": TEMPORAL_CN + TEMPORAL_EN,
+        "punct": PUNCTUATION_HINTS,
+    },
+    priority_rules=PARENT_RULES,
+    pattern_signals={"severity": (ROMAN_PATTERN, DEGREE_PATTERN), "with": (WITH_PATTERN, LOCATION_PATTERN)},
+)
+
 def is_fine_grained(type_label):
     """Heuristics to flag over-specific (fine-grained) type labels"""
-    # signals: long phrases, color/laterality/severity/anatomy/time, punctuation, explicit locations, 'with' clauses
-    l = type_label.strip()
-    tokens = re.split(r"\s+", l)
-    long_phrase = len(tokens) >= 4  # many words usually encode attributes
-    has_color = has_any_token(l, CN_COLOR + EN_COLOR)
-    has_laterality = has_any_token(l, LATERALITY_CN + LATERALITY_EN)
-    has_severity = has_any_token(l, SEVERITY_CN + SEVERITY_EN) or bool(ROMAN_PATTERN.search(l)) or bool(DEGREE_PATTERN.search(l))
-    has_anatomy = has_any_token(l, ANATOMY_CN + ANATOMY_EN)
-    has_temporal = has_any_token(l, TEMPORAL_CN + TEMPORAL_EN)
-    has_punct = any(p in l for p in PUNCTUATION_HINTS)
-    has_with = bool(WITH_PATTERN.search(l)) or bool(LOCATION_PATTERN.search(l))
-    # has_noise = has_any_token(l, NOISE_HINTS)
-    # A type is "fine-grained" if multiple signals fire OR very long OR contains clear attribute-like tokens
-    score = sum([long_phrase, has_color, has_laterality, has_severity, has_anatomy, has_temporal, has_punct, has_with])
-    return score >= 2
+    return TYPE_RULES.is_fine_grained(type_label)
 
 def suggest_parent(type_label):
     for patt, parent in PARENT_RULES:
@@ -216,39 +218,16 @@ def suggest_parent(type_label):
     return "Thing"
 
 def suggest_parent(type_label):
-    for patt, parent in PARENT_RULES:
-        if patt.search(type_label):
-            return parent
-    return "Thing"
+    return TYPE_RULES.suggest_parent(type_label)
 
 def load_lexicon(path, key_col):
-    if not os.path.exists(path):
-        return {}
-    df = pd.read_csv(path)
-    d = {}
-    for _, r in df.iterrows():
-        k = str(r.get(key_col, "")).strip().lower()
-        if k:
-            d.setdefault(k, []).append({c: r[c] for c in df.columns if c != key_col})
-    return d
+    # memory-mapped index shared with kg_cleaner, rebuilt only when the CSV changes
+    return open_lexicon(path, key_col)
 
 def best_lexicon_match(name, lex, threshold=0.90):
     """Try exact/casefold match then fuzzy; return (score, record) or (0, None)."""
-    if not name: return (0.0, None)
-    key = name.strip().lower()
-    if key in lex:
-        # exact key match: choose first
-        return (1.0, lex[key][0])
-    # fuzzy search among keys
-    best_score, best_rec = 0.0, None
-    for k, recs in lex.items():
-        s = SequenceMatcher(None, key, k).ratio()
-        if s > best_score:
-            best_score = s
-            best_rec = recs[0]
-    if best_score >= threshold:
-        return (best_score, best_rec)
-    return (0.0, None)
+    # bigram-pruned fuzzy search shared with kg_cleaner (same decisions as a full SequenceMatcher scan)
+    return kg_best_lexicon_match(name, lex, threshold=threshold)
 
 # ---------------------------
 # Load and aggregate
@@ -2,20 +2,159 @@ import re
 import os
 import json
 import traceback
+import threading
+import queue
+import time
+import hashlib
+import unicodedata
+from importlib import metadata
 import torch
 import pdfplumber
 
 from tqdm import tqdm
 from src.llm_provider import LLMProvider
+from src.vector_store import embed_sentences, VECTORS_FILE, SIDECAR_FILE
+from src.dedup import deduplicate, save_dedup_report
 from collections import Counter
 from surya.layout import LayoutPredictor
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image, ImageDraw, ImageFont
 
 from surya.layout import LayoutPredictor
 from surya.detection import DetectionPredictor
 from surya.recognition import RecognitionPredictor
 
+from utils.response_cache import ResponseCache
+from src.pdfProcess import file_sha256
+
+# 区域 OCR：每次送入检测/识别模型的裁剪区域数
+OCR_BATCH_SIZE = 32
+# 需要 OCR 的版面标签
+OCR_TEXT_LABELS = ("Text", "Title", "Caption")
+OCR_HEADER_LABELS = ("SectionHeader",)
+# 页面流式处理：每个窗口渲染的页数、渲染分辨率、预渲染的窗口数
+PAGE_WINDOW = 8
+RENDER_DPI = 200
+PREFETCH_WINDOWS = 1
+# 逐页结果（extract_surya 断点续跑的依据）
+PAGES_JSONL = "pages.jsonl"
+# 混合模式：文本层质量阈值（非空白字符数、有效字形占比），以及文本页中需单独 OCR 的嵌入图片面积占比
+MIN_TEXT_CHARS = 30
+MIN_VALID_GLYPH_RATIO = 0.9
+REGION_OCR_MIN_AREA = 0.2
+# 版面检测 / 区域 OCR 结果缓存（按页面图像哈希 + 模型版本）；设为 None 关闭
+OCR_CACHE_DIR = "result/.ocr_cache"
+
+_CID_GLYPH = re.compile(r"\(cid:\d+\)")
+
+
+def page_image_hash(image):
+    """渲染页面的字节哈希（含尺寸与模式，dpi 不同即视为不同页面）"""
+    h = hashlib.sha1(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("utf-8"))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def surya_model_version():
+    """surya 版本 + 各模型 checkpoint，任一变化都会使 OCR 缓存失效"""
+    try:
+        version = metadata.version("surya-ocr")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    try:
+        from surya.settings import settings
+        checkpoints = [str(getattr(settings, name, "")) for name in
+                       ("LAYOUT_MODEL_CHECKPOINT", "DETECTOR_MODEL_CHECKPOINT", "RECOGNITION_MODEL_CHECKPOINT")]
+    except ImportError:
+        checkpoints = []
+    return "|".join([f"surya-{version}"] + checkpoints)
+
+
+class CachedBox:
+    """从缓存还原的版面框，提供 sort_layout_reading_order / assemble_page 用到的属性"""
+
+    def __init__(self, label, bbox, polygon=None, confidence=None, position=None):
+        self.label = label
+        self.bbox = bbox
+        self.polygon = polygon
+        self.confidence = confidence
+        self.position = position
+
+    @property
+    def center(self):
+        return ((self.bbox[0] + self.bbox[2]) / 2, (self.bbox[1] + self.bbox[3]) / 2)
+
+
+class CachedLayout:
+
+    def __init__(self, bboxes, image_bbox=None):
+        self.bboxes = bboxes
+        self.image_bbox = image_bbox
+
+
+def layout_to_cache(layout_result):
+    return {
+        "bboxes": [{"label": b.label, "bbox": list(b.bbox), "polygon": b.polygon,
+                    "confidence": b.confidence, "position": getattr(b, "position", None)}
+                   for b in layout_result.bboxes],
+        "image_bbox": getattr(layout_result, "image_bbox", None),
+    }
+
+
+def layout_from_cache(data):
+    return CachedLayout([CachedBox(**b) for b in data["bboxes"]], data.get("image_bbox"))
+
+
+def text_layer_quality(text):
+    """
+    文本层质量：返回 (非空白字符数, 有效字形占比)。
+    pdfminer 无法映射的字形 "(cid:N)"、替换符、私用区和控制字符视为无效。
+    """
+    text = text or ""
+    n_cid = len(_CID_GLYPH.findall(text))
+    chars = [ch for ch in _CID_GLYPH.sub("", text) if not ch.isspace()]
+    invalid = n_cid + sum(1 for ch in chars if ch == "\ufffd" or unicodedata.category(ch) in ("Co", "Cc", "Cs", "Cn"))
+    total = len(chars) + n_cid
+    return total, (1.0 - invalid / total) if total else 0.0
+
+
+def prefetch(iterable, depth=PREFETCH_WINDOWS):
+    """
+    生产者/消费者：后台线程提前取出最多 depth 个元素（如渲染下一窗口的页面），
+    与主线程的模型推理重叠；生产者异常在消费端重新抛出。
+    """
+    q = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(done)
+        except BaseException as e:
+            q.put(e)
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
 
 class pdfExtractor:
     def __init__(self, pdf_path):
@@ -25,6 +164,17 @@ class pdfExtractor:
         self.id_to_sentence = {}
         self.llm_provider = LLMProvider()
         self.embeddings = self.llm_provider.get_embedding_model()
+        self._ocr_models = None
+
+    def ocr_models(self):
+        """懒加载 (layout, detection, recognition) 三个 Predictor；纯文本层的文档不会加载模型"""
+        if self._ocr_models is None:
+            layout_predictor = LayoutPredictor()
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            detection_predictor = DetectionPredictor(device=device)
+            recognition_predictor = RecognitionPredictor(device=device)
+            self._ocr_models = (layout_predictor, detection_predictor, recognition_predictor)
+        return self._ocr_models
 
     def convert_layout_to_dict(self, layout_predictions):
         """
@@ -157,8 +307,65 @@ class pdfExtractor:
             final_text_block.append(line.text)
         # 将所有行合并成一个文本块
         return "\n".join(final_text_block)
+
+    def ocr_cache(self, cache_dir=OCR_CACHE_DIR):
+        if not cache_dir:
+            return None
+        return ResponseCache(os.path.join(cache_dir, "ocr_cache.sqlite"), surya_model_version())
+
+    def detect_layouts(self, images, cache=None):
+        """版面检测；命中缓存的页不做推理，未命中的页一次批量检测"""
+        layouts = [None] * len(images)
+        keys = [ResponseCache.make_key(f"layout/{page_image_hash(im)}") for im in images] if cache is not None else []
+        if cache is not None:
+            for i, key in enumerate(keys):
+                data = cache.get(key)
+                if data is not None:
+                    layouts[i] = layout_from_cache(data)
+        missing = [i for i, layout in enumerate(layouts) if layout is None]
+        if missing:
+            layout_predictor = self.ocr_models()[0]
+            for i, layout in zip(missing, layout_predictor([images[i] for i in missing])):
+                layouts[i] = layout
+                if cache is not None:
+                    cache.put(keys[i], layout_to_cache(layout))
+        return layouts
+
+    def ocr_regions(self, detection_predictor, recognition_predictor, regions, batch_size=OCR_BATCH_SIZE, cache=None):
+        """
+        批量区域 OCR：regions 为 [(image, roi_bbox), ...]，按 batch_size 个裁剪区域一组
+        一次检测 + 一次识别，返回与 regions 顺序一致的文本块列表（每块多行以换行拼接）。
+        predictor 为 None 时按需懒加载；cache 命中的区域不做推理。
+        """
+        texts = [None] * len(regions)
+        keys = []
+        if cache is not None:
+            page_hashes = {}
+            for i, (image, roi_bbox) in enumerate(regions):
+                if id(image) not in page_hashes:
+                    page_hashes[id(image)] = page_image_hash(image)
+                key = ResponseCache.make_key(f"ocr/{page_hashes[id(image)]}", {"bbox": [round(float(v), 1) for v in roi_bbox]})
+                keys.append(key)
+                data = cache.get(key)
+                if data is not None:
+                    texts[i] = data["text"]
+        missing = [i for i, t in enumerate(texts) if t is None]
+        if missing and detection_predictor is None:
+            _, detection_predictor, recognition_predictor = self.ocr_models()
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            crops = [regions[i][0].crop(regions[i][1]) for i in batch]
+            det_predictions = detection_predictor(crops)
+            polygons = [[line.polygon for line in det.bboxes] for det in det_predictions]
+            rec_predictions = recognition_predictor(images=crops, polygons=polygons)
+            for i, rec in zip(batch, rec_predictions):
+                lines = rec.text_lines if rec is not None else []
+                texts[i] = "\n".join(line.text for line in lines)
+                if cache is not None:
+                    cache.put(keys[i], {"text": texts[i]})
+        return texts
     
-    def examine_layout_prediction_order(self, images, layout_predictions, output_folder):
+    def examine_layout_prediction_order(self, images, layout_predictions, output_folder, start_index=0, page_indices=None):
 
         # layout_predictor = LayoutPredictor()
         # images = convert_from_path(self.pdf_path)
@@ -166,7 +373,8 @@ class pdfExtractor:
 
         if not os.path.exists(os.path.join(output_folder, "img")):
             os.makedirs(os.path.join(output_folder, "img"))
-        for i, (image, layout) in enumerate(zip(images, layout_predictions)):
+        page_indices = page_indices or range(start_index, start_index + len(images))
+        for i, image, layout in zip(page_indices, images, layout_predictions):
             self.draw_layout_predictions(image, layout, os.path.join(output_folder, "layout_img", f"page_{i}_layout_order.png"))
         
         print(f"layout predictions have been saved to {os.path.join(output_folder, 'img')}.")
@@ -207,118 +415,304 @@ class pdfExtractor:
         return reading_order
     
 
-    def extract_surya(self, output_folder):
-
-        # --- 1. 初始化 Predictor ---
-        layout_predictor = LayoutPredictor()
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        detection_predictor = DetectionPredictor(device=device)
-        recognition_predictor = RecognitionPredictor(device=device)
-        img_id = 1
-
-        # convert pdf to images
-        images = convert_from_path(self.pdf_path)
-        layout_predictions = layout_predictor(images)
-
-        # convert layout predictions to human reading order
-        layout_results_reading_order = []
-        for layout_result, image in zip(layout_predictions, images):
-            # 获取页面宽度
-            page_width = image.size[0]
-            result_reading_order = self.sort_layout_reading_order(layout_result, page_width)
-            layout_results_reading_order.append(result_reading_order)
-
-
-        # --- 2. 对每一页进行 OCR ---    
-        ocr_result_list = []
-        pdf_result_dict_list = []    
-        for i, (image, layout) in enumerate(zip(images, layout_results_reading_order)):
+    def assemble_page(self, image, layout, texts, output_folder, img_id):
+        """
+        按阅读顺序把一页的 OCR 文本组装成节结构，并保存图片/表格区域。
+        texts 与 layout 中 OCR_HEADER_LABELS / OCR_TEXT_LABELS 区域一一对应。
+        返回 (ocr_result, pdf_result_dict, img_id)
+        """
+        ocr_result = []
+        pdf_result_dict = []
+        current_section = None
+        texts = iter(texts)
 
-            # OCR specific area
-            ocr_result = []
-            pdf_result_dict = []
-            current_section = None
+        for bbox in layout:
+            
+            label = bbox.label
+            bbox = bbox.bbox
+
+            if label in OCR_HEADER_LABELS:
+                # structual pdf result
+                # 扫到新章节
+                header_text = next(texts)
+                ocr_result.append(header_text)
+                # 新建一个节的 dict
+                current_section = {
+                    "section": header_text,
+                    "content": []
+                }
+                pdf_result_dict.append(current_section)
 
-            if not os.path.exists(os.path.join(output_folder, "img")):
-                os.makedirs(os.path.join(output_folder, "img"))
-            if not os.path.exists(os.path.join(output_folder, "layout_img")):
-                os.makedirs(os.path.join(output_folder, "layout_img"))
+            elif label in OCR_TEXT_LABELS:
+                # 只对特定标签的区域进行 OCR
+                recognized_text = next(texts)
+                ocr_result.append(recognized_text)
 
-            for bbox in layout:
-                
-                label = bbox.label
-                bbox = bbox.bbox
-
-                if label == "SectionHeader":
-                    # structual pdf result
-                    # 扫到新章节
-                    header_text = self.ocr_specific_area(detection_predictor, recognition_predictor, image, bbox)
-                    ocr_result.append(header_text)
-                    # 新建一个节的 dict
-                    current_section = {
-                        "section": header_text,
-                        "content": []
-                    }
+                # structual pdf result
+                content_item = {
+                    "text": recognized_text,
+                    "images": []
+                }
+                if current_section is None:
+                    # 如果还没遇到 SectionHeader，则先建个默认节
+                    current_section = {"section": "", "content": []}
                     pdf_result_dict.append(current_section)
-
-                elif label in ["Text", "Title", "Caption"]:
-                    # 只对特定标签的区域进行 OCR
-                    recognized_text = self.ocr_specific_area(detection_predictor, recognition_predictor, image, bbox)
-                    ocr_result.append(recognized_text)
-                    print(f"识别区域 {label} 的文本: {recognized_text}")
-
-                    # structual pdf result
-                    content_item = {
-                        "text": recognized_text,
-                        "images": []
-                    }
-                    if current_section is None:
-                        # 如果还没遇到 SectionHeader，则先建个默认节
-                        current_section = {"section": "", "content": []}
-                        pdf_result_dict.append(current_section)
-                    current_section["content"].append(content_item)
-
-                elif label in ["Picture", "Figure", "Table"]:
-                    # 对图片区域进行 OCR
-                    cropped_image = image.crop(bbox)
-                    cropped_image_output_path = os.path.join(output_folder, "img", f"cropped_{label}_page_{img_id}.png")
-                    cropped_image.save(cropped_image_output_path)
-                    img_id += 1
-                    # 附加到当前节里最后一个 content
-                    if current_section and current_section["content"]:
-                        current_section["content"][-1]["images"].append(cropped_image_output_path)
-                    # 否则忽略，或根据需要新建一条
-            
-            ocr_result_list.extend(ocr_result)
-            pdf_result_dict_list.extend(pdf_result_dict)
-
-            if not os.path.exists(os.path.join(output_folder, "pdf_result")):
-                os.makedirs(os.path.join(output_folder, "pdf_result"))
-            with open(os.path.join(output_folder, "pdf_result", "ocr_result.txt"), "a", encoding="utf-8") as f:
-                for text in ocr_result_list:
-                    f.write(text + "\n")
-            with open(os.path.join(output_folder, "pdf_result", "pdf_result_structured.json"), "a", encoding="utf-8") as f:
-                json.dump(pdf_result_dict_list, f, ensure_ascii=False, indent=2)
-
-            # draw bbox on page
-            # self.draw_layout_predictions(image, layout, os.path.join(output_folder, "layout_img", f"page_{i}_layout.png"))
-
-
-        # 绘制阅读顺序的布局预测结果
-        self.examine_layout_prediction_order(images, layout_results_reading_order, output_folder)
-
-        # # save results
-        # if not os.path.exists(os.path.join(output_folder, "pdf_result")):
-        #     os.makedirs(os.path.join(output_folder, "pdf_result"))
-        # with open(os.path.join(output_folder, "pdf_result", "ocr_result.txt"), "w", encoding="utf-8") as f:
-        #     for text in ocr_result_list:
-        #         f.write(text + "\n")
-        # with open(os.path.join(output_folder, "pdf_result", "pdf_result_structured.json"), "w", encoding="utf-8") as f:
-        #     json.dump(pdf_result_dict_list, f, ensure_ascii=False, indent=2)
-        
+                current_section["content"].append(content_item)
+
+            elif label in ["Picture", "Figure", "Table"]:
+                # 对图片区域进行 OCR
+                cropped_image = image.crop(bbox)
+                cropped_image_output_path = os.path.join(output_folder, "img", f"cropped_{label}_page_{img_id}.png")
+                cropped_image.save(cropped_image_output_path)
+                img_id += 1
+                # 附加到当前节里最后一个 content
+                if current_section and current_section["content"]:
+                    current_section["content"][-1]["images"].append(cropped_image_output_path)
+                # 否则忽略，或根据需要新建一条
+        return ocr_result, pdf_result_dict, img_id
+
+    def page_count(self):
+        return int(pdfinfo_from_path(self.pdf_path)["Pages"])
+
+    def iter_page_windows(self, pages, window=PAGE_WINDOW, dpi=RENDER_DPI):
+        """
+        按窗口惰性渲染给定页码（升序，可不连续），逐个产出 ([页码, ...], [PIL.Image, ...])；
+        窗口内连续的页一次渲染
+        """
+        for k in range(0, len(pages), window):
+            chunk = pages[k:k + window]
+            images = []
+            run_start = 0
+            for j in range(1, len(chunk) + 1):
+                if j == len(chunk) or chunk[j] != chunk[j - 1] + 1:
+                    images.extend(convert_from_path(self.pdf_path, dpi=dpi, first_page=chunk[run_start], last_page=chunk[j - 1]))
+                    run_start = j
+            yield chunk, images
+
+    def page_log_fingerprint(self, mode, **params):
+        """pages.jsonl 的指纹：PDF 内容哈希 + 抽取方式 + 影响页结果的参数"""
+        return {"pdf_sha256": file_sha256(self.pdf_path), "mode": mode, **params}
+
+    def read_page_records(self, output_folder, fingerprint=None):
+        """
+        读取 pages.jsonl（首行为指纹，之后每页一行），返回 {page: record}
+        - 若末尾有写了一半的行则重写文件去掉它
+        - 给定 fingerprint 且与文件中的不一致（PDF 或参数已变）时丢弃整个日志并写入新指纹
+        """
+        path = os.path.join(output_folder, "pdf_result", PAGES_JSONL)
+        header, records, torn = None, {}, False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        torn = True
+                        break
+                    if "fingerprint" in rec:
+                        header = rec
+                    else:
+                        records[rec["page"]] = rec
+        if fingerprint is not None and (header is None or header["fingerprint"] != fingerprint):
+            if records:
+                print(f"{path}: PDF or settings changed, discarding {len(records)} finished pages")
+            header, records, torn = {"fingerprint": fingerprint}, {}, True
+        if torn:
+            with open(path, "w", encoding="utf-8") as f:
+                for rec in ([header] if header else []) + list(records.values()):
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return records
+
+    def finalize_surya_result(self, output_folder):
+        """按页码汇总 pages.jsonl，一次性写出 ocr_result.txt 与合法的 pdf_result_structured.json"""
+        records = self.read_page_records(output_folder)
+        ocr_result_list = []
+        pdf_result_dict_list = []
+        for page in sorted(records):
+            ocr_result_list.extend(records[page]["ocr_result"])
+            pdf_result_dict_list.extend(records[page]["sections"])
+        with open(os.path.join(output_folder, "pdf_result", "ocr_result.txt"), "w", encoding="utf-8") as f:
+            for text in ocr_result_list:
+                f.write(text + "\n")
+        with open(os.path.join(output_folder, "pdf_result", "pdf_result_structured.json"), "w", encoding="utf-8") as f:
+            json.dump(pdf_result_dict_list, f, ensure_ascii=False, indent=2)
+        return pdf_result_dict_list
+
+    def extract_surya(self, output_folder, ocr_batch_size=OCR_BATCH_SIZE, page_window=PAGE_WINDOW,
+                      dpi=RENDER_DPI, first_page=1, last_page=None, resume=True, cache_dir=OCR_CACHE_DIR):
+        """
+        流式 OCR：每次只渲染 page_window 页（后台线程预渲染下一窗口），
+        对窗口做版面检测 + 批量区域 OCR，处理完即释放图片，内存与书的页数无关。
+        每页完成后追加一行到 pdf_result/pages.jsonl；resume=True 时跳过已完成的页，
+        最后由 finalize_surya_result 汇总出 ocr_result.txt / pdf_result_structured.json。
+        版面与区域 OCR 结果按页面图像哈希缓存在 cache_dir，只改阅读顺序 / 节组装逻辑时重跑无需推理；
+        模型仅在缓存未命中时加载。
+        """
+        cache = self.ocr_cache(cache_dir)
+
+        for sub in ("img", "layout_img", "pdf_result"):
+            if not os.path.exists(os.path.join(output_folder, sub)):
+                os.makedirs(os.path.join(output_folder, sub))
+
+        pages_path = os.path.join(output_folder, "pdf_result", PAGES_JSONL)
+        if not resume and os.path.exists(pages_path):
+            os.remove(pages_path)
+        done = self.read_page_records(output_folder, self.page_log_fingerprint("surya", dpi=dpi))
+        img_id = max((rec["next_img_id"] for rec in done.values()), default=1)
+        last_page = last_page or self.page_count()
+        # 只渲染尚未完成的页（中途失败留下的空洞也会补上，已完成的页不会重复追加）
+        todo = [p for p in range(first_page, last_page + 1) if p not in done]
+        if len(todo) < last_page - first_page + 1:
+            print(f"resuming: {last_page - first_page + 1 - len(todo)} pages already done, {len(todo)} to go")
+
+        layout_predictions = []
+        if todo:
+            windows = prefetch(self.iter_page_windows(todo, page_window, dpi))
+            with open(pages_path, "a", encoding="utf-8") as pages_file:
+                for page_numbers, images in windows:
+                    window_layouts = self.detect_layouts(images, cache)
+                    layout_predictions.extend(window_layouts)
+
+                    # convert layout predictions to human reading order
+                    layout_results_reading_order = []
+                    for layout_result, image in zip(window_layouts, images):
+                        # 获取页面宽度
+                        page_width = image.size[0]
+                        result_reading_order = self.sort_layout_reading_order(layout_result, page_width)
+                        layout_results_reading_order.append(result_reading_order)
+
+                    # --- 2. OCR：整个窗口的文本区域一起批量识别 ---
+                    regions, region_counts = [], []
+                    for image, layout in zip(images, layout_results_reading_order):
+                        page_regions = [(image, box.bbox) for box in layout if box.label in OCR_HEADER_LABELS + OCR_TEXT_LABELS]
+                        regions.extend(page_regions)
+                        region_counts.append(len(page_regions))
+                    texts = self.ocr_regions(None, None, regions, ocr_batch_size, cache)
+
+                    offset = 0
+                    for k, (image, layout, n) in enumerate(zip(images, layout_results_reading_order, region_counts)):
+                        page_texts = texts[offset:offset + n]
+                        offset += n
+                        ocr_result, pdf_result_dict, img_id = self.assemble_page(image, layout, page_texts, output_folder, img_id)
+                        # 每页只写一次
+                        record = {"page": page_numbers[k], "ocr_result": ocr_result,
+                                  "sections": pdf_result_dict, "next_img_id": img_id}
+                        pages_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        pages_file.flush()
+
+                    # 绘制阅读顺序的布局预测结果（会在图片上作画，放在 OCR 之后）
+                    self.examine_layout_prediction_order(images, layout_results_reading_order, output_folder,
+                                                         page_indices=[p - 1 for p in page_numbers])
+                    del images
+
+        self.finalize_surya_result(output_folder)
         return layout_predictions
     
+    def page_text_layer(self, page, double_column=False):
+        """pdfplumber 页面的文本层（双栏时先左后右）"""
+        if not double_column:
+            return (page.extract_text(x_tolerance=2) or "").strip()
+        x0, y0, x1, y1 = page.bbox
+        mid_x = (x0 + x1) / 2
+        cols = [page.within_bbox(b).extract_text(x_tolerance=2) or "" for b in ((x0, y0, mid_x, y1), (mid_x, y0, x1, y1))]
+        return "\n".join(c.strip() for c in cols if c.strip())
+
+    def extract_hybrid(self, output_folder, double_column=False, dpi=RENDER_DPI, ocr_batch_size=OCR_BATCH_SIZE,
+                       min_chars=MIN_TEXT_CHARS, min_valid_ratio=MIN_VALID_GLYPH_RATIO,
+                       region_min_area=REGION_OCR_MIN_AREA, resume=True, cache_dir=OCR_CACHE_DIR):
+        """
+        文本层优先的混合抽取，逐页决定路径：
+        - text：文本层字符数与有效字形占比达标，直接用 pdfplumber 文本
+        - text+ocr：文本层达标，但有大面积嵌入图片（如扫描插页），只对这些图片区域 OCR
+        - ocr：文本层缺失或乱码，整页版面检测 + 区域 OCR（同 extract_surya）
+        结果写入与 extract_surya 相同的 pages.jsonl（可断点续跑），并输出每页路径与耗时的
+        pdf_result/extraction_report.json。
+        """
+        for sub in ("img", "layout_img", "pdf_result"):
+            if not os.path.exists(os.path.join(output_folder, sub)):
+                os.makedirs(os.path.join(output_folder, sub))
+        pages_path = os.path.join(output_folder, "pdf_result", PAGES_JSONL)
+        if not resume and os.path.exists(pages_path):
+            os.remove(pages_path)
+        fingerprint = self.page_log_fingerprint("hybrid", dpi=dpi, double_column=double_column, min_chars=min_chars,
+                                                min_valid_ratio=min_valid_ratio, region_min_area=region_min_area)
+        done = self.read_page_records(output_folder, fingerprint)
+        img_id = max((rec["next_img_id"] for rec in done.values()), default=1)
+        cache = self.ocr_cache(cache_dir)
+
+        pending = []  # 需要渲染 + OCR 的页：(page_no, path, text, regions, seconds, report_row)
+        with open(pages_path, "a", encoding="utf-8") as pages_file:
+
+            def write(record):
+                pages_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                pages_file.flush()
+
+            # --- 1. 文本层检查 ---
+            with pdfplumber.open(self.pdf_path) as pdf:
+                for page_no, page in enumerate(pdf.pages, start=1):
+                    if page_no in done:
+                        continue
+                    t0 = time.perf_counter()
+                    text = self.page_text_layer(page, double_column)
+                    n_chars, valid_ratio = text_layer_quality(text)
+                    row = {"page": page_no, "chars": n_chars, "valid_ratio": round(valid_ratio, 4)}
+                    if n_chars < min_chars or valid_ratio < min_valid_ratio:
+                        pending.append((page_no, "ocr", "", [], time.perf_counter() - t0, row))
+                        continue
+                    px0, py0, px1, py1 = page.bbox
+                    page_area = (px1 - px0) * (py1 - py0)
+                    regions = [(im["x0"] - px0, im["top"] - py0, im["x1"] - px0, im["bottom"] - py0) for im in page.images
+                               if (im["x1"] - im["x0"]) * (im["bottom"] - im["top"]) >= region_min_area * page_area]
+                    if regions:
+                        pending.append((page_no, "text+ocr", text, regions, time.perf_counter() - t0, row))
+                        continue
+                    row.update(path="text", seconds=round(time.perf_counter() - t0, 4))
+                    write({"page": page_no, "ocr_result": [text],
+                           "sections": [{"section": "", "content": [{"text": text, "images": []}]}],
+                           "next_img_id": img_id, "report": row})
+
+            # --- 2. 需要 OCR 的页：后台逐页渲染，主线程推理 ---
+            def render():
+                for item in pending:
+                    yield item, convert_from_path(self.pdf_path, dpi=dpi, first_page=item[0], last_page=item[0])[0]
+
+            for (page_no, path, text, regions, seconds, row), image in prefetch(render()):
+                t0 = time.perf_counter()
+                if path == "ocr":
+                    layout = self.sort_layout_reading_order(self.detect_layouts([image], cache)[0], image.size[0])
+                    ocr_regions = [(image, box.bbox) for box in layout if box.label in OCR_HEADER_LABELS + OCR_TEXT_LABELS]
+                    texts = self.ocr_regions(None, None, ocr_regions, ocr_batch_size, cache)
+                    ocr_result, sections, img_id = self.assemble_page(image, layout, texts, output_folder, img_id)
+                else:
+                    # PDF 坐标（pt）-> 渲染像素
+                    scale = dpi / 72.0
+                    boxes = [[round(v * scale) for v in r] for r in regions]
+                    texts = [t for t in self.ocr_regions(None, None, [(image, b) for b in boxes],
+                                                         ocr_batch_size, cache) if t.strip()]
+                    ocr_result = [text] + texts
+                    sections = [{"section": "", "content": [{"text": t, "images": []} for t in ocr_result]}]
+                seconds += time.perf_counter() - t0
+                row.update(path=path, seconds=round(seconds, 4))
+                write({"page": page_no, "ocr_result": ocr_result, "sections": sections,
+                       "next_img_id": img_id, "report": row})
+                del image
+
+        # 含此前运行中已完成的页
+        records = self.read_page_records(output_folder)
+        report = [records[p]["report"] for p in sorted(records) if "report" in records[p]]
+        with open(os.path.join(output_folder, "pdf_result", "extraction_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        summary = Counter(r["path"] for r in report)
+        for path in sorted(summary):
+            total = sum(r["seconds"] for r in report if r["path"] == path)
+            print(f"[hybrid] {path}: {summary[path]} pages, {total:.2f}s")
+        return self.finalize_surya_result(output_folder)
+    
     def extract_single_column(self, pdf_path):
+        return "\n".join(self.extract_single_column_pages(pdf_path))
+
+    def extract_single_column_pages(self, pdf_path):
+        """逐页提取文本，返回各非空页的文本列表"""
         all_text = []
 
         with pdfplumber.open(pdf_path) as pdf:
@@ -328,7 +722,7 @@ class pdfExtractor:
                 if page_text:
                     all_text.append(page_text.strip())
                     
-        return "\n".join(all_text)
+        return all_text
     
     def extract_double_column(self, pdf_path):
         all_text = []
@@ -369,8 +763,9 @@ class pdfExtractor:
         """Generate ID according to requirements"""
         return f"{self.base_name}{index+1}"
     
-    def process(self):
-        text = self.extract_single_column(self.pdf_path)
+    def process(self, dedup=False):
+        pages = self.extract_single_column_pages(self.pdf_path)
+        text = "\n".join(pages)
         # text = self.extract_double_column(self.pdf_path)
         
         if not os.path.exists(os.path.join("result", self.base_name)):
@@ -380,13 +775,21 @@ class pdfExtractor:
             json.dump(text, f, ensure_ascii=False, indent=4)
         print("Raw text has been saved to:", os.path.join("result", self.base_name, f"{self.base_name}_raw_text.json"))
         
-        sentences = self.split_sentences(text)
+        # dedup=True：去掉页眉页脚、页码（仅看每页首尾几行）及重复句子后再嵌入 / 写 topics JSON
+        dedup_result = deduplicate(pages, self.split_sentences, separator="\n") if dedup else None
+        sentences = dedup_result["sentences"] if dedup else self.split_sentences(text)
         for idx, sentence in enumerate(sentences):
             sent_id = self.generate_id(idx)
             self.sentence_to_id[sentence] = sent_id
             self.id_to_sentence[sent_id] = sentence
+        if dedup:
+            for dup, kept in dedup_result["duplicate_of"].items():
+                self.sentence_to_id.setdefault(dup, self.sentence_to_id[kept])
+            save_dedup_report(os.path.join("result", self.base_name, f"{self.base_name}_dedup_report.json"), dedup_result)
         
-        vectors = self.embeddings.embed_documents(sentences)
+        # 向量存为 float32 vectors.npy（可 mmap）+ sentences.json；同一文档再次处理时只嵌入新句子
+        folder = os.path.join("result", self.base_name)
+        vectors = embed_sentences(self.embeddings, sentences, [self.generate_id(i) for i in range(len(sentences))], folder)
 
         pdf_process_result = {
             "sentences": sentences,
@@ -394,9 +797,7 @@ class pdfExtractor:
             "sentence_to_id": self.sentence_to_id,
             "id_to_sentence": self.id_to_sentence
         }
-        with open(os.path.join("result", self.base_name, f"{self.base_name}_process_result.json"), "w", encoding="utf-8") as f:
-            json.dump(pdf_process_result, f, ensure_ascii=False, indent=4)
-        print("Processed result has been saved to:", os.path.join("result", self.base_name, f"{self.base_name}_process_result.json"))
+        print("Processed result has been saved to:", os.path.join(folder, SIDECAR_FILE), "and", os.path.join(folder, VECTORS_FILE))
         
         joined = '\n\n'.join(pdf_process_result['sentences'])
         processed_data = [
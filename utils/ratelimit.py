@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限速器
+    rate: 每秒补充的令牌数（即 QPS 上限），capacity: 突发上限（默认等于 rate）
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0):
+        """阻塞直到拿到 n 个令牌（在锁外 sleep，不阻塞其他线程的计算）"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            time.sleep(wait)
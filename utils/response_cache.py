@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+
+class ResponseCache:
+    """
+    持久化的 JSON 响应缓存（SQLite，值为 zlib 压缩的 JSON）
+    - key 由调用方拼好（含 branch / endpoint / params）
+    - version 与库中记录不一致时自动清空（换 SNOMED 版本后不会读到旧结果）
+    - 线程安全：单连接 + 锁，WAL 模式
+    """
+
+    def __init__(self, path: str, version: str = ""):
+        self.path = path
+        self.version = version
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                print(f"[cache] {path}: version {row[0]!r} -> {version!r}, purging")
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint: str, params=None) -> str:
+        if not params:
+            return endpoint
+        return endpoint + "?" + json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, value):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, blob))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
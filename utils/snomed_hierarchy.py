@@ -0,0 +1,204 @@
+"""
+离线 SNOMED CT is-a 层级（替代逐个调用 /concepts/{id}/ancestors）
+
+从 RF2 关系快照（sct2_Relationship_Snapshot_*.txt，active=1、typeId=116680003 且为 inferred）
+或已缓存的 ancestors 响应构建，预计算：
+    - 每个概念的祖先闭包（CSR：anc_offsets + anc，按概念下标升序）
+    - 每个概念的顶层类别（int8 数组，下标对应 top_level_keys，-1 表示无）
+保存为一个 .npz，加载后 top_level_category 为 O(1)，is_a 为闭包内二分查找。
+
+    python -m utils.snomed_hierarchy --rf2 sct2_Relationship_Snapshot_INT_20250801.txt --out data/snomed/hierarchy.npz
+    python -m utils.snomed_hierarchy --ancestors-json utils/ancestors_cache.json --out data/snomed/hierarchy.npz
+"""
+import argparse
+import json
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+IS_A = "116680003"
+INFERRED = "900000000000011006"  # characteristicTypeId，与 get_ancestors 默认 form=inferred 一致
+
+
+class SnomedHierarchy:
+
+    def __init__(self, ids, known, top_level, anc_offsets, anc, top_level_keys, version=""):
+        self.ids = ids                  # int64，升序
+        self.known = known              # bool，是否有该概念的闭包信息
+        self.top_level = top_level      # int8，顶层类别下标
+        self.anc_offsets = anc_offsets  # int64，长度 n + 1
+        self.anc = anc                  # int32，祖先的概念下标
+        self.top_level_keys = list(top_level_keys)
+        self.version = version
+
+    def __len__(self):
+        return int(self.known.sum())
+
+    def index(self, concept_id) -> int:
+        try:
+            cid = int(concept_id)
+        except (TypeError, ValueError):
+            return -1
+        i = int(np.searchsorted(self.ids, cid))
+        if i < len(self.ids) and self.ids[i] == cid:
+            return i
+        return -1
+
+    def __contains__(self, concept_id):
+        i = self.index(concept_id)
+        return i >= 0 and bool(self.known[i])
+
+    def _anc_idx(self, i):
+        return self.anc[self.anc_offsets[i]:self.anc_offsets[i + 1]]
+
+    def ancestors(self, concept_id) -> list[str]:
+        i = self.index(concept_id)
+        if i < 0 or not self.known[i]:
+            return []
+        return [str(x) for x in self.ids[self._anc_idx(i)]]
+
+    def top_level_category(self, concept_id) -> str | None:
+        """顶层类别名（同 find_top_level_category）；无祖先信息时返回 None"""
+        i = self.index(concept_id)
+        if i < 0 or not self.known[i]:
+            return None
+        k = int(self.top_level[i])
+        return self.top_level_keys[k] if k >= 0 else ""
+
+    def is_a(self, concept_id, ancestor_id) -> bool:
+        """concept 是否（传递地）is-a ancestor；不含自身"""
+        i, j = self.index(concept_id), self.index(ancestor_id)
+        if i < 0 or j < 0 or not self.known[i]:
+            return False
+        anc = self._anc_idx(i)
+        k = int(np.searchsorted(anc, j))
+        return k < len(anc) and int(anc[k]) == j
+
+    # ---- 构建 ----
+    @classmethod
+    def _from_closure(cls, ids, known, anc_lists, top_level_key_to_id, version):
+        counts = np.fromiter((len(a) for a in anc_lists), dtype=np.int64, count=len(anc_lists))
+        anc_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=anc_offsets[1:])
+        anc = np.concatenate(anc_lists).astype(np.int32) if len(anc_lists) else np.zeros(0, np.int32)
+        owner = np.repeat(np.arange(len(ids), dtype=np.int64), counts)
+
+        keys = list(top_level_key_to_id)
+        top_level = np.full(len(ids), -1, dtype=np.int8)
+        # 与 dict 顺序一致，先出现的顶层类别优先
+        for k in reversed(range(len(keys))):
+            t = int(np.searchsorted(ids, int(top_level_key_to_id[keys[k]])))
+            if t < len(ids) and ids[t] == int(top_level_key_to_id[keys[k]]):
+                top_level[owner[anc == t]] = k
+        return cls(ids, known, top_level, anc_offsets, anc, keys, version)
+
+    @classmethod
+    def from_edges(cls, child_ids, parent_ids, top_level_key_to_id, version=""):
+        """由 is-a 边（child -> parent）计算祖先闭包"""
+        child_ids = np.asarray(child_ids, dtype=np.int64)
+        parent_ids = np.asarray(parent_ids, dtype=np.int64)
+        ids = np.unique(np.concatenate([child_ids, parent_ids]))
+        n = len(ids)
+        c = np.searchsorted(ids, child_ids)
+        p = np.searchsorted(ids, parent_ids)
+        order = np.lexsort((p, c))
+        c, p = c[order], p[order]
+        keep = np.r_[True, (c[1:] != c[:-1]) | (p[1:] != p[:-1])] if len(c) else np.zeros(0, bool)
+        c, p = c[keep], p[keep]
+        par_off = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(c, minlength=n), out=par_off[1:])
+
+        # 拓扑序（父在前）：Kahn
+        n_parents = np.diff(par_off)
+        children = [[] for _ in range(n)]
+        for ci, pi in zip(c.tolist(), p.tolist()):
+            children[pi].append(ci)
+        pending = n_parents.copy()
+        queue = deque(np.flatnonzero(pending == 0).tolist())
+        anc_lists = [None] * n
+        empty = np.zeros(0, dtype=np.int64)
+        done = 0
+        while queue:
+            v = queue.popleft()
+            parents = p[par_off[v]:par_off[v + 1]]
+            if len(parents):
+                anc_lists[v] = np.unique(np.concatenate([parents] + [anc_lists[x] for x in parents.tolist()]))
+            else:
+                anc_lists[v] = empty
+            done += 1
+            for ch in children[v]:
+                pending[ch] -= 1
+                if pending[ch] == 0:
+                    queue.append(ch)
+        if done != n:
+            raise ValueError(f"is-a graph has a cycle ({n - done} concepts unresolved)")
+        known = np.ones(n, dtype=bool)
+        return cls._from_closure(ids, known, anc_lists, top_level_key_to_id, version)
+
+    @classmethod
+    def from_rf2(cls, relationship_path, top_level_key_to_id, version=""):
+        rel = pd.read_csv(relationship_path, sep="\t", dtype=str, quoting=3,
+                          usecols=["active", "sourceId", "destinationId", "typeId", "characteristicTypeId"])
+        rel = rel[(rel["active"] == "1") & (rel["typeId"] == IS_A) & (rel["characteristicTypeId"] == INFERRED)]
+        return cls.from_edges(rel["sourceId"].astype(np.int64).to_numpy(),
+                              rel["destinationId"].astype(np.int64).to_numpy(),
+                              top_level_key_to_id, version)
+
+    @classmethod
+    def from_ancestors(cls, ancestors_by_id, top_level_key_to_id, version=""):
+        """
+        由缓存的 ancestors 响应构建：{conceptId: [ {conceptId: ...} | id, ...]}
+        只有出现在 key 中的概念有闭包信息（known）。
+        """
+        closure = {}
+        for cid, items in ancestors_by_id.items():
+            closure[int(cid)] = {int(x["conceptId"]) if isinstance(x, dict) else int(x) for x in items}
+        all_ids = set(closure)
+        for s in closure.values():
+            all_ids |= s
+        ids = np.array(sorted(all_ids), dtype=np.int64)
+        known = np.isin(ids, np.fromiter(closure, dtype=np.int64, count=len(closure)))
+        empty = np.zeros(0, dtype=np.int64)
+        anc_lists = [np.searchsorted(ids, np.array(sorted(closure[int(x)]), dtype=np.int64))
+                     if k else empty for x, k in zip(ids.tolist(), known.tolist())]
+        return cls._from_closure(ids, known, anc_lists, top_level_key_to_id, version)
+
+    # ---- 持久化 ----
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, ids=self.ids, known=self.known, top_level=self.top_level,
+                 anc_offsets=self.anc_offsets, anc=self.anc,
+                 meta=np.array(json.dumps({"top_level_keys": self.top_level_keys, "version": self.version})))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            meta = json.loads(str(z["meta"]))
+            return cls(z["ids"], z["known"], z["top_level"], z["anc_offsets"], z["anc"],
+                       meta["top_level_keys"], meta.get("version", ""))
+
+
+def main():
+    from .snowstorm_api import snomed_ct_top_level_key_to_id, version, hierarchy_path
+    ap = argparse.ArgumentParser(description="Build the offline SNOMED CT is-a hierarchy")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--rf2", help="RF2 relationship snapshot (sct2_Relationship_Snapshot_*.txt)")
+    src.add_argument("--ancestors-json", help="JSON {conceptId: ancestors response}")
+    ap.add_argument("--out", default=hierarchy_path)
+    ap.add_argument("--version", default=version, help="Snowstorm version the hierarchy belongs to")
+    args = ap.parse_args()
+    if args.rf2:
+        h = SnomedHierarchy.from_rf2(args.rf2, snomed_ct_top_level_key_to_id, args.version)
+    else:
+        with open(args.ancestors_json, "r", encoding="utf-8") as f:
+            h = SnomedHierarchy.from_ancestors(json.load(f), snomed_ct_top_level_key_to_id, args.version)
+    h.save(args.out)
+    print(f"saved {len(h)} concepts ({len(h.anc)} ancestor links) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+本地 SNOMED CT 描述检索（替代 Snowstorm /browser/{branch}/descriptions）
+
+由 RF2 描述快照（sct2_Description_Snapshot-*.txt）与可选的概念快照构建：
+    - 词元倒排索引：词表按字典序排列，倒排表按词表顺序拼接（CSR），
+      前缀查询 = 词表上二分得到连续区间 = 倒排表上的一段切片
+    - 每个查询词都需前缀命中描述中的某个词（同 Snowstorm STANDARD 模式）
+    - 过滤：描述 active、概念 active、语言
+    - 排序近似 STANDARD：完全匹配 > 首词前缀匹配 > 词条更短 > conceptId
+返回条目与 Snowstorm 的 items 同形（term / concept.conceptId / concept.fsn.term ...）。
+
+    python -m utils.snomed_search --descriptions sct2_Description_Snapshot-en_INT_20250801.txt \\
+        --concepts sct2_Concept_Snapshot_INT_20250801.txt --out data/snomed/description_index.npz
+"""
+import argparse
+import bisect
+import csv
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+FSN = "900000000000003001"
+# definitionStatusId -> 下标；下标 len(...) 表示未知
+DEFINITION_STATUS = {"900000000000074008": 0, "900000000000073002": 1}
+DEFINITION_STATUS_NAMES = ("PRIMITIVE", "FULLY_DEFINED", "")
+# Snowstorm 的 lang 参数 -> RF2 languageCode
+LANGUAGE_CODES = {"english": "en", "spanish": "es", "french": "fr", "german": "de",
+                  "swedish": "sv", "danish": "da", "dutch": "nl", "chinese": "zh"}
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """小写 + 去变音符号（近似 Snowstorm 的 ASCII folding）"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(fold(text))
+
+
+def _pack(strings):
+    data = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in data], out=offsets[1:])
+    return np.frombuffer(b"".join(data), dtype=np.uint8), offsets
+
+
+class DescriptionIndex:
+
+    def __init__(self, arrays, meta):
+        self.a = arrays
+        self.langs = meta["langs"]
+        self.modules = meta["modules"]
+        self.version = meta.get("version", "")
+        self._term_blob = arrays["term_blob"].tobytes()
+        self._fsn_blob = arrays["fsn_blob"].tobytes()
+        self.vocab = arrays["vocab_blob"].tobytes().decode("utf-8").split("\n") if len(arrays["vocab_blob"]) else []
+        self._concept_ids = arrays["concept_ids"]
+
+    def __len__(self):
+        return len(self.a["desc_concept"])
+
+    @staticmethod
+    def _str(blob, offsets, i):
+        return blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def _prefix_range(self, word):
+        lo = bisect.bisect_left(self.vocab, word)
+        hi = bisect.bisect_left(self.vocab, word[:-1] + chr(ord(word[-1]) + 1))
+        return lo, hi
+
+    def _postings(self, lo, hi):
+        off = self.a["post_offsets"]
+        return np.unique(self.a["postings"][off[lo]:off[hi]])
+
+    def search(self, term: str, limit: int = 50, lang: str | None = "english",
+               concept_active: bool | None = True) -> list[dict]:
+        words = tokenize(term)
+        if not words:
+            return []
+        ranges = [self._prefix_range(w) for w in words]
+        if any(lo == hi for lo, hi in ranges):
+            return []
+        # 先取最小的倒排表，再逐个求交
+        order = sorted(range(len(words)), key=lambda k: self.a["post_offsets"][ranges[k][1]] - self.a["post_offsets"][ranges[k][0]])
+        hits = self._postings(*ranges[order[0]])
+        for k in order[1:]:
+            if not len(hits):
+                return []
+            hits = np.intersect1d(hits, self._postings(*ranges[k]), assume_unique=True)
+
+        concept = self.a["desc_concept"][hits]
+        if concept_active is not None:
+            keep = self.a["concept_active"][concept] == concept_active
+            hits, concept = hits[keep], concept[keep]
+        if lang:
+            code = LANGUAGE_CODES.get(lang, lang)
+            if code not in self.langs:
+                return []
+            keep = self.a["desc_lang"][hits] == self.langs.index(code)
+            hits, concept = hits[keep], concept[keep]
+        if not len(hits):
+            return []
+
+        folded_len = self.a["folded_len"][hits]
+        lo0, hi0 = ranges[0]
+        first = self.a["first_token"][hits]
+        first_prefix = (first >= lo0) & (first < hi0)
+        exact = first_prefix & (self.a["n_tokens"][hits] == len(words)) & (folded_len == len(fold(term).strip()))
+        rank = np.lexsort((hits, self._concept_ids[concept], folded_len, ~first_prefix, ~exact))
+        return [self._item(int(hits[r])) for r in rank[:limit]]
+
+    def _item(self, i):
+        a = self.a
+        c = int(a["desc_concept"][i])
+        lang = self.langs[a["desc_lang"][i]]
+        concept_id = str(self._concept_ids[c])
+        return {
+            "term": self._str(self._term_blob, a["term_offsets"], i),
+            "active": True,
+            "languageCode": lang,
+            "module": self.modules[a["desc_module"][i]],
+            "concept": {
+                "conceptId": concept_id,
+                "active": bool(a["concept_active"][c]),
+                "definitionStatus": DEFINITION_STATUS_NAMES[a["concept_status"][c]],
+                "moduleId": self.modules[a["concept_module"][c]],
+                "fsn": {"term": self._str(self._fsn_blob, a["fsn_offsets"], c), "lang": lang},
+                "id": concept_id,
+            },
+        }
+
+    # ---- 构建 ----
+    @classmethod
+    def from_rf2(cls, descriptions_path, concepts_path=None, langs=("en",), version=""):
+        rf2 = dict(sep="\t", dtype=str, quoting=csv.QUOTE_NONE, na_filter=False)
+        desc = pd.read_csv(descriptions_path, usecols=["active", "moduleId", "conceptId", "languageCode", "typeId", "term"], **rf2)
+        desc = desc[(desc["active"] == "1") & desc["languageCode"].isin(langs)].reset_index(drop=True)
+        concept_ids, desc_concept = np.unique(desc["conceptId"].astype(np.int64).to_numpy(), return_inverse=True)
+        n = len(concept_ids)
+
+        modules = sorted(set(desc["moduleId"]))
+        concept_active = np.ones(n, dtype=bool)
+        concept_status = np.full(n, len(DEFINITION_STATUS), dtype=np.int8)
+        concept_module = np.zeros(n, dtype=np.int32)
+        if concepts_path:
+            con = pd.read_csv(concepts_path, usecols=["id", "active", "moduleId", "definitionStatusId"], **rf2)
+            modules = sorted(set(modules) | set(con["moduleId"]))
+            cid = con["id"].astype(np.int64).to_numpy()
+            pos = np.searchsorted(concept_ids, cid).clip(0, max(n - 1, 0))
+            found = (concept_ids[pos] == cid) if n else np.zeros(len(cid), bool)
+            pos, con = pos[found], con[found]
+            concept_active[pos] = (con["active"] == "1").to_numpy()
+            concept_status[pos] = con["definitionStatusId"].map(DEFINITION_STATUS).fillna(len(DEFINITION_STATUS)).astype(np.int8).to_numpy()
+            concept_module[pos] = con["moduleId"].map({m: k for k, m in enumerate(modules)}).to_numpy()
+        module_idx = {m: k for k, m in enumerate(modules)}
+
+        # FSN（同一概念多语言时取第一条）
+        fsn = [""] * n
+        is_fsn = (desc["typeId"] == FSN).to_numpy()
+        for c, t in zip(desc_concept[is_fsn].tolist(), desc["term"][is_fsn].tolist()):
+            if not fsn[c]:
+                fsn[c] = t
+
+        terms = desc["term"].tolist()
+        token_id = {}
+        post_tok, post_desc = [], []
+        first_token = np.full(len(terms), -1, dtype=np.int64)
+        n_tokens = np.zeros(len(terms), dtype=np.int32)
+        folded_len = np.zeros(len(terms), dtype=np.int32)
+        for i, t in enumerate(terms):
+            folded = fold(t).strip()
+            words = _WORD.findall(folded)
+            folded_len[i] = len(folded)
+            n_tokens[i] = len(words)
+            for k, w in enumerate(dict.fromkeys(words)):
+                tid = token_id.setdefault(w, len(token_id))
+                if k == 0:
+                    first_token[i] = tid
+                post_tok.append(tid)
+                post_desc.append(i)
+        vocab = sorted(token_id)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[token_id[w] for w in vocab]] = np.arange(len(vocab))
+        post_tok = rank[np.asarray(post_tok, dtype=np.int64)]
+        post_desc = np.asarray(post_desc, dtype=np.int32)
+        order = np.lexsort((post_desc, post_tok))
+        post_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_tok, minlength=len(vocab)), out=post_offsets[1:])
+        first_token = np.where(first_token >= 0, rank[first_token.clip(0)], -1)
+
+        term_blob, term_offsets = _pack(terms)
+        fsn_blob, fsn_offsets = _pack(fsn)
+        vocab_blob, _ = _pack(["\n".join(vocab)])
+        langs = sorted(set(desc["languageCode"]))
+        arrays = {
+            "concept_ids": concept_ids,
+            "concept_active": concept_active,
+            "concept_status": concept_status,
+            "concept_module": concept_module,
+            "fsn_blob": fsn_blob, "fsn_offsets": fsn_offsets,
+            "desc_concept": desc_concept.astype(np.int32),
+            "desc_lang": desc["languageCode"].map({l: k for k, l in enumerate(langs)}).to_numpy(np.int8),
+            "desc_module": desc["moduleId"].map(module_idx).to_numpy(np.int32),
+            "term_blob": term_blob, "term_offsets": term_offsets,
+            "first_token": first_token, "n_tokens": n_tokens, "folded_len": folded_len,
+            "vocab_blob": vocab_blob,
+            "postings": post_desc[order], "post_offsets": post_offsets,
+        }
+        return cls(arrays, {"langs": langs, "modules": modules, "version": version})
+
+    # ---- 持久化 ----
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        meta = {"langs": self.langs, "modules": self.modules, "version": self.version}
+        np.savez(tmp, meta=np.array(json.dumps(meta)), **self.a)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            arrays = {k: z[k] for k in z.files if k != "meta"}
+            meta = json.loads(str(z["meta"]))
+        return cls(arrays, meta)
+
+
+def main():
+    from .snowstorm_api import version, description_index_path
+    ap = argparse.ArgumentParser(description="Build the local SNOMED CT description search index")
+    ap.add_argument("--descriptions", required=True, help="RF2 description snapshot (sct2_Description_Snapshot-*.txt)")
+    ap.add_argument("--concepts", help="RF2 concept snapshot, for concept active / definition status")
+    ap.add_argument("--langs", nargs="+", default=["en"], help="RF2 language codes to index")
+    ap.add_argument("--out", default=description_index_path)
+    ap.add_argument("--version", default=version, help="Snowstorm version the index belongs to")
+    args = ap.parse_args()
+    index = DescriptionIndex.from_rf2(args.descriptions, args.concepts, args.langs, args.version)
+    index.save(args.out)
+    print(f"saved {len(index)} descriptions ({len(index.vocab)} tokens) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,38 @@
 # Note that we recommend running your own Snowstorm instance for heavy script use.
 # See https://github.com/IHTSDO/snowstorm
 
-from urllib.request import urlopen, Request
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ratelimit import TokenBucket
+from .response_cache import ResponseCache
 
 baseUrl = 'http://localhost:8080'
 edition = 'MAIN'
 version = '2025-08-01'
 user_agent = 'Python'
 
+# 连接池 / 并发 / 限速默认值（本地 Snowstorm；公共服务器请调低 max_qps）
+MAX_WORKERS = 8
+MAX_QPS = 50.0
+REQUEST_TIMEOUT = 30
+BULK_BATCH_SIZE = 100           # 每次 bulk-load 的 conceptId 数
+
+# 离线资源（文件不存在或版本不符时走 HTTP）
+# is-a 层级：python -m utils.snomed_hierarchy 生成
+hierarchy_path = 'data/snomed/hierarchy.npz'
+# 描述检索索引：python -m utils.snomed_search 生成
+description_index_path = 'data/snomed/description_index.npz'
+# GET 响应的持久缓存（换 version 自动清空）；设为 None 关闭
+cache_path = 'data/snomed/snowstorm_cache.sqlite'
+
 snomed_ct_top_level_key_to_id = {
     'body structure': 123037004,
     'finding': 404684003,
@@ -42,41 +65,192 @@ def _branch_path(branch: str | None = None) -> str:
         return f"{edition}/{version}"
     return edition
 
-def _urlopen_with_header(url):
-    # adds User-Agent header otherwise urlopen on its own gets an IP blocked response
-    req = Request(url)
-    req.add_header('User-Agent', user_agent)
-    return urlopen(req)
+class SnowstormClient:
+    """
+    Snowstorm HTTP 客户端：
+    - requests.Session + HTTPAdapter 连接池（keep-alive，复用 TCP 连接）
+    - 每个 host 一个令牌桶限速（max_qps），所有线程共享
+    - 429/5xx/连接错误由 urllib3 Retry 指数退避重试
+    - map() 用有界线程池并发执行（max_workers）
+    - cache 不为空时，GET 响应按 (branch/endpoint, params) 持久缓存
+    """
+
+    def __init__(self, base_url: str = baseUrl, *, max_workers: int = MAX_WORKERS,
+                 max_qps: float = MAX_QPS, timeout: float = REQUEST_TIMEOUT, retries: int = 4,
+                 cache: ResponseCache | None = None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_qps = max_qps
+        self.timeout = timeout
+        self.session = requests.Session()
+        # adds User-Agent header otherwise some servers answer with an IP blocked response
+        self.session.headers.update({'User-Agent': user_agent, 'Accept': 'application/json'})
+        retry = Retry(total=retries, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({'GET', 'POST'}), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, max_workers), max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.max_qps)
+            return bucket
+
+    def request_json(self, method: str, path: str, params=None, json_body=None):
+        url = path if path.startswith('http') else self.base_url + path
+        self._bucket(url).acquire()
+        resp = self.session.request(method, url, params=params, json=json_body, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def get_json(self, path: str, params=None):
+        if self.cache is None:
+            return self.request_json('GET', path, params=params)
+        # 分支路径（含 edition/version）已在 path 中
+        endpoint = path[len(self.base_url):] if path.startswith(self.base_url) else path
+        key = ResponseCache.make_key(endpoint, params)
+        data = self.cache.get(key)
+        if data is None:
+            data = self.request_json('GET', path, params=params)
+            self.cache.put(key, data)
+        return data
+
+    def map(self, fn, items, progress=None):
+        """并发执行 fn(item)，结果按输入顺序返回；progress 为可选的 tqdm 之类对象"""
+        items = list(items)
+        if self.max_workers <= 1:
+            out = []
+            for it in items:
+                out.append(fn(it))
+                if progress is not None:
+                    progress.update(1)
+            return out
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            futures = [ex.submit(fn, it) for it in items]
+            out = []
+            for fut in futures:
+                out.append(fut.result())
+                if progress is not None:
+                    progress.update(1)
+            return out
+
+    # ---- endpoints ----
+    def search_descriptions(self, search_term: str, branch: str | None = None, limit: int = 50):
+        data = self.get_json(f"/browser/{_branch_path(branch)}/descriptions", params={
+            'term': search_term,
+            'conceptActive': 'true',
+            'lang': 'english',
+            'returnLimit': limit,
+        })
+        return data['items'] or []
+
+    def ancestors(self, concept_id: str, branch: str | None = None, form: str = "inferred"):
+        return self.get_json(f"/browser/{_branch_path(branch)}/concepts/{concept_id}/ancestors",
+                             params={'form': form})
+
+    def concept_detail(self, concept_id: str, branch: str | None = None, form: str = "inferred",
+                       include_descriptions: bool = False):
+        params = {'form': form}
+        if include_descriptions:
+            params['includeDescriptions'] = 'true'
+        return self.get_json(f"/{_branch_path(branch)}/concepts/{concept_id}", params=params)
+
+    def browser_concept(self, concept_id: str, branch: str | None = None):
+        """GET /browser/{branch}/concepts/{id}；不存在时返回 None"""
+        try:
+            return self.get_json(f"/browser/{_branch_path(branch)}/concepts/{concept_id}")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def bulk_load_concepts(self, concept_ids, branch: str | None = None, batch_size: int = BULK_BATCH_SIZE):
+        """
+        POST /browser/{branch}/concepts/bulk-load 分批取概念（browser 格式），结果按输入顺序返回
+        - 先查缓存（与 browser_concept 同一 key），只请求缺失的 id
+        - 各批并发；批请求失败或响应中缺少的 id 再并发逐个 GET
+        - 不存在的概念对应 None
+        """
+        branch_path = _branch_path(branch)
+        ids = [str(c).strip() for c in concept_ids]
+        key = lambda cid: ResponseCache.make_key(f"/browser/{branch_path}/concepts/{cid}")
+        found = {}
+        missing = []
+        for cid in dict.fromkeys(ids):
+            data = self.cache.get(key(cid)) if self.cache is not None else None
+            if data is None:
+                missing.append(cid)
+            else:
+                found[cid] = data
+
+        def load(batch):
+            try:
+                return self.request_json('POST', f"/browser/{branch_path}/concepts/bulk-load",
+                                         json_body={'conceptIds': batch, 'descriptionIds': []})
+            except requests.RequestException:
+                # HTTP 错误、连接错误、重试耗尽：整批交给下面的逐个 GET 兜底
+                return []
+
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        for concepts in self.map(load, batches):
+            for concept in concepts or []:
+                cid = str(concept.get('conceptId'))
+                found[cid] = concept
+                if self.cache is not None:
+                    self.cache.put(key(cid), concept)
+
+        rest = [cid for cid in missing if cid not in found]
+        for cid, concept in zip(rest, self.map(lambda cid: self.browser_concept(cid, branch), rest)):
+            found[cid] = concept
+        return [found.get(cid) for cid in ids]
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def default_client() -> SnowstormClient:
+    """模块级函数共用的客户端（懒加载，线程安全）"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                cache = ResponseCache(cache_path, version) if cache_path else None
+                _default_client = SnowstormClient(cache=cache)
+    return _default_client
+
+def set_default_client(client: SnowstormClient):
+    global _default_client
+    _default_client = client
 
 #Prints fsn of a concept
 def getConceptById(id):
-    url = baseUrl + '/browser/' + edition + '/' + version + '/concepts/' + id
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
+    data = default_client().get_json('/browser/' + edition + '/' + version + '/concepts/' + id)
 
     print (data['fsn']['term'])
 
 #Prints description by id
 def getDescriptionById(id):
-    url = baseUrl + '/' + edition + '/' + version + '/descriptions/' + id
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
+    data = default_client().get_json('/' + edition + '/' + version + '/descriptions/' + id)
 
     print (data['term'])
 
 #Prints number of descriptions containing the search term with a specific semantic tag
 def getDescriptionsByStringFromProcedure(searchTerm, semanticTag):
     url = baseUrl + '/browser/' + edition + '/' + version + '/descriptions?term=' + quote(searchTerm) + '&conceptActive=true&semanticTag=' + quote(semanticTag) + '&groupByConcept=false&searchMode=STANDARD&offset=0&limit=50'
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
+    data = default_client().get_json(url)
 
     print (data['totalElements'])
     
  #Prints snomed code for searched disease or symptom
 def getSnomedCodeSimilar(searchTerm):
     url = baseUrl + '/browser/' + edition + '/' + version + '/descriptions?term=' + quote(searchTerm) + '&conceptActive=true&groupByConcept=false&searchMode=STANDARD&offset=0&limit=50'
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
+    data = default_client().get_json(url)
 
     for term in data['items']:
       if searchTerm in term['term']:
@@ -84,8 +258,7 @@ def getSnomedCodeSimilar(searchTerm):
  
 def getSnomedCode(searchTerm):
     url = baseUrl + '/browser/' + edition + '/' + version + '/descriptions?term=' + quote(searchTerm) + '&conceptActive=true&groupByConcept=false&searchMode=STANDARD&offset=0&limit=50'
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
+    data = default_client().get_json(url)
 
     for term in data['items']:
       if searchTerm == term['term']:
@@ -103,25 +276,12 @@ def getDescriptionByString(
         - items:      每条命中的精简信息（含 term、concept 概要等）
     支持分页（offset 风格）；max_pages 控制拉取页数。
     """
-    branch_path = _branch_path(branch)
-
     # url = baseUrl + '/browser/' + 'MAIN' + '/' + 'concepts?term=' + quote(searchTerm) + '&activeFilter=true&offset=0&limit=50'
-    url_origin = baseUrl + '/browser/' + 'MAIN' + '/' + 'descriptions?&limit=50&term=' + quote(searchTerm) + '&conceptActive=true&lang=english&skipTo=0&returnLimit=50'
-
-    url = (
-        f"{baseUrl}/browser/{branch_path}/descriptions"
-        f"?&term={quote(searchTerm)}"
-        f"&conceptActive=true"
-        f"&lang=english"
-        f"&returnLimit={50}"
-    )
-
-    response = _urlopen_with_header(url).read()
-    data = json.loads(response.decode('utf-8'))
-    if data['items']:
-        return data['items']
-    else:
-        return []
+    # GET {baseUrl}/browser/{branch}/descriptions?term=...&conceptActive=true&lang=english&returnLimit=50
+    index = local_description_index() if not branch else None
+    if index is not None:
+        return index.search(searchTerm, limit=50, lang='english', concept_active=True)
+    return default_client().search_descriptions(searchTerm, branch)
 
 # GET /browser/{branch}/concepts/{id}/ancestors?form=inferred
 def get_ancestors(
@@ -133,10 +293,7 @@ def get_ancestors(
     官方推荐：GET /{branch}/concepts/{id}/ancestors
     - relationships 不会包含；通过 form 控制 stated/inferred
     """
-    branch_path = _branch_path(branch)
-    url = f"{baseUrl}/browser/{branch_path}/concepts/{concept_id}/ancestors?form={quote(form)}"
-    data = json.loads(_urlopen_with_header(url).read().decode("utf-8"))
-    return data
+    return default_client().ancestors(concept_id, branch, form)
 
 def get_concept_detail(
     concept_id: str,
@@ -150,53 +307,152 @@ def get_concept_detail(
     - relationships 默认会包含；通过 form 控制 stated/inferred
     - include_descriptions=True 时附带 descriptions
     """
-    branch_path = _branch_path(branch)
-    params = [f"form={quote(form)}"]
-    if include_descriptions:
-        params.append("includeDescriptions=true")
-    url = f"{baseUrl}/{branch_path}/concepts/{concept_id}"
-    if params:
-        url += "?" + "&".join(params)
-
-    data = json.loads(_urlopen_with_header(url).read().decode("utf-8"))
-    return data
+    return default_client().concept_detail(concept_id, branch, form, include_descriptions)
 
 def get_concepts_details(
     concept_ids: list[str],
     *,
     branch: str | None = None,
     form: str = "inferred",
-    include_descriptions: bool = False
+    include_descriptions: bool = False,
+    bulk: bool = False
 ):
     """
-    遍历概念 id 列表逐个取详情（简洁可靠；也便于失败重试/断点续拉）
-    """
-    details = []
-    for cid in concept_ids:
-        details.append(
-            get_concept_detail(
-                cid,
-                branch=branch,
-                form=form,
-                include_descriptions=include_descriptions
-            )
+    批量取概念详情，结果与 concept_ids 顺序一致
+    - 默认：并发逐个 GET /{branch}/concepts/{id}，返回格式与 get_concept_detail 相同，不存在的概念抛 HTTPError
+    - bulk=True（需显式开启，且 form=inferred）：bulk-load 分批 + 缓存 + 逐个兜底，返回的是
+      browser 格式概念（与默认格式不同；include_descriptions=False 时去掉 descriptions；不存在的概念为 None）
+    """
+    client = default_client()
+    if not bulk or form != "inferred":
+        return client.map(
+            lambda cid: get_concept_detail(cid, branch=branch, form=form, include_descriptions=include_descriptions),
+            concept_ids
         )
+    details = client.bulk_load_concepts(concept_ids, branch)
+    if not include_descriptions:
+        details = [{k: v for k, v in d.items() if k != 'descriptions'} if d is not None else None for d in details]
     return details
 
+_local_resources = {}
+_local_lock = threading.Lock()
+
+def _load_local(name: str, path: str, loader):
+    """懒加载离线资源（层级 / 描述索引）；文件不存在或版本不符时返回 None"""
+    if name not in _local_resources:
+        with _local_lock:
+            if name not in _local_resources:
+                resource = None
+                if path and os.path.exists(path):
+                    resource = loader(path)
+                    if resource.version != version:
+                        print(f"[snowstorm_api] ignoring {path}: built for {resource.version!r}, using {version!r}")
+                        resource = None
+                _local_resources[name] = resource
+    return _local_resources[name]
+
+def local_hierarchy():
+    from .snomed_hierarchy import SnomedHierarchy
+    return _load_local('hierarchy', hierarchy_path, SnomedHierarchy.load)
+
+def local_description_index():
+    from .snomed_search import DescriptionIndex
+    return _load_local('descriptions', description_index_path, DescriptionIndex.load)
+
+def set_local_hierarchy(hierarchy):
+    _local_resources['hierarchy'] = hierarchy
+
+def set_local_description_index(index):
+    _local_resources['descriptions'] = index
+
+def get_ancestor_ids(concept_id: str, branch: str | None = None) -> set[str]:
+    """
+    祖先 conceptId 集合（inferred）：默认分支优先查离线层级，未收录的概念再请求 ancestors 接口
+    """
+    h = local_hierarchy() if not branch else None
+    if h is not None and concept_id in h:
+        return set(h.ancestors(concept_id))
+    return {str(item['conceptId']) for item in get_ancestors(concept_id, branch)}
+
+def is_a(concept_id: str, ancestor_id: str, branch: str | None = None) -> bool:
+    """concept 是否（传递地）is-a ancestor"""
+    h = local_hierarchy() if not branch else None
+    if h is not None and concept_id in h:
+        return h.is_a(concept_id, ancestor_id)
+    return str(ancestor_id) in get_ancestor_ids(concept_id, branch)
+
 def find_top_level_category(concept_id: str) -> str | None:
     """
     追溯到顶层类别（直接父节点是顶层类别）
     """
+    h = local_hierarchy()
+    if h is not None:
+        category = h.top_level_category(concept_id)
+        if category is not None:
+            return category
     snomed_ct_top_level_id_to_key = {str(v): k for k, v in snomed_ct_top_level_key_to_id.items()}
-    ancestors = get_ancestors(concept_id)
-    ancestor_ids = {str(item['conceptId']) for item in ancestors}
+    ancestor_ids = get_ancestor_ids(concept_id)
     for ancestor_id in ancestor_ids:
         if ancestor_id in snomed_ct_top_level_id_to_key.keys():
             return snomed_ct_top_level_id_to_key[ancestor_id]
     return ""
 
 
+def _iter_names(path: str):
+    """名称列表：.txt 每行一个；.json 取实体的 entity_name_standard（与 align_to_snomed 一致）"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entities = data.get('entities', []) if isinstance(data, dict) else data
+        for e in entities:
+            if isinstance(e, dict):
+                yield e.get('entity_name_standard', '')
+            else:
+                yield str(e)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from f
+
+def warm_cache(names, with_ancestors: bool = True, client: SnowstormClient | None = None, progress=None):
+    """
+    预填充响应缓存：对每个名称做描述检索，并（可选）取首个命中概念的顶层类别所需的 ancestors
+    返回去重后的名称数
+    """
+    client = client or default_client()
+    names = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+
+    def warm(name):
+        items = client.search_descriptions(name)
+        if with_ancestors and items:
+            concept_id = str(items[0].get('concept', {}).get('conceptId', '')).strip()
+            if concept_id and not (local_hierarchy() is not None and concept_id in local_hierarchy()):
+                client.ancestors(concept_id)
+
+    client.map(warm, names, progress=progress)
+    return len(names)
+
+def main():
+    import argparse
+    from tqdm import tqdm
+    ap = argparse.ArgumentParser(description="Pre-populate the Snowstorm response cache")
+    ap.add_argument("names", nargs="+", help=".txt (one name per line) or kg_result .json files")
+    ap.add_argument("--no-ancestors", action="store_true", help="only cache description searches")
+    args = ap.parse_args()
+    client = default_client()
+    if client.cache is None:
+        raise SystemExit("cache_path is not set")
+    names = list(dict.fromkeys(n.strip() for path in args.names for n in _iter_names(path) if n and n.strip()))
+    with tqdm(total=len(names)) as progress:
+        n = warm_cache(names, not args.no_ancestors, client, progress)
+    print(f"warmed {n} names; cache {client.cache.path}: {len(client.cache)} responses "
+          f"({client.cache.hits} hits, {client.cache.misses} misses)")
+
+
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:]:
+        main()
+        raise SystemExit
 
     result = getDescriptionByString('Burn', '')
 
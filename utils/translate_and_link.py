@@ -5,13 +5,20 @@ import time
 import os
 import requests
 import re
+import hashlib
+import threading
 from tqdm import tqdm
 from typing import Any, Dict, Iterable, List, Set, Tuple
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from .AuthV3Util import returnAuthMap
-from .snowstorm_api import getDescriptionByString, find_top_level_category
+from .ratelimit import TokenBucket
+from .translation_memory import TranslationMemory
+from .snowstorm_api import getDescriptionByString, find_top_level_category, default_client
 
-from .util_prompt import type_classification_prompt
+from .util_prompt import type_classification_prompt, type_classification_batch_prompt
+from .response_cache import ResponseCache
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -52,8 +59,18 @@ snomed_ct_top_level_key_to_id = {
     'substance': 105590001
 }
 
+# type classification config
+TYPE_BATCH_SIZE = 20          # 每个 prompt 的实体数
+TYPE_MAX_CONCURRENCY = 4      # 并发的 LLM 请求数
+# (name, description hash) -> top_level_category；模型或 prompt 变化时自动清空
+TYPE_CACHE = "result/type_classification_cache.sqlite"
+
 # translate config
 YOUDAO_ENDPOINT = "https://openapi.youdao.com/api"
+TRANSLATE_WORKERS = 4
+TRANSLATE_QPS = 10.0
+# 持久化翻译记忆（跨章节、跨运行复用）
+TRANSLATION_MEMORY = "result/translation_memory.sqlite"
 
 INPUT_JSONS = [
     "result/import_data/kg_result_modified_normalize_debug_v2_chapter_4.json",
@@ -79,10 +96,12 @@ def iter_entity_dicts(obj: Any) -> Iterable[Dict[str, Any]]:
 def translate_one(text: str, app_key: str, app_secret: str,
                   lang_from: str = "auto", lang_to: str = "en",
                   timeout: int = 15, vocab_id: str = None,
-                  max_retries: int = 4, retry_base_sleep: float = 1.0) -> str:
+                  max_retries: int = 4, retry_base_sleep: float = 1.0,
+                  session: requests.Session = None, limiter: TokenBucket = None) -> str:
     """
     Translate a single string using Youdao API (v3 auth).
     Returns translated text; raises RuntimeError on persistent failure.
+    session: optional pooled requests.Session; limiter: optional shared rate limiter.
     """
     assert isinstance(text, str) and text.strip() != ""
     params = {
@@ -98,11 +117,14 @@ def translate_one(text: str, app_key: str, app_secret: str,
     params.update(auth)
 
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    post = session.post if session is not None else requests.post
 
     attempt = 0
     while True:
+        if limiter is not None:
+            limiter.acquire()
         try:
-            resp = requests.post(YOUDAO_ENDPOINT, data=params, headers=headers, timeout=timeout)
+            resp = post(YOUDAO_ENDPOINT, data=params, headers=headers, timeout=timeout)
             resp.raise_for_status()
             data = resp.json()
         except Exception as e:
@@ -130,10 +152,138 @@ def translate_one(text: str, app_key: str, app_secret: str,
             sleep_s = min(30.0, retry_base_sleep * (2 ** (attempt - 1)))
             time.sleep(sleep_s)
 
-def align_to_snomed():
+def translate_names(names: Iterable[str], lang_from: str = "auto", lang_to: str = "en",
+                    vocab_id: str = None, workers: int = TRANSLATE_WORKERS, qps: float = TRANSLATE_QPS,
+                    memory: TranslationMemory = None, refresh: bool = False) -> Tuple[Dict[str, str], int]:
+    """
+    去重后批量翻译：先查翻译记忆，缺失的用连接池 + 有界线程池 + 令牌桶限速请求，成功结果写回记忆
+    refresh=True：不读翻译记忆，全部重新翻译（结果仍写回记忆）
+    返回 ({name: translation}, 失败数)
+    """
+    names = list(dict.fromkeys(n for n in names if n))
+    done = memory.lookup(names, lang_from, lang_to, vocab_id) if memory is not None and not refresh else {}
+    todo = [n for n in names if n not in done]
+    print(f"[info] unique names: {len(names)}, from translation memory: {len(done)}, to translate: {len(todo)}")
+    if not todo:
+        return done, 0
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    limiter = TokenBucket(qps)
+
+    def work(name):
+        try:
+            t = translate_one(text=name, app_key=APP_KEY, app_secret=APP_SECRET,
+                              lang_from=lang_from, lang_to=lang_to, vocab_id=vocab_id,
+                              session=session, limiter=limiter)
+        except Exception as e:
+            print(f"[warn] translate fail for '{name}': {e}", file=sys.stderr)
+            return name, None
+        if memory is not None:
+            memory.put(name, t, lang_from, lang_to, vocab_id)
+        return name, t
+
+    fail = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex, tqdm(total=len(todo)) as progress:
+        for name, t in ex.map(work, todo):
+            if t is None:
+                fail += 1
+            else:
+                done[name] = t
+            progress.update(1)
+    session.close()
+    return done, fail
 
+def align_entity(entity: Dict[str, Any]):
+    """
+    对齐单个实体（原地写入 align_entity / align_entity_type / top_level_category）
+    返回 True 表示得到了确定结果（含无法对齐），False 表示无名称或请求失败
+    HTTP 429/5xx/连接错误的重试由 SnowstormClient 的 urllib3 Retry 负责，这里不再叠加重试
+    """
+    entity_name_standard = entity.get("entity_name_standard", "").strip()
+    if not entity_name_standard:
+        return False
+    try:
+        align_entity_list = getDescriptionByString(entity_name_standard)
+        # 无法对齐
+        if not align_entity_list:
+            entity["align_entity"] = {}
+            entity["align_entity_type"] = ""
+            entity["top_level_category"] = ""
+            return True
+        align_entity = align_entity_list[0] # 只取第一个，但并不是最相关的，还需要优化（LLM？）
+        top_level_category = find_top_level_category(align_entity.get("concept").get("conceptId", "").strip())
+        if not top_level_category:
+            entity["top_level_category"] = ""
+        else:
+            entity["top_level_category"] = top_level_category
+        entity["align_entity"] = align_entity
+
+        if "concept" in align_entity and "fsn" in align_entity["concept"]:
+            term = align_entity["concept"]["fsn"]["term"]
+            # match = re.search(r"\((.*?)\)", term)
+            m = re.findall(r"\(([^()]*)\)", term)
+            if m:
+                entity["align_entity_type"] = m[-1].strip()  # 提取括号中的内容
+            else:
+                entity["align_entity_type"] = ""
+        else:
+            entity["align_entity_type"] = ""
+        return True
+    except Exception as e:
+        print(f"[warn] Failed to align entity '{entity_name_standard}': {e}", file=sys.stderr)
+        entity["align_entity"] = {}
+        entity["align_entity_type"] = ""
+        entity["top_level_category"] = ""
+        return False
+
+ALIGN_FIELDS = ("align_entity", "align_entity_type", "top_level_category")
+
+def _read_journal(path: str) -> Dict[int, Dict[str, Any]]:
+    """读取对齐日志（JSONL，每行一个实体）；末尾被截断的行忽略"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            records[rec["i"]] = rec
+    return records
+
+def _restore_alignments(entities: List[Dict[str, Any]], records: Dict[int, Dict[str, Any]]) -> Set[int]:
+    """按下标回填已有对齐结果（名称不一致说明输入已变化，跳过），返回已回填的下标"""
+    restored = set()
+    for i, rec in records.items():
+        if i < len(entities) and entities[i].get("entity_name_standard", "").strip() == rec.get("name"):
+            for k in ALIGN_FIELDS:
+                entities[i][k] = rec.get(k, "" if k != "align_entity" else {})
+            restored.add(i)
+    return restored
+
+def _write_json_atomic(path: str, data: Any):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def align_to_snomed(resume: bool = True):
+    """
+    逐章节对齐到 SNOMED CT，每个实体完成后追加到 <输出>.journal.jsonl：
+    - resume=True：先从日志和已有章节输出回填，只对齐未回填的实体
+      （章节输出里区分不了“无法对齐”和“重试耗尽”，只回填非空的 align_entity）
+    - 输入里已有的 align_entity（含以前失败写入的 {}）不作为跳过依据；resume=False 时全部重新对齐
+    - 全部完成后压缩写入 kg_result_chapter_N.json（原子替换），并删除日志
+    - 重试耗尽的实体不写日志，下次运行会重新对齐
+    """
     import_data_dir = 'result/analysis_result/entity_align_result_snowstorm'
     output_file_dir = 'result/analysis_result/entity_align_result_all'
+    # 共享的 Snowstorm 客户端：连接池 + 限速 + 有界并发（见 snowstorm_api.SnowstormClient）
+    client = default_client()
     files = [file for file in os.listdir(import_data_dir) if file.endswith(".json")]
     for file in files:
         entities = []
@@ -144,56 +294,47 @@ def align_to_snomed():
         if not entities:
             print(f"[warn] No entities found in {file_path}, skipping.", file=sys.stderr)
             continue
-        for entity in tqdm(entities):
-            entity_name_standard = entity.get("entity_name_standard", "").strip()
-            if entity_name_standard:
-                attempt = 0
-                max_retries = 4
-                retry_base_sleep = 1.0
-                while attempt <= max_retries:
-                    try:
-                        align_entity_list = getDescriptionByString(entity_name_standard)
-                        # 无法对齐
-                        if not align_entity_list:
-                            entity["align_entity"] = {}
-                            entity["align_entity_type"] = ""
-                            entity["top_level_category"] = ""
-                            break
-                        align_entity = align_entity_list[0] # 只取第一个，但并不是最相关的，还需要优化（LLM？）
-                        top_level_category = find_top_level_category(align_entity.get("concept").get("conceptId", "").strip())
-                        if not top_level_category:
-                            entity["top_level_category"] = ""
-                        else:
-                            entity["top_level_category"] = top_level_category    
-                        entity["align_entity"] = align_entity
-
-                        if "concept" in align_entity and "fsn" in align_entity["concept"]:
-                            term = align_entity["concept"]["fsn"]["term"]
-                            # match = re.search(r"\((.*?)\)", term)
-                            m = re.findall(r"\(([^()]*)\)", term)
-                            if m:
-                                entity["align_entity_type"] = m[-1].strip()  # 提取括号中的内容
-                            else:
-                                entity["align_entity_type"] = ""
-                        else:
-                            entity["align_entity_type"] = ""
-                        break
-                    except Exception as e:
-                        attempt += 1
-                        if attempt > max_retries:
-                            print(f"[warn] Failed to align entity '{entity_name_standard}' after {max_retries} retries: {e}", file=sys.stderr)
-                            entity["align_entity"] = {}
-                            entity["align_entity_type"] = ""
-                            entity["top_level_category"] = ""
-                            break
-                        sleep_s = min(30.0, retry_base_sleep * (2 ** (attempt - 1)))
-                        print(f"[warn] Retrying alignment for '{entity_name_standard}' in {sleep_s:.1f} seconds due to error: {e}", file=sys.stderr)
-                        time.sleep(sleep_s)
 
         chapter_num = file.split("_")[-3]
         output_file = os.path.join(output_file_dir, f"kg_result_chapter_{chapter_num}.json")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        journal_file = output_file + ".journal.jsonl"
+        restored = set()
+        if resume:
+            previous = {}
+            if os.path.exists(output_file):
+                with open(output_file, "r", encoding="utf-8") as f:
+                    previous = {i: dict(e, name=e.get("entity_name_standard", "").strip())
+                                for i, e in enumerate(json.load(f).get("entities", []))
+                                if isinstance(e, dict) and e.get("align_entity")}
+            previous.update(_read_journal(journal_file))
+            restored = _restore_alignments(entities, previous)
+            if restored:
+                print(f"[info] {file}: restored {len(restored)} alignments from previous runs")
+        elif os.path.exists(journal_file):
+            os.remove(journal_file)
+
+        todo = [i for i, e in enumerate(entities)
+                if i not in restored and e.get("entity_name_standard", "").strip()]
+        print(f"[info] {file}: {len(todo)} of {len(entities)} entities to align")
+        lock = threading.Lock()
+        with open(journal_file, "a", encoding="utf-8") as journal:
+
+            def work(i):
+                entity = entities[i]
+                if align_entity(entity):
+                    rec = {"i": i, "name": entity.get("entity_name_standard", "").strip()}
+                    rec.update((k, entity.get(k)) for k in ALIGN_FIELDS)
+                    line = json.dumps(rec, ensure_ascii=False) + "\n"
+                    with lock:
+                        journal.write(line)
+                        journal.flush()
+
+            # 各实体互不依赖，原地修改，输出顺序与串行一致
+            with tqdm(total=len(todo)) as progress:
+                client.map(work, todo, progress=progress)
+
+        _write_json_atomic(output_file, data)
+        os.remove(journal_file)
         print(f"[done] Processed and wrote: {output_file}")
 
 def count_type():
@@ -213,96 +354,157 @@ def count_type():
     for entity_type, count in sorted_types:
         print(f"{entity_type}: {count}")
 
-def type_classification():
-    # 打开 JSON 模式，强制模型以 JSON 返回
+def _type_cache_key(entity: Dict[str, Any]) -> str:
+    description = entity.get("description", "")
+    if not isinstance(description, str):
+        description = json.dumps(description, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha1(description.encode("utf-8")).hexdigest()
+    return ResponseCache.make_key(entity.get("name", ""), {"description": digest})
+
+def classify_entity_types(entities: List[Dict[str, Any]], batch_size: int = TYPE_BATCH_SIZE,
+                          max_concurrency: int = TYPE_MAX_CONCURRENCY) -> List[str]:
+    """
+    批量 LLM 分类：每个 prompt 含 batch_size 个实体，各批通过 chain.batch 并发
+    批结果缺失 / 非法 / 整批失败的实体退回单实体 prompt
+    返回与 entities 顺序一致的 top_level_category 列表
+    """
     llm_json = llm.bind(response_format={"type": "json_object"})
-    prompt = ChatPromptTemplate.from_template(type_classification_prompt)
     parser = JsonOutputParser()
-    chain = prompt | llm_json | parser  # 直接拿到 dict
-    
+    single_chain = ChatPromptTemplate.from_template(type_classification_prompt) | llm_json | parser
+    batch_chain = ChatPromptTemplate.from_template(type_classification_batch_prompt) | llm_json | parser
+    snomed_ct_types = list(snomed_ct_top_level_key_to_id.keys())
+    allowed = set(snomed_ct_types) | {"Other"}
+    config = {"max_concurrency": max_concurrency}
+
+    results: List[Any] = [None] * len(entities)
+    batches = [list(range(i, min(i + batch_size, len(entities)))) for i in range(0, len(entities), batch_size)]
+    inputs = [{
+        "entities": json.dumps([{"id": k, "entity": entities[i]} for k, i in enumerate(batch)], ensure_ascii=False),
+        "allowed_types": snomed_ct_types,
+    } for batch in batches]
+    outputs = batch_chain.batch(inputs, config=config, return_exceptions=True) if inputs else []
+    for batch, out in zip(batches, outputs):
+        if isinstance(out, Exception):
+            print(f"[warn] batch classification failed, falling back to single prompts: {out}", file=sys.stderr)
+            continue
+        items = out.get("results", []) if isinstance(out, dict) else out
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            k, category = item.get("id"), item.get("top_level_category")
+            if isinstance(k, int) and 0 <= k < len(batch) and category in allowed:
+                results[batch[k]] = category
+
+    retry = [i for i, r in enumerate(results) if r is None]
+    if retry:
+        print(f"[info] single-prompt fallback for {len(retry)} entities")
+        inputs = [{"entity": entities[i], "allowed_types": snomed_ct_types} for i in retry]
+        for i, out in zip(retry, single_chain.batch(inputs, config=config, return_exceptions=True)):
+            if isinstance(out, Exception):
+                print(f"[warn] Failed to classify entity '{entities[i].get('name', '')}': {out}", file=sys.stderr)
+                results[i] = ""
+            else:
+                results[i] = (out.get("top_level_category") or "") if isinstance(out, dict) else ""
+    return results
+
+def type_classification(reclassify: bool = False, batch_size: int = TYPE_BATCH_SIZE,
+                        max_concurrency: int = TYPE_MAX_CONCURRENCY, cache_path: str = TYPE_CACHE):
+    """
+    对所有文件中尚无 top_level_category 的实体做 LLM 分类（reclassify=True 时全部重新分类）
+    同名同描述的实体只分类一次，结果按 (name, description hash) 持久缓存
+    """
     input_file_dir = "result/analysis_result/entity_align_result_snowstorm_with_top_level_category"
     output_file_dir = "result/analysis_result/entity_align_result_llm_all"
     file_list = [os.path.join(input_file_dir, file) for file in os.listdir(input_file_dir) if file.endswith(".json")]
-    snomed_ct_types = list(snomed_ct_top_level_key_to_id.keys())
+    prompt_version = hashlib.sha1((type_classification_prompt + type_classification_batch_prompt).encode("utf-8")).hexdigest()[:12]
+    cache = ResponseCache(cache_path, f"{OPENAI_MODEL}:{prompt_version}") if cache_path else None
+
+    datasets = []
+    pending: Dict[str, Dict[str, Any]] = {}  # cache key -> 代表实体
     for file in file_list:
-        print(f"[info] Processing file: {file}")
-        entities = []
         with open(file, "r", encoding="utf-8") as f:
             data = json.load(f)
-            entities = data.get("entities", [])
+        entities = data.get("entities", [])
         if not entities:
             print(f"[warn] No entities found in {file}, skipping.", file=sys.stderr)
             continue
-        for entity in tqdm(entities):
-            # if not entity.get("top_level_category", "").strip():
-            inputs = {"entity": entity, "allowed_types": snomed_ct_types}
-            result = json.dumps(chain.invoke(inputs), ensure_ascii=False, indent=2)
-            entity["top_level_category"] = json.loads(result).get("top_level_category", "")
+        datasets.append((file, data, entities))
+        for entity in entities:
+            if reclassify or not (entity.get("top_level_category") or "").strip():
+                pending.setdefault(_type_cache_key(entity), entity)
+
+    categories: Dict[str, str] = {}
+    for key in pending:
+        hit = cache.get(key) if cache is not None else None
+        if hit is not None:
+            categories[key] = hit.get("top_level_category") or ""
+    todo = [key for key in pending if key not in categories]
+    print(f"[info] entities to classify: {len(pending)} unique, cached: {len(categories)}, calling LLM: {len(todo)}")
+    for key, category in zip(todo, classify_entity_types([pending[k] for k in todo], batch_size, max_concurrency)):
+        categories[key] = category
+        if cache is not None and category:
+            cache.put(key, {"top_level_category": category})
+
+    for file, data, entities in datasets:
+        print(f"[info] Processing file: {file}")
+        for entity in entities:
+            if reclassify or not (entity.get("top_level_category") or "").strip():
+                entity["top_level_category"] = categories.get(_type_cache_key(entity), "")
         with open(os.path.join(output_file_dir, f"{os.path.basename(file)}"), "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
+def _needs_translation(ent: Dict[str, Any], overwrite_existing: bool) -> str:
+    """返回需要翻译的 name；无需翻译时返回空串"""
+    name = ent.get("name", "").strip() if isinstance(ent.get("name"), str) else ""
+    if not name:
+        return ""
+    if (not overwrite_existing) and isinstance(ent.get("entity_name_standard"), str) and ent["entity_name_standard"].strip():
+        return ""
+    return name
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--from_lang", default="auto", help="Source language code (default: auto)")
     ap.add_argument("--to_lang", default="en", help="Target language code (default: en)")
     ap.add_argument("--vocab_id", default=None, help="Optional Youdao user vocabulary ID")
     ap.add_argument("--overwrite_existing", action="store_true",
-                    help="If set, always re-translate even if entity_name_standard exists")
-    ap.add_argument("--rate_limit_sleep", type=float, default=0.05,
-                    help="Sleep seconds between requests to avoid throttling (default: 0.05)")
+                    help="If set, always re-translate even if entity_name_standard exists (bypasses the translation memory lookup)")
+    ap.add_argument("--workers", type=int, default=TRANSLATE_WORKERS,
+                    help=f"Concurrent translation requests (default: {TRANSLATE_WORKERS})")
+    ap.add_argument("--qps", type=float, default=TRANSLATE_QPS,
+                    help=f"Max translation requests per second (default: {TRANSLATE_QPS})")
+    ap.add_argument("--translation_memory", default=TRANSLATION_MEMORY,
+                    help="SQLite translation memory reused across runs ('' to disable)")
     args = ap.parse_args()
 
+    # 先读入全部章节，整个语料去重后统一翻译
+    datasets = []
     for input_json in INPUT_JSONS:
-
-        # Load JSON
         with open(input_json, "r", encoding="utf-8") as f:
             data = json.load(f)
-
         entities: List[Dict[str, Any]] = list(iter_entity_dicts(data["entities"]))
-        print(f"[info] found {len(entities)} entity dicts with 'name'")
+        print(f"[info] {input_json}: found {len(entities)} entity dicts with 'name'")
+        datasets.append((input_json, data, entities))
 
-        # Worklist (dedup only for API call cou2nt visibility; we still translate per-entity to keep mapping simple)
-        names_to_process: List[str] = []
-        for ent in entities:
-            name = ent.get("name", "").strip() if isinstance(ent.get("name"), str) else ""
-            if not name:
-                continue
-            if (not args.overwrite_existing) and isinstance(ent.get("entity_name_standard"), str) and ent["entity_name_standard"].strip():
-                continue
-            names_to_process.append(name)
-
-        print(f"[info] items to translate: {len(names_to_process)} (per-entity requests)")
+    names = [_needs_translation(ent, args.overwrite_existing) for _, _, entities in datasets for ent in entities]
+    memory = TranslationMemory(args.translation_memory) if args.translation_memory else None
+    translations, _ = translate_names(names, args.from_lang, args.to_lang, args.vocab_id,
+                                      args.workers, args.qps, memory, refresh=args.overwrite_existing)
 
-        # Translate and fill back
+    for input_json, data, entities in datasets:
         success, fail = 0, 0
-        cache: Dict[Tuple[str, str, str], str] = {}  # (text, from, to) -> translation
-
         for ent in entities:
-            name = ent.get("name", "").strip() if isinstance(ent.get("name"), str) else ""
+            name = _needs_translation(ent, args.overwrite_existing)
             if not name:
                 continue
-            if (not args.overwrite_existing) and isinstance(ent.get("entity_name_standard"), str) and ent["entity_name_standard"].strip():
-                continue
-            key = (name, args.from_lang, args.to_lang)
-            if key in cache:
-                ent["entity_name_standard"] = cache[key]
-                success += 1
-                continue
-            try:
-                t = translate_one(text=name, app_key=APP_KEY,
-                                  app_secret=APP_SECRET,
-                                  lang_from=args.from_lang, lang_to=args.to_lang, vocab_id=args.vocab_id)
-                ent["entity_name_standard"] = t
-                cache[key] = t
+            if name in translations:
+                ent["entity_name_standard"] = translations[name]
                 success += 1
-            except Exception as e:
+            else:
                 # keep original and move on
                 ent["entity_name_standard"] = ent.get("entity_name_standard", "")
                 fail += 1
-                print(f"[warn] translate fail for '{name}': {e}", file=sys.stderr)
-            time.sleep(args.rate_limit_sleep)
-
-        print(f"[info] translation done. success={success}, fail={fail}")
+        print(f"[info] {input_json}: translation done. success={success}, fail={fail}")
 
         # output
         output_file = os.path.join(OUTPUT_DIR, os.path.basename(input_json).replace(".json", "_translated.json"))
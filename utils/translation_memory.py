@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import threading
+
+
+class TranslationMemory:
+    """
+    持久化翻译记忆（SQLite）：(text, from, to, vocab_id) -> translation
+    跨章节、跨运行复用；线程安全（单连接 + 锁）
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " text TEXT NOT NULL, lang_from TEXT NOT NULL, lang_to TEXT NOT NULL, vocab_id TEXT NOT NULL,"
+            " translation TEXT NOT NULL, PRIMARY KEY (text, lang_from, lang_to, vocab_id))"
+        )
+        self._conn.commit()
+
+    def lookup(self, texts, lang_from: str, lang_to: str, vocab_id: str | None = None) -> dict[str, str]:
+        """批量查询，返回已有的 {text: translation}"""
+        texts = list(dict.fromkeys(texts))
+        out = {}
+        with self._lock:
+            for i in range(0, len(texts), 500):
+                batch = texts[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT text, translation FROM translations WHERE lang_from = ? AND lang_to = ? AND vocab_id = ?"
+                    f" AND text IN ({','.join('?' * len(batch))})",
+                    (lang_from, lang_to, vocab_id or "", *batch),
+                ).fetchall()
+                out.update(rows)
+        return out
+
+    def put(self, text: str, translation: str, lang_from: str, lang_to: str, vocab_id: str | None = None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                               (text, lang_from, lang_to, vocab_id or "", translation))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
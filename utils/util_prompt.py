@@ -12,4 +12,14 @@ type_classfication_llm_check_prompt = """
 
 Entity: {entity}
 Allowed_tyepes:{allowed_types}
-"""
\ No newline at end of file
+"""
+type_classification_batch_prompt = """
+现在我需要你根据我给出的实体信息，将每个实体分别分类到Allowed_types中：
+Entities（JSON数组，每项含id与entity）: {entities}
+Allowed_tyepes:{allowed_types}
+
+要求：
+1. 如果判断出实体不属于上面所给的Allowed_types, 实体类型归类为"Other"。
+2. 每个实体独立判断，不要遗漏，也不要合并。
+3. 请严格用JSON格式输出, 格式为{{"results": [{{"id": id, "top_level_category": Type}}, ...]}}，id与输入一致，Type必须是Allowed_types中的某一项或者"Other"。
+"""